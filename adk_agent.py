@@ -6,6 +6,7 @@ ADK-based Campground Availability Agent
 import os
 import json
 import asyncio
+import functools
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Union
 from google.adk.agents import Agent
@@ -15,6 +16,11 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 import requests
 from cache_manager import CacheManager
+from query_cache import QueryCache, facility_versions, normalize_params
+from cancellation import CancelToken, Cancelled, cancel_scope, run_cancellable
+from search_pipeline import search_campgrounds
+from tool_responses import COMPACT, compact_output, compact_results
+from metrics import instrument_tool
 import subprocess
 import time
 
@@ -23,13 +29,74 @@ import time
 if "GOOGLE_API_KEY" not in os.environ:
     print("Warning: GOOGLE_API_KEY not set. ADK features will not work.")
 
+def _search_dir(location: str, distance: int) -> Optional[Path]:
+    """Per-search workspace directory for (location, distance), if fetch.py --workspace created it."""
+    from geo import geocode_location
+    from workspace import workspace_dir
+
+    try:
+        lat, lon = geocode_location(location)
+    except ValueError:
+        return None
+    path = workspace_dir(lat, lon, distance)
+    return path if (path / "download.csv").exists() else None
+
+
+def _analysis_cache_key(location: str, distance: int, date: str, work_dir: Path):
+    """
+    Return (cache, key, versions, params) for an analyze_results call, or None when the query
+    can't be normalized (location not geocodable offline or no campground list yet).
+    """
+    from fetch import DOWNLOAD_CSV, geocode_location, month_cache_dir, read_facility_ids
+
+    csv_file = work_dir / DOWNLOAD_CSV
+    if not csv_file.exists():
+        return None
+    try:
+        lat, lon = geocode_location(location)
+    except ValueError:
+        return None
+    cache = QueryCache.shared()
+    key = cache.make_key(lat, lon, distance, date)
+    versions = facility_versions(read_facility_ids(str(csv_file)), month_cache_dir(date[:7]))
+    return cache, key, versions, normalize_params(lat, lon, distance, date)
+
+
+def _command_response(result: subprocess.CompletedProcess, cmd: List[str]) -> Dict[str, Any]:
+    """Tool response for a fetch.py run; compact mode keeps counts and summary lines only."""
+    response = {"status": "success" if result.returncode == 0 else "error", "command": " ".join(cmd)}
+    compact = compact_output(result.stdout, result.stderr)
+    if COMPACT:
+        response.update(compact)
+    else:
+        response.update(output=result.stdout, error=result.stderr if result.stderr else None)
+    return response
+
+
+def _analysis_response(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Tool response for analyze_results; compact mode returns the top-K view with a result handle."""
+    if not COMPACT:
+        return results
+    if results.get("parsed_results"):
+        compact = compact_results(results["parsed_results"])
+    else:
+        compact = {"text_output": (results.get("text_output") or "")[-2000:],
+                   "error": results.get("json_error")}
+    compact["status"] = results.get("status", "success")
+    if results.get("cached"):
+        compact["cached"] = True
+    return compact
+
+
+@instrument_tool
 def recreation_api_tool(command: str, location: Optional[str] = None, distance: int = 50, month: Optional[str] = None) -> Dict[str, Any]:
     """
     Execute recreation.gov data commands
     
     Args:
         command: The operation to perform (build_campground_list, fetch_availability, check_cache, analyze_results)
-        location: Location to search around (required for build_campground_list)
+        location: Location to search around (required for build_campground_list; pass it to every
+            command so each search uses its own workspace)
         distance: Distance in miles (default 50)
         month: Month in YYYY-MM format (required for fetch_availability)
     
@@ -39,11 +106,9 @@ def recreation_api_tool(command: str, location: Optional[str] = None, distance:
     try:
         if command == "check_cache":
             # Check cache status
-            result = subprocess.run(
+            result = run_cancellable(
                 ["python3", "fetch.py", "--cache-status"],
                 cwd=os.getcwd(),  # Use current working directory
-                capture_output=True,
-                text=True,
                 timeout=30
             )
             return {
@@ -56,21 +121,15 @@ def recreation_api_tool(command: str, location: Optional[str] = None, distance:
             if not location:
                 return {"status": "error", "message": "Location is required for building campground list"}
             
-            # Build campground list
-            cmd = ["python3", "fetch.py", "--build-csv", "--location", location, "--distance", str(distance)]
-            result = subprocess.run(
+            # Build campground list into this search's workspace (never the shared download.csv)
+            cmd = ["python3", "fetch.py", "--build-csv", "--location", location, "--distance", str(distance),
+                   "--workspace"]
+            result = run_cancellable(
                 cmd,
                 cwd=os.getcwd(),  # Use current working directory
-                capture_output=True,
-                text=True,
                 timeout=300  # 5 minutes for building campground list
             )
-            return {
-                "status": "success" if result.returncode == 0 else "error",
-                "output": result.stdout,
-                "error": result.stderr if result.stderr else None,
-                "command": " ".join(cmd)
-            }
+            return _command_response(result, cmd)
         
         elif command == "fetch_availability":
             if not month:
@@ -78,43 +137,50 @@ def recreation_api_tool(command: str, location: Optional[str] = None, distance:
             
             # Fetch availability data
             cmd = ["python3", "fetch.py", month]
-            result = subprocess.run(
+            if location:
+                cmd += ["--location", location, "--distance", str(distance), "--workspace"]
+            # On cancellation or timeout fetch.py gets SIGTERM and stops cleanly (see cancellation.py)
+            result = run_cancellable(
                 cmd,
                 cwd=os.getcwd(),  # Use current working directory
-                capture_output=True,
-                text=True,
                 timeout=600  # 10 minutes for availability fetching
             )
-            return {
-                "status": "success" if result.returncode == 0 else "error",
-                "output": result.stdout,
-                "error": result.stderr if result.stderr else None,
-                "command": " ".join(cmd)
-            }
+            return _command_response(result, cmd)
         
         elif command == "analyze_results":
             # Analyze results for specific date and location
             date = month  # Reuse month parameter for specific date
             if not date or not location:
                 return {"status": "error", "message": "Both date and location are required for analysis"}
+
+            # Analysis scripts read download.csv/all_avail_<MONTH>.json from their CWD, so run
+            # them inside this search's workspace when there is one
+            project_dir = Path.cwd()
+            work_dir = _search_dir(location, distance) or project_dir
+
+            # Identical (center, radius, dates) queries over unchanged availability files are
+            # answered from the result cache without re-running the analysis scripts
+            cached = _analysis_cache_key(location, distance, date, work_dir)
+            if cached:
+                cache, key, versions, params = cached
+                hit = cache.get(key, versions)
+                if hit is not None:
+                    hit["cached"] = True
+                    return _analysis_response(hit)
             
             # Try to get JSON results first
-            json_cmd = ["python3", "format_results_json.py", date, str(distance), location]
-            json_result = subprocess.run(
+            json_cmd = ["python3", str(project_dir / "format_results_json.py"), date, str(distance), location]
+            json_result = run_cancellable(
                 json_cmd,
-                cwd=os.getcwd(),  # Use current working directory
-                capture_output=True,
-                text=True,
+                cwd=work_dir,
                 timeout=60
             )
             
             # Also get text summary
-            text_cmd = ["python3", "format_results.py", date, str(distance), location]
-            text_result = subprocess.run(
+            text_cmd = ["python3", str(project_dir / "format_results.py"), date, str(distance), location]
+            text_result = run_cancellable(
                 text_cmd,
-                cwd=os.getcwd(),  # Use current working directory
-                capture_output=True,
-                text=True,
+                cwd=work_dir,
                 timeout=60
             )
             
@@ -137,18 +203,24 @@ def recreation_api_tool(command: str, location: Optional[str] = None, distance:
                     results["parsed_results"] = parsed_json
                 except json.JSONDecodeError:
                     pass
+
+            if cached and results["json_output"]:
+                cache.put(key, versions, results, params)
             
-            return results
+            return _analysis_response(results)
         
         else:
             return {"status": "error", "message": f"Unknown command: {command}"}
             
     except subprocess.TimeoutExpired:
         return {"status": "error", "message": f"Command timed out: {command}"}
+    except Cancelled:
+        return {"status": "cancelled", "message": f"Request cancelled: {command}"}
     except Exception as e:
         return {"status": "error", "message": f"Error executing command: {str(e)}"}
 
 
+@instrument_tool
 def cache_manager_tool(action: str, location: Optional[str] = None, distance: int = 50, month: Optional[str] = None) -> Dict[str, Any]:
     """
     Manage cache operations
@@ -204,6 +276,7 @@ def cache_manager_tool(action: str, location: Optional[str] = None, distance: in
         return {"status": "error", "message": f"Cache error: {str(e)}"}
 
 
+@instrument_tool
 def extract_query_parameters(query: str, location: Optional[str] = None, date: Optional[str] = None, distance: Optional[int] = None) -> Dict[str, Any]:
     """
     Extract location, date, and distance from a natural language query.
@@ -280,13 +353,27 @@ def extract_query_parameters(query: str, location: Optional[str] = None, date: O
 
 
 # Create the ADK agent
+def _in_worker_thread(func):
+    """
+    Async wrapper that runs a blocking tool in a worker thread.
+
+    The event loop stays free to notice client disconnects, and asyncio.to_thread copies the
+    request's context, so the tool sees its CancelToken via current_token().
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+
 def create_adk_campground_agent(lite_mode: bool = False):
     """Create the ADK-based campground agent"""
     
-    # Create tools
-    recreation_tool = FunctionTool(recreation_api_tool)
+    # Create tools (the blocking recreation tool runs in a worker thread; see _in_worker_thread)
+    recreation_tool = FunctionTool(_in_worker_thread(recreation_api_tool))
     cache_tool = FunctionTool(cache_manager_tool)
     query_parser_tool = FunctionTool(extract_query_parameters)
+    search_tool = FunctionTool(_in_worker_thread(instrument_tool(search_campgrounds)))
     
     # Select model based on lite mode
     model_name = "gemini-2.5-flash-lite-preview-06-17" if lite_mode else "gemini-2.5-flash"
@@ -304,6 +391,11 @@ def create_adk_campground_agent(lite_mode: bool = False):
 4. **Analyzing results**: Find campgrounds with availability for specific dates
 5. **Providing helpful responses**: Format results in a clear, user-friendly way
 
+FAST PATH: If the query names a location and a single specific night (e.g. "campgrounds near Yosemite on August 6th"),
+call search_campgrounds ONCE with location, date (YYYY-MM-DD) and distance, present its campgrounds and total_found,
+and stop. It geocodes, checks the caches, fetches only missing data and analyzes in one step.
+Use the workflow below only for anything else (date ranges, weekends, whole months, routes).
+
 MANDATORY WORKFLOW PROCESS (follow ALL steps):
 1. First, analyze the user's query to understand:
    - What location they're asking about (be specific - e.g., "South Lake Tahoe" not just "South Lake")
@@ -318,15 +410,18 @@ MANDATORY WORKFLOW PROCESS (follow ALL steps):
 3. Use cache_manager_tool with the extracted parameters to check what data is already cached
 
 4. Use recreation_api_tool to build campground lists and fetch availability data only when needed
+   - Always pass the same location and distance to every recreation_api_tool command, including fetch_availability
 
 5. **MANDATORY FINAL STEP - ANALYZE RESULTS AND PRESENT FINDINGS**: Use recreation_api_tool with command='analyze_results':
    - You MUST call this even if previous steps suggest no data
    - Pass the same location, distance, and month parameters
    - **PARSING THE RESPONSE**: The tool returns a response object with these fields:
      * status: 'success' or 'error'
-     * json_output: Contains stringified JSON with campground data
-     * text_output: Contains human-readable summary
-   - **DETERMINING AVAILABILITY**: Look inside json_output for the 'total_found' number:
+     * total_found, total_sites: counts over ALL matching campgrounds
+     * campgrounds: only the nearest few (shown of total_found), each with name, distance, site_count, facility_id
+     * result_handle: the full list is shown to the user by the app; do not ask for it
+     * (only when TOOL_RESPONSES=full: json_output with the same data as stringified JSON, and text_output)
+   - **DETERMINING AVAILABILITY**: Look at the 'total_found' number (inside json_output in full mode):
      * If total_found > 0: CAMPGROUNDS ARE AVAILABLE - present them to the user
      * If total_found = 0: No campgrounds found
    - **PRESENTING RESULTS**: When total_found > 0, extract and show:
@@ -346,8 +441,8 @@ IMPORTANT GUIDELINES:
 - For dates like "July 4th weekend", understand this means around July 4, 2025
 
 **CRITICAL RESPONSE INTERPRETATION RULES**:
-1. **ALWAYS check json_output first** - it contains the actual campground data
-2. **Look for "total_found": NUMBER** in the json_output string
+1. **ALWAYS check total_found first** (or json_output in full mode) - it counts the actual campground data
+2. **Look for "total_found": NUMBER** in the response
 3. **If total_found > 0**: 
    - SUCCESS! Campgrounds are available
    - Extract campground names, distances, and available dates
@@ -366,7 +461,7 @@ IMPORTANT GUIDELINES:
 Be helpful, efficient, and informative in your responses!
 
 **FINAL CRITICAL RULE**: After calling analyze_results, if the tool response contains json_output with total_found > 0, you MUST present the campground results as successful findings. Do NOT say "no availability" - instead say something like "Great news! I found [X] campgrounds with availability for you!" and list them.""",
-        tools=[recreation_tool, cache_tool, query_parser_tool]
+        tools=[search_tool, recreation_tool, cache_tool, query_parser_tool]
     )
     
     return agent
@@ -405,7 +500,8 @@ class ADKCampgroundAgent:
                 "date": campground_data.get("date"),
                 "location": campground_data.get("location"),
                 "max_distance": campground_data.get("max_distance"),
-                "total_found": campground_data.get("total_found", 0)
+                "total_found": campground_data.get("total_found", 0),
+                "result_handle": campground_data.get("result_handle")
             }
             
             if asyncio.iscoroutinefunction(self.update_callback):
@@ -414,7 +510,18 @@ class ADKCampgroundAgent:
                 self.update_callback(result_data)
     
     async def process_natural_language_query(self, user_query: str):
-        """Process a natural language query using ADK"""
+        """Process a natural language query using ADK; cancelling the task also stops its tools' subprocesses"""
+        token = CancelToken()
+        with cancel_scope(token):
+            try:
+                await self._process_query(user_query)
+            except asyncio.CancelledError:
+                # The web client went away: fetch.py children get SIGTERM via run_cancellable
+                token.cancel()
+                raise
+
+    async def _process_query(self, user_query: str):
+        """Run the ADK agent on one query and forward its events to the update callback"""
         
         await self.send_update(f"🧠 ADK Agent analyzing: {user_query!r}")
         
@@ -475,6 +582,9 @@ class ADKCampgroundAgent:
                                 response = part.function_response.response
                                 if isinstance(response, dict) and 'parsed_results' in response:
                                     await self.send_update(json.dumps(response['parsed_results']), "campground_results")
+                                elif isinstance(response, dict) and response.get('total_found') and 'campgrounds' in response:
+                                    # Compact tool responses carry the (top-K) results directly
+                                    await self.send_campground_results(response)
                                 elif isinstance(response, dict) and 'json_output' in response and response.get('json_output'):
                                     # Handle analyze_results responses directly
                                     try:
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+atomic_file.py - Atomic file replacement and cross-process file locks
+
+Shared state under temp/ (cached payloads, download.csv files, merged output, the registry
+and geocode cache) is read while other processes write it. Writers go through write_atomic(),
+which renames a finished temp file into place so readers see the old file or the new one,
+never half of one. file_lock() serializes read-modify-write cycles across processes.
+
+Nothing here knows about JSON; jsonio.py builds its dump_atomic()/update_locked() on top.
+
+Usage:
+    write_atomic("temp/workspaces/x/download.csv", csv_bytes)
+    with file_lock("temp/facility_sets.json.lock"):
+        ...
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: file_lock() then only serializes threads of one process
+    fcntl = None
+
+_process_lock = threading.Lock()
+
+
+def temp_path_for(path: Union[str, Path]) -> Path:
+    """A sibling temp file name unique to this process and thread."""
+    path = Path(path)
+    return path.with_name(f"{path.name}.tmp{os.getpid()}-{threading.get_ident()}")
+
+
+def write_atomic(path: Union[str, Path], data: bytes) -> None:
+    """Write bytes via a unique temp file and rename, so readers never see a partial file."""
+    tmp = temp_path_for(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(lock_path: Union[str, Path]) -> Iterator[None]:
+    """Hold an exclusive flock on lock_path (created if needed) for the duration of the block."""
+    with open(lock_path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            _process_lock.acquire()
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                _process_lock.release()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+avail_cache.py - Layout of the shared availability payload cache
+
+Each month's payloads live in their own directory, one file per facility:
+
+    temp/<MONTH>/avail_<ID>.json
+
+fetch.py, the facility registry, workspaces and the pre-warm scheduler all locate payloads
+through these helpers rather than building paths themselves.
+
+Older versions kept every month in one flat temp/avail_<ID>.json per facility. The first
+month_cache_dir() call in a process links those files into the month their dates fall in
+(migrate_flat_cache) and leaves a marker, so existing caches are not fetched again. The flat
+originals are left in place for scripts that still read them and can be deleted afterwards.
+
+Usage:
+    cache_dir = month_cache_dir("2025-08")
+    missing = [fid for fid in facility_ids if not is_cached(fid, cache_dir)]
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Set, Union
+
+from atomic_file import write_atomic
+
+AVAIL_CACHE_ROOT = "temp"
+FLAT_CACHE_MARKER = ".flat_cache_migrated"
+
+_migrated: Set[str] = set()
+_migrate_lock = threading.Lock()
+
+
+def month_cache_dir(month: str) -> Path:
+    """Shared cache directory holding one month's avail_<ID>.json files."""
+    migrate_flat_cache(AVAIL_CACHE_ROOT)
+    return Path(AVAIL_CACHE_ROOT) / month
+
+
+def payload_month(data: bytes) -> Optional[str]:
+    """YYYY-MM of the first availability date in a (plain or compressed) payload, if it has one."""
+    import jsonio
+
+    try:
+        payload = jsonio.loads(jsonio.decompress(data))
+        for site in payload["campsites"].values():
+            for day in site.get("availabilities") or {}:
+                return day[:7]
+    except (KeyError, TypeError, AttributeError, ValueError, *jsonio.DecodeError):
+        pass
+    return None
+
+
+def migrate_flat_cache(root: Union[str, Path] = AVAIL_CACHE_ROOT) -> int:
+    """
+    Link old flat-layout payloads (<root>/avail_<ID>.json) into <root>/<MONTH>/, once per cache.
+
+    Files whose month already holds the facility, or whose month can't be read, are skipped.
+    Returns the number of payloads linked (0 once the marker file exists).
+    """
+    root = Path(root)
+    key = os.path.abspath(root)
+    if key in _migrated:
+        return 0
+    with _migrate_lock:
+        if key in _migrated or not root.is_dir() or (root / FLAT_CACHE_MARKER).exists():
+            _migrated.add(key)
+            return 0
+        linked = 0
+        for old in sorted(root.glob("avail_*.json")):
+            try:
+                data = old.read_bytes()
+                month = payload_month(data)
+                if month is None:
+                    continue
+                target = root / month / old.name
+                target.parent.mkdir(exist_ok=True)
+                try:
+                    os.link(old, target)
+                except FileExistsError:
+                    continue
+                except OSError:  # no hard links on this filesystem
+                    if target.exists():
+                        continue
+                    write_atomic(target, data)
+                linked += 1
+            except OSError:
+                continue
+        if linked:
+            print(f"[✓] Linked {linked} cached payload(s) from {root}/avail_*.json into per-month directories "
+                  f"(the flat files are no longer read and can be deleted)")
+        (root / FLAT_CACHE_MARKER).touch()
+        _migrated.add(key)
+        return linked
+
+
+def is_cached(facility_id: str, temp_dir: Path, max_age: Optional[float] = None) -> bool:
+    """Return True if a non-empty availability file exists for the facility (no older than max_age seconds, if given)."""
+    output_file = temp_dir / f"avail_{facility_id}.json"
+    try:
+        st = output_file.stat()
+    except OSError:
+        return False
+    return st.st_size > 0 and (max_age is None or time.time() - st.st_mtime <= max_age)
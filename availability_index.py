@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+availability_index.py - Precomputed query index over merged availability data
+
+Built next to the merged file whenever fetch.py writes all_avail_<MONTH>.json:
+
+    all_avail_<MONTH>.index.json
+        sites   [[facility_id, campsite_id], ...]            site numbers used below
+        counts  {facility_id: {"2025-08-06": n, ...}}        Available sites per facility per date
+        runs    [[site number, "2025-08-01", nights], ...]   maximal Available runs, longest first
+
+Both answer "can this payload match at all?" without decoding it: search_pipeline.py reads the
+per-facility counts to skip payloads with nothing Available on a searched date (see
+merge_manifest.py for when an index's entries for a facility are still current), and
+stay_search.py takes a prefix of the sorted runs to decode only campgrounds with a long enough
+run. Index files from before version 2 also carry a per-date "dates" list, which is ignored.
+
+Usage:
+    from availability_index import AvailabilityIndex
+
+    index = AvailabilityIndex.load("all_avail_2025-08.index.json")
+    index.count("232450", date(2025, 8, 6))   # Available sites at one campground that night
+    index.runs_of_at_least(3)                 # sites with 3+ consecutive Available nights
+"""
+
+import bisect
+import heapq
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import jsonio
+from availability_model import Campground, Status
+
+SiteKey = Tuple[str, str]  # (facility_id, campsite_id)
+
+
+def index_path_for(merged_file: Union[str, Path]) -> Path:
+    """all_avail_<MONTH>.json → all_avail_<MONTH>.index.json"""
+    merged_file = Path(merged_file)
+    return merged_file.with_name(merged_file.name.split(".")[0] + ".index.json")
+
+
+class AvailabilityIndex:
+    """Per-facility Available counts by date and Available run lengths by site."""
+
+    def __init__(self, sites: List[SiteKey], counts: Dict[str, Dict[date, int]],
+                 runs: List[Tuple[int, date, int]]):
+        self.sites = sites
+        self.counts = counts
+        self.runs = runs  # sorted by nights, descending
+        self._run_nights_neg = [-nights for _, _, nights in runs]
+
+    @classmethod
+    def build(cls, campgrounds: Dict[str, Campground]) -> "AvailabilityIndex":
+        """Build the index from compact campgrounds."""
+        sites: List[SiteKey] = []
+        counts: Dict[str, Dict[date, int]] = {}
+        runs: List[Tuple[int, date, int]] = []
+
+        for facility_id, campground in campgrounds.items():
+            if campground.start is None:
+                continue
+            per_date: Dict[date, int] = {}
+            for campsite_id, site in campground.campsites.items():
+                site_no = len(sites)
+                sites.append((facility_id, campsite_id))
+                run_start = None
+                for offset, status in enumerate(site.statuses + b"\0"):
+                    if status == Status.AVAILABLE:
+                        day = campground.date_at(offset)
+                        per_date[day] = per_date.get(day, 0) + 1
+                        if run_start is None:
+                            run_start = offset
+                    elif run_start is not None:
+                        runs.append((site_no, campground.date_at(run_start), offset - run_start))
+                        run_start = None
+            if per_date:
+                counts[facility_id] = per_date
+
+        runs.sort(key=lambda run: -run[2])
+        return cls(sites, counts, runs)
+
+    @classmethod
+    def merge(cls, indexes: Iterable["AvailabilityIndex"]) -> "AvailabilityIndex":
+        """Combine indexes built over disjoint sets of facilities (e.g. one per worker shard)."""
+        sites: List[SiteKey] = []
+        counts: Dict[str, Dict[date, int]] = {}
+        shard_runs = []
+        for index in indexes:
+            base = len(sites)
+            sites.extend(index.sites)
+            counts.update(index.counts)
+            shard_runs.append([(n + base, start, nights) for n, start, nights in index.runs])
+        # Each shard's runs are already longest-first
+        runs = list(heapq.merge(*shard_runs, key=lambda run: -run[2]))
+        return cls(sites, counts, runs)
+
+    def without(self, facility_ids: Iterable[str]) -> "AvailabilityIndex":
+        """The index with every entry of the given facilities removed (sites renumbered)."""
+        drop = set(facility_ids)
+        renumber: Dict[int, int] = {}
+        sites: List[SiteKey] = []
+        for n, site in enumerate(self.sites):
+            if site[0] not in drop:
+                renumber[n] = len(sites)
+                sites.append(site)
+        counts = {fid: per_date for fid, per_date in self.counts.items() if fid not in drop}
+        runs = [(renumber[n], start, nights) for n, start, nights in self.runs if n in renumber]
+        return AvailabilityIndex(sites, counts, runs)
+
+    # Queries
+
+    def count(self, facility_id: str, day: date) -> int:
+        return self.counts.get(facility_id, {}).get(day, 0)
+
+    def runs_of_at_least(self, nights: int) -> List[Tuple[SiteKey, date, int]]:
+        """Maximal Available runs of at least `nights` nights as (site, first night, nights)."""
+        end = bisect.bisect_right(self._run_nights_neg, -nights)
+        return [(self.sites[n], start, length) for n, start, length in self.runs[:end]]
+
+    # Persistence
+
+    def to_json(self) -> dict:
+        return {
+            "version": 2,
+            "sites": [list(site) for site in self.sites],
+            "counts": {fid: {day.isoformat(): n for day, n in sorted(per.items())} for fid, per in self.counts.items()},
+            "runs": [[n, start.isoformat(), length] for n, start, length in self.runs],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "AvailabilityIndex":
+        parse = date.fromisoformat
+        return cls(
+            sites=[tuple(site) for site in data["sites"]],
+            counts={fid: {parse(day): n for day, n in per.items()} for fid, per in data["counts"].items()},
+            runs=[(n, parse(start), length) for n, start, length in data["runs"]],
+        )
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Atomically write the index as JSON."""
+        jsonio.dump_atomic(self.to_json(), path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "AvailabilityIndex":
+        return cls.from_json(jsonio.load(path))
+
+
+def load_index_for(merged_file: Union[str, Path]) -> Optional[AvailabilityIndex]:
+    """Load the index written next to a merged file, if it exists and is not stale."""
+    merged_file = Path(merged_file)
+    index_file = index_path_for(merged_file)
+    if not index_file.exists():
+        return None
+    if merged_file.exists() and index_file.stat().st_mtime < merged_file.stat().st_mtime:
+        return None
+    return AvailabilityIndex.load(index_file)
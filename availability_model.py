@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+availability_model.py - Compact, typed model of Recreation.gov availability payloads
+
+The month endpoint returns, per campsite, an "availabilities" map of ISO timestamp → status
+string. That is repeated for every site and every day, which makes the raw dicts heavy to hold
+and slow to scan. This module converts a payload into:
+
+    Campground   facility ID, first day covered, and its campsites (decoded lazily)
+    Campsite     interned metadata plus one status byte per day offset from Campground.start
+    Status       small IntEnum for the status strings
+
+Usage:
+    from availability_model import load_merged, load_directory, Status
+
+    campgrounds = load_merged("all_avail_2025-08.json")   # lazy when its merge manifest is current
+    campgrounds = load_directory("temp/2025-08")         # lazy: files are read on first access
+    for site in campgrounds["232450"].available_sites_on(date(2025, 8, 6)):
+        print(site.site, site.loop)
+"""
+
+import sys
+from datetime import date, timedelta
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import jsonio
+
+
+class Status(IntEnum):
+    """Per-day campsite status, stored as one byte per day."""
+    UNKNOWN = 0
+    AVAILABLE = 1
+    RESERVED = 2
+    NOT_AVAILABLE = 3
+    NOT_RESERVABLE = 4
+    NOT_RESERVABLE_MANAGEMENT = 5
+    CLOSED = 6
+    OPEN = 7
+    NYR = 8
+    LOTTERY = 9
+    NOT_AVAILABLE_CUTOFF = 10
+
+
+STATUS_BY_NAME = {
+    "Available": Status.AVAILABLE,
+    "Reserved": Status.RESERVED,
+    "Not Available": Status.NOT_AVAILABLE,
+    "Not Reservable": Status.NOT_RESERVABLE,
+    "Not Reservable Management": Status.NOT_RESERVABLE_MANAGEMENT,
+    "Closed": Status.CLOSED,
+    "Open": Status.OPEN,
+    "NYR": Status.NYR,
+    "Lottery": Status.LOTTERY,
+    "Not Available Cutoff": Status.NOT_AVAILABLE_CUTOFF,
+}
+
+
+def _intern(value: Any) -> Any:
+    """Intern repeated metadata strings (loops, site types) so each is stored once."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Campsite:
+    """One campsite: interned metadata and a status byte per day offset."""
+
+    __slots__ = ("campsite_id", "site", "loop", "campsite_type", "type_of_use", "reserve_type",
+                 "min_people", "max_people", "rules", "statuses")
+
+    def __init__(self, campsite_id: str, site: Optional[str], loop: Optional[str],
+                 campsite_type: Optional[str], type_of_use: Optional[str], reserve_type: Optional[str],
+                 min_people: Optional[int], max_people: Optional[int], rules: Any, statuses: bytes):
+        self.campsite_id = campsite_id
+        self.site = site
+        self.loop = loop
+        self.campsite_type = campsite_type
+        self.type_of_use = type_of_use
+        self.reserve_type = reserve_type
+        self.min_people = min_people
+        self.max_people = max_people
+        self.rules = rules
+        self.statuses = statuses
+
+    def status_at(self, offset: int) -> Status:
+        """Status on the given day offset (UNKNOWN outside the covered range)."""
+        if 0 <= offset < len(self.statuses):
+            return Status(self.statuses[offset])
+        return Status.UNKNOWN
+
+    def available_offsets(self) -> List[int]:
+        """Day offsets on which the site is Available."""
+        return [i for i, s in enumerate(self.statuses) if s == Status.AVAILABLE]
+
+    def __repr__(self) -> str:
+        return f"Campsite({self.campsite_id!r}, site={self.site!r}, loop={self.loop!r})"
+
+
+class Campground:
+    """
+    One facility's availability.
+
+    Campsites are decoded from the raw payload (bytes or an already-parsed dict) the first time
+    `campsites` is accessed; the raw payload is dropped afterwards.
+    """
+
+    __slots__ = ("facility_id", "_source", "_start", "_campsites")
+
+    def __init__(self, facility_id: str, source: Union[bytes, Path, Dict[str, Any]]):
+        self.facility_id = facility_id
+        self._source = source
+        self._start: Optional[date] = None
+        self._campsites: Optional[Dict[str, Campsite]] = None
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._campsites is not None
+
+    @property
+    def campsites(self) -> Dict[str, Campsite]:
+        if self._campsites is None:
+            self._decode()
+        return self._campsites
+
+    @property
+    def start(self) -> Optional[date]:
+        """First day covered by the payload (day offset 0), or None if it has no dates."""
+        if self._campsites is None:
+            self._decode()
+        return self._start
+
+    def offset_of(self, day: date) -> int:
+        return (day - self.start).days if self.start else -1
+
+    def date_at(self, offset: int) -> Optional[date]:
+        """Date of a day offset, or None if the payload has no dates."""
+        return self.start + timedelta(days=offset) if self.start else None
+
+    @property
+    def num_days(self) -> int:
+        return max((len(s.statuses) for s in self.campsites.values()), default=0)
+
+    def available_sites_on(self, day: date) -> List[Campsite]:
+        """Campsites that are Available on the given day."""
+        offset = self.offset_of(day)
+        return [s for s in self.campsites.values() if s.status_at(offset) == Status.AVAILABLE]
+
+    def _decode(self) -> None:
+        source = self._source
+        if isinstance(source, Path):
+            payload = jsonio.load(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            payload = jsonio.loads(bytes(source))
+        else:
+            payload = source
+        self._start, self._campsites = _compact_campsites(payload)
+        self._source = None
+
+    def __repr__(self) -> str:
+        state = f"{len(self._campsites)} sites" if self._campsites is not None else "not decoded"
+        return f"Campground({self.facility_id!r}, {state})"
+
+
+def _compact_campsites(payload: Any):
+    """
+    Convert a raw payload's campsites into (start date, {campsite_id: Campsite}).
+
+    Malformed parts are skipped rather than failing the whole payload: a payload that is not an
+    object has no campsites, and so does a campsite that is not an object; an availability
+    whose key is not an ISO date is ignored.
+    """
+    raw_sites = payload.get("campsites") if isinstance(payload, dict) else None
+    if not isinstance(raw_sites, dict):
+        return None, {}
+    raw_sites = {cid: raw for cid, raw in raw_sites.items() if isinstance(raw, dict)}
+
+    # Every site in a payload normally shares the same timestamp keys, so parse each key once
+    day_of: Dict[str, date] = {}
+    bad_keys = set()
+    for raw in raw_sites.values():
+        availabilities = raw.get("availabilities")
+        for key in (availabilities if isinstance(availabilities, dict) else ()):
+            if key not in day_of and key not in bad_keys:
+                try:
+                    day_of[key] = date.fromisoformat(str(key)[:10])
+                except ValueError:
+                    bad_keys.add(key)
+    if not day_of:
+        return None, {}
+
+    start = min(day_of.values())
+    offset_of = {key: (day - start).days for key, day in day_of.items()}
+    num_days = max(offset_of.values()) + 1
+
+    campsites: Dict[str, Campsite] = {}
+    for campsite_id, raw in raw_sites.items():
+        statuses = bytearray(num_days)
+        availabilities = raw.get("availabilities")
+        for key, status in (availabilities.items() if isinstance(availabilities, dict) else ()):
+            if key in offset_of:
+                statuses[offset_of[key]] = STATUS_BY_NAME.get(status, Status.UNKNOWN)
+        campsite_id = _intern(str(raw.get("campsite_id") or campsite_id))
+        campsites[campsite_id] = Campsite(
+            campsite_id=campsite_id,
+            site=_intern(raw.get("site")),
+            loop=_intern(raw.get("loop")),
+            campsite_type=_intern(raw.get("campsite_type")),
+            type_of_use=_intern(raw.get("type_of_use")),
+            reserve_type=_intern(raw.get("campsite_reserve_type")),
+            min_people=raw.get("min_num_people"),
+            max_people=raw.get("max_num_people"),
+            rules=raw.get("campsite_rules"),
+            statuses=bytes(statuses),
+        )
+    return start, campsites
+
+
+def load_merged(path: Union[str, Path]) -> Dict[str, Campground]:
+    """
+    Load an all_avail_<MONTH>.json file into Campgrounds.
+
+    When the merge manifest written with the file is current (see merge_manifest.py), the file
+    is memory-mapped and each Campground holds a view of its own segment, decoded the first
+    time it is touched: only the pages of facilities that are used are read, and no facility is
+    parsed up front. Without a manifest the whole document is parsed, and each facility is
+    compacted as soon as it is taken out of it.
+    """
+    lazy = _load_merged_segments(Path(path))
+    if lazy is not None:
+        return lazy
+    merged = jsonio.load(path)
+    campgrounds: Dict[str, Campground] = {}
+    for facility_id in list(merged):
+        campground = Campground(facility_id, merged.pop(facility_id))
+        campground._decode()
+        campgrounds[facility_id] = campground
+    return campgrounds
+
+
+def _load_merged_segments(path: Path) -> Optional[Dict[str, Campground]]:
+    """Campgrounds over mmap'd manifest segments, or None if the manifest or file does not allow it."""
+    import mmap
+
+    from merge_manifest import MergeManifest
+
+    manifest = MergeManifest.load_for(path)
+    if manifest is None:
+        return None
+    with open(path, "rb") as f:
+        if f.read(1) != b"{":
+            return None  # stored compressed (merged before files were always written plain)
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    campgrounds: Dict[str, Campground] = {}
+    for facility_id, entry in manifest.facilities.items():
+        if entry["offset"] is None:
+            continue
+        # The segment is "<facility_id>":<payload>
+        start = entry["offset"] + len(jsonio.dumps(facility_id)) + 1
+        campgrounds[facility_id] = Campground(facility_id, view[start:entry["offset"] + entry["length"]])
+    return campgrounds
+
+
+def load_directory(temp_dir: Union[str, Path], facility_ids: Optional[List[str]] = None) -> Dict[str, Campground]:
+    """
+    Lazily load temp/<MONTH>/avail_<ID>.json files: nothing is read until a campground is touched.
+
+    Args:
+        temp_dir: Directory holding avail_<ID>.json files
+        facility_ids: Restrict to these IDs (default: every non-empty file in the directory)
+    """
+    temp_dir = Path(temp_dir)
+    if facility_ids is None:
+        paths = temp_dir.glob("avail_*.json")
+    else:
+        paths = (temp_dir / f"avail_{fid}.json" for fid in facility_ids)
+    return {
+        p.stem.replace("avail_", ""): Campground(p.stem.replace("avail_", ""), p)
+        for p in paths
+        if p.exists() and p.stat().st_size > 0
+    }
+
+
+def iter_available(campgrounds: Dict[str, Campground], day: date) -> Iterator[tuple]:
+    """Yield (facility_id, Campsite) for every site Available on the given day."""
+    for facility_id, campground in campgrounds.items():
+        for site in campground.available_sites_on(day):
+            yield facility_id, site
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+benchmark.py - Latency benchmarks for the agent tool layer
+
+1. Builds a scratch directory with a fixture RIDB export and the recorded temp/avail_*.json files
+2. Times recreation_api_tool stages (build_campground_list, fetch_availability, analyze_results)
+   and cache_manager_tool (check_status), cold (first call) and warm (repeat calls)
+3. Breaks the cost down into process spawn, pandas import, CSV load and JSON parse, including
+   decode time of the same payloads stored gzip/zstd-compressed (with their on-disk sizes)
+4. Measures fetch.py startup: module import and a warm-cache `python fetch.py <MONTH>` run,
+   and fails when `import fetch` costs more than IMPORT_BUDGET_S over a bare interpreter start
+5. Compares against a stored baseline and flags regressions
+
+No LLM and no network are used: the fixture location is pre-seeded in the geocode cache and
+HTTP(S) proxies point at a closed local port, so any stray request fails fast instead of
+reaching recreation.gov.
+
+Usage:
+    python benchmark.py                          # Run all stages, compare with benchmark_baseline.json
+    python benchmark.py --repeat 5               # Use 5 warm runs per stage (default 3)
+    python benchmark.py --stages spawn json_parse   # Run only some stages
+    python benchmark.py --stages spawn fetch_import fetch_warm_cli   # Startup-time benchmark and import budget
+    python benchmark.py --update-baseline        # Store this run as the new baseline
+    python benchmark.py --json bench_output.json # Also write the raw results as JSON
+
+Creates:
+    benchmark_baseline.json  # Stored baseline (with --update-baseline)
+"""
+
+import compileall
+import csv
+import io
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+REPO_DIR = Path(__file__).resolve().parent
+FIXTURE_AVAIL_DIR = REPO_DIR / "temp"
+FIXTURE_DOWNLOAD_CSV = REPO_DIR / "download.csv"
+BASELINE_FILE = REPO_DIR / "benchmark_baseline.json"
+
+FIXTURE_LOCATION = "Benchmark City"
+FIXTURE_LAT = 37.7749
+FIXTURE_LON = -122.4194
+FIXTURE_DISTANCE = 100
+FIXTURE_MONTH = "2025-07"
+FIXTURE_DATE = "2025-07-16"
+
+# A stage is a regression when its warm median is this much slower than baseline...
+REGRESSION_TOLERANCE = 0.25
+# ...and the absolute slowdown is larger than timer noise.
+REGRESSION_MIN_DELTA_S = 0.005
+# `import fetch` (fetch_import minus spawn); fetch.py defers everything but the standard library
+IMPORT_BUDGET_S = 0.060
+
+
+def recorded_facility_ids() -> List[str]:
+    """Facility IDs with a recorded availability file in temp/."""
+    return sorted(p.stem.replace("avail_", "") for p in FIXTURE_AVAIL_DIR.glob("avail_*.json"))
+
+
+def build_fixture_ridb_zip(zip_path: Path, facility_ids: List[str]) -> None:
+    """
+    Write a minimal RIDB export containing one reservable campground per recorded facility.
+
+    Campgrounds are spread on a deterministic spiral around the fixture location so that
+    --distance filtering keeps a predictable subset.
+    """
+    names = {}
+    if FIXTURE_DOWNLOAD_CSV.exists():
+        with open(FIXTURE_DOWNLOAD_CSV, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                names[row["FacilityID"]] = row["FacilityName"]
+
+    fac = io.StringIO()
+    addr = io.StringIO()
+    fac_writer = csv.writer(fac)
+    addr_writer = csv.writer(addr)
+    fac_writer.writerow(["FacilityID", "FacilityName", "FacilityTypeDescription", "Reservable",
+                         "FacilityLatitude", "FacilityLongitude"])
+    addr_writer.writerow(["FacilityID", "AddressStateCode"])
+    for i, fid in enumerate(facility_ids):
+        # ~0.01 degree steps keep the furthest fixture well inside FIXTURE_DISTANCE
+        offset = 0.01 * (i + 1)
+        lat = FIXTURE_LAT + offset * (1 if i % 2 else -1)
+        lon = FIXTURE_LON + offset * (1 if i % 3 else -1)
+        fac_writer.writerow([fid, names.get(fid, f"Fixture Campground {fid}"), "Campground", "true", lat, lon])
+        addr_writer.writerow([fid, "CA"])
+
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("Facilities_API_v1.csv", fac.getvalue())
+        z.writestr("FacilityAddresses_API_v1.csv", addr.getvalue())
+
+
+def prepare_workspace(root: Path) -> Path:
+    """Populate a scratch directory with the code, fixture RIDB data and recorded availability."""
+    for src in REPO_DIR.glob("*.py"):
+        shutil.copy2(src, root / src.name)
+    # Start-up stages measure imports, not compilation (PYTHONDONTWRITEBYTECODE would recompile every run)
+    compileall.compile_dir(str(root), maxlevels=0, quiet=1)
+    facility_ids = recorded_facility_ids()
+    build_fixture_ridb_zip(root / "RIDBFullExport_V1_CSV.zip", facility_ids)
+    if FIXTURE_DOWNLOAD_CSV.exists():
+        shutil.copy2(FIXTURE_DOWNLOAD_CSV, root / "download.csv")
+
+    # Recorded files are July 2025 payloads; they go in that month's shared cache directory
+    temp_dir = root / "temp"
+    month_dir = temp_dir / FIXTURE_MONTH
+    month_dir.mkdir(parents=True)
+    for fid in facility_ids:
+        shutil.copy2(FIXTURE_AVAIL_DIR / f"avail_{fid}.json", month_dir / f"avail_{fid}.json")
+    with open(temp_dir / "geocode_cache.json", "w", encoding="utf-8") as f:
+        json.dump({FIXTURE_LOCATION.lower(): [FIXTURE_LAT, FIXTURE_LON]}, f)
+    write_compressed_copies(month_dir)
+    return root
+
+
+def _repo_jsonio():
+    sys.path.insert(0, str(REPO_DIR))
+    try:
+        import jsonio
+    finally:
+        sys.path.remove(str(REPO_DIR))
+    return jsonio
+
+
+def compression_codecs() -> List[str]:
+    """Codecs the json_parse_<codec> stages can use (zstd only when zstandard is installed)."""
+    return ["gzip"] + (["zstd"] if _repo_jsonio().zstandard is not None else [])
+
+
+def write_compressed_copies(month_dir: Path) -> None:
+    """Store the month's payloads once per codec (temp/<MONTH>-<codec>/) and report the sizes."""
+    jsonio = _repo_jsonio()
+    plain = sum(p.stat().st_size for p in month_dir.glob("avail_*.json"))
+    sizes = [f"plain {plain / 1e6:.1f} MB"]
+    for codec in compression_codecs():
+        codec_dir = month_dir.with_name(f"{month_dir.name}-{codec}")
+        codec_dir.mkdir()
+        for p in month_dir.glob("avail_*.json"):
+            jsonio.write_compressed_atomic(codec_dir / p.name, p.read_bytes(), codec)
+        size = sum(p.stat().st_size for p in codec_dir.glob("avail_*.json"))
+        sizes.append(f"{codec} {size / 1e6:.1f} MB ({plain / size:.0f}x)")
+    print(f"[→] Cache size: {', '.join(sizes)}")
+
+
+@contextmanager
+def offline_workspace(root: Path) -> Iterator[None]:
+    """Run inside the workspace with outbound HTTP(S) routed to a closed port."""
+    saved_cwd = os.getcwd()
+    saved_env = {k: os.environ.get(k) for k in ("HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY")}
+    os.environ["HTTP_PROXY"] = os.environ["HTTPS_PROXY"] = "http://127.0.0.1:9"
+    os.environ.pop("NO_PROXY", None)
+    os.chdir(root)
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def run_python(code: str) -> None:
+    """Run a snippet in a fresh interpreter, raising if it fails."""
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+
+
+def run_fetch_cli(*args: str) -> None:
+    """Run fetch.py in the workspace, raising if it fails."""
+    subprocess.run([sys.executable, "fetch.py", *args], check=True, capture_output=True)
+
+
+def load_csv_files() -> None:
+    """Read download.csv and the fixture RIDB CSVs with the csv module."""
+    with open("download.csv", "r", encoding="utf-8") as f:
+        list(csv.reader(f))
+    with zipfile.ZipFile("RIDBFullExport_V1_CSV.zip") as z:
+        for name in z.namelist():
+            list(csv.reader(io.TextIOWrapper(z.open(name), encoding="utf-8")))
+
+
+def parse_json_files() -> None:
+    """Decode every cached availability file and the merged month file with the jsonio backend."""
+    import jsonio
+
+    for p in Path("temp", FIXTURE_MONTH).glob("avail_*.json"):
+        jsonio.load(p)
+    merged = Path(f"all_avail_{FIXTURE_MONTH}.json")
+    if merged.exists():
+        jsonio.load(merged)
+
+
+def parse_compressed_files(codec: str) -> None:
+    """Decompress and decode every cached availability file stored with the given codec."""
+    import jsonio
+
+    for p in Path("temp", f"{FIXTURE_MONTH}-{codec}").glob("avail_*.json"):
+        jsonio.load(p)
+
+
+def load_model() -> None:
+    """Decode every cached availability file into the compact availability model."""
+    from availability_model import load_directory
+
+    for campground in load_directory(Path("temp", FIXTURE_MONTH)).values():
+        campground.campsites
+
+
+def tool_stage(tool: Callable[..., Dict[str, Any]], **kwargs) -> Callable[[], None]:
+    """Wrap an agent tool call so that a non-success status fails the stage."""
+    def run() -> None:
+        result = tool(**kwargs)
+        if result.get("status") != "success":
+            raise RuntimeError(result.get("message") or result.get("error") or "tool returned an error")
+    return run
+
+
+def get_stages() -> Dict[str, Callable[[], None]]:
+    """Return the benchmark stages in run order."""
+    stages: Dict[str, Callable[[], None]] = {
+        "spawn": lambda: run_python("pass"),
+        "pandas_import": lambda: run_python("import pandas"),
+        "csv_load": load_csv_files,
+        "json_parse": parse_json_files,
+        # Size vs decode time: the same payloads stored compressed (sizes are printed at setup)
+        **{f"json_parse_{codec}": (lambda c=codec: parse_compressed_files(c)) for codec in compression_codecs()},
+        "model_load": load_model,
+        # Startup: every download.csv ID has a recorded avail file, so the CLI run is all cache hits
+        "fetch_import": lambda: run_python("import fetch"),
+        "fetch_warm_cli": lambda: run_fetch_cli(FIXTURE_MONTH),
+    }
+
+    try:
+        from adk_agent import recreation_api_tool, cache_manager_tool
+    except ImportError as e:
+        print(f"⚠️ ADK agent tools not available, skipping tool stages: {e}")
+        return stages
+
+    stages.update({
+        "build_campground_list": tool_stage(
+            recreation_api_tool, command="build_campground_list",
+            location=FIXTURE_LOCATION, distance=FIXTURE_DISTANCE),
+        "fetch_availability": tool_stage(
+            recreation_api_tool, command="fetch_availability", month=FIXTURE_MONTH),
+        "analyze_results": tool_stage(
+            recreation_api_tool, command="analyze_results",
+            location=FIXTURE_LOCATION, distance=FIXTURE_DISTANCE, month=FIXTURE_DATE),
+        "cache_check": tool_stage(
+            cache_manager_tool, action="check_status",
+            location=FIXTURE_LOCATION, distance=FIXTURE_DISTANCE, month=FIXTURE_MONTH),
+    })
+    return stages
+
+
+def time_stage(fn: Callable[[], None], repeat: int) -> Dict[str, Any]:
+    """Time one cold call followed by `repeat` warm calls."""
+    timings = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        timings.append(time.perf_counter() - start)
+    warm = timings[1:]
+    return {
+        "cold_s": timings[0],
+        "warm_median_s": statistics.median(warm),
+        "warm_min_s": min(warm),
+    }
+
+
+def run_benchmarks(stage_names: Optional[List[str]] = None, repeat: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Run the selected stages in a fresh fixture workspace."""
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="recdotgov-bench-") as tmp:
+        root = prepare_workspace(Path(tmp))
+        with offline_workspace(root):
+            # Tool imports must resolve against the workspace copy
+            sys.path.insert(0, str(root))
+            try:
+                stages = get_stages()
+            finally:
+                sys.path.remove(str(root))
+            for name, fn in stages.items():
+                if stage_names and name not in stage_names:
+                    continue
+                print(f"[→] {name} …", end=" ", flush=True)
+                results[name] = time_stage(fn, repeat)
+                r = results[name]
+                if "error" in r:
+                    print(f"failed ({r['error']})")
+                else:
+                    print(f"cold {r['cold_s'] * 1000:.1f} ms, warm {r['warm_median_s'] * 1000:.1f} ms")
+    return results
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Return a description of every stage whose warm median regressed past tolerance."""
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or "error" in r or "warm_median_s" not in base:
+            continue
+        delta = r["warm_median_s"] - base["warm_median_s"]
+        if delta > REGRESSION_MIN_DELTA_S and r["warm_median_s"] > base["warm_median_s"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(
+                f"{name}: {base['warm_median_s'] * 1000:.1f} ms → {r['warm_median_s'] * 1000:.1f} ms "
+                f"(+{delta / base['warm_median_s']:.0%})"
+            )
+    return regressions
+
+
+def check_import_budget(results: Dict[str, Dict[str, Any]]) -> Optional[str]:
+    """A description of the fetch.py import overrunning IMPORT_BUDGET_S, if it does (needs spawn too)."""
+    spawn, imported = results.get("spawn", {}), results.get("fetch_import", {})
+    if "warm_median_s" not in spawn or "warm_median_s" not in imported:
+        return None
+    cost = imported["warm_median_s"] - spawn["warm_median_s"]
+    if cost <= IMPORT_BUDGET_S:
+        return None
+    return f"import fetch: {cost * 1000:.1f} ms over interpreter start (budget {IMPORT_BUDGET_S * 1000:.0f} ms)"
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the agent tool layer against fixture data")
+    parser.add_argument("--stages", nargs="*", default=None, help="Only run these stages")
+    parser.add_argument("--repeat", type=int, default=3, help="Warm runs per stage (default: 3)")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write results to {BASELINE_FILE.name}")
+    parser.add_argument("--json", type=str, default=None, help="Write raw results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.stages, max(1, args.repeat))
+    over_budget = check_import_budget(results)
+    if over_budget:
+        print(f"\n[!] Over budget: {over_budget}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"[✓] Baseline written to {BASELINE_FILE.name}")
+        return
+
+    if not BASELINE_FILE.exists():
+        print(f"[!] No {BASELINE_FILE.name} yet; run with --update-baseline to store one")
+        if over_budget:
+            sys.exit(1)
+        return
+
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline)
+    if over_budget:
+        regressions.append(over_budget)
+    if regressions:
+        print("\n[!] Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\n[✓] No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+cache_backend.py - Pluggable shared cache for availability payloads and query results
+
+Every web instance keeps its working files under temp/, but cold fetches go through a cache
+backend so that several instances share one copy of each payload and one upstream fetch per
+facility:
+
+    LocalBackend   a directory (default: temp/, or any shared mount such as a GCS FUSE bucket)
+    RedisBackend   any Redis-compatible server (pip install redis; tests can use fakeredis)
+
+Keys are relative paths, e.g. "2025-08/avail_232450.json" or "query_cache/<sha1>.json", so
+LocalBackend("temp") reads and writes exactly the files fetch.py already uses.
+
+Values are stored compressed when CACHE_COMPRESSION is set (see jsonio.py); get() always
+returns the decompressed bytes.
+
+single_flight(key, produce) is the distributed de-duplication: the first caller across all
+processes/instances takes a lock and runs produce(); everyone else waits for the value to
+appear instead of fetching it again. The lock expires after LOCK_TTL_SECONDS so a dead
+producer cannot block a key for long, and a live one renews it every LOCK_RENEW_SECONDS
+while produce() runs (it may wait for rate budget and then for a slow request). Releasing
+and renewing only touch a lock that still holds the caller's token. A producer that is told to stop (fetch.py's SIGTERM
+handler calls release_held_locks()) gives its locks up straight away, so others need not wait
+LOCK_TTL_SECONDS for a lock whose owner is about to be killed.
+
+Configuration (environment):
+    CACHE_URL unset              → LocalBackend("temp")
+    CACHE_URL=/mnt/shared-cache  → LocalBackend("/mnt/shared-cache")  (also file:///mnt/...)
+    CACHE_URL=redis://host:6379/0 → RedisBackend (redis is in requirements.txt; an image built
+                                    without it fails at web_frontend.py start-up, not mid-fetch)
+"""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import jsonio
+from atomic_file import file_lock, write_atomic
+
+DEFAULT_CACHE_ROOT = "temp"
+LOCK_TTL_SECONDS = 120      # a lock not renewed for this long belongs to a dead producer
+LOCK_RENEW_SECONDS = 30     # how often a producer renews its lock
+WAIT_TIMEOUT_SECONDS = 180  # how long a waiter waits for another producer
+POLL_INTERVAL_SECONDS = 0.25
+
+
+class CacheBackend:
+    """Byte-value store with TTLs and a cross-process lock."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put(self, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def try_lock(self, key: str, ttl: float = LOCK_TTL_SECONDS) -> Optional[str]:
+        """Acquire the producer lock for a key; returns a token, or None if someone else holds it."""
+        raise NotImplementedError
+
+    def unlock(self, key: str, token: str) -> None:
+        """Release the lock if it still holds this token."""
+        raise NotImplementedError
+
+    def extend(self, key: str, token: str, ttl: float = LOCK_TTL_SECONDS) -> bool:
+        """Push the lock's expiry ttl seconds out if it still holds this token; False if it was lost."""
+        raise NotImplementedError
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since the key was last written, or None if unknown."""
+        return None
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Filesystem path of a key when the backend stores plain files, else None."""
+        return None
+
+    def get_fresh(self, key: str, max_age: Optional[float] = None) -> Optional[bytes]:
+        """get(), treating values older than max_age seconds as missing."""
+        data = self.get(key)
+        if data is not None and max_age is not None:
+            age = self.age(key)
+            if age is None or age > max_age:
+                return None
+        return data
+
+    def single_flight(self, key: str, produce: Callable[[], Optional[bytes]], ttl: Optional[float] = None,
+                      wait_timeout: float = WAIT_TIMEOUT_SECONDS,
+                      max_age: Optional[float] = None) -> Tuple[Optional[bytes], bool]:
+        """
+        Return (value, produced_here) for a key, running produce() at most once across callers.
+
+        produce() returns the bytes to store, or None on failure (nothing is stored and waiting
+        callers then try to produce themselves). With max_age, an existing value older than that
+        many seconds is refreshed rather than returned.
+        """
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            data = self.get_fresh(key, max_age)
+            if data is not None:
+                return data, False
+            token = self.try_lock(key)
+            if token is not None:
+                with _held_lock:
+                    _held[token] = (self, key)
+                done = threading.Event()
+                renew = threading.Thread(target=self._renew, args=(key, token, done), name="lock-renew", daemon=True)
+                renew.start()
+                try:
+                    # Another producer may have finished between our get() and the lock
+                    data = self.get_fresh(key, max_age)
+                    if data is not None:
+                        return data, False
+                    data = produce()
+                    if data is not None:
+                        self.put(key, data, ttl)
+                    return data, data is not None
+                finally:
+                    done.set()
+                    renew.join()
+                    with _held_lock:
+                        _held.pop(token, None)
+                    self.unlock(key, token)
+            if time.monotonic() >= deadline:
+                return None, False
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def _renew(self, key: str, token: str, done: threading.Event) -> None:
+        """Keep a producer's lock alive until done is set (or the lock is lost)."""
+        while not done.wait(LOCK_RENEW_SECONDS):
+            try:
+                if not self.extend(key, token):
+                    return
+            except Exception as e:
+                print(f"[!] Could not renew cache lock {key}: {e}")
+
+
+class LocalBackend(CacheBackend):
+    """Plain files under a root directory; locks are O_EXCL lock files with a stale timeout."""
+
+    def __init__(self, root: Union[str, Path] = DEFAULT_CACHE_ROOT):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / key
+
+    def age(self, key: str) -> Optional[float]:
+        try:
+            return time.time() - self.local_path(key).stat().st_mtime
+        except OSError:
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.local_path(key)
+        try:
+            meta = self._expiry(path)
+            if meta is not None and meta < time.time():
+                self.delete(key)
+                return None
+            data = jsonio.read_bytes(path)
+        except OSError:
+            return None
+        return data or None
+
+    def put(self, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        path = self.local_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        jsonio.write_compressed_atomic(path, data)
+        expiry_file = path.with_name(path.name + ".expires")
+        if ttl:
+            write_atomic(expiry_file, str(time.time() + ttl).encode())
+        else:
+            expiry_file.unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        path = self.local_path(key)
+        path.unlink(missing_ok=True)
+        path.with_name(path.name + ".expires").unlink(missing_ok=True)
+
+    @staticmethod
+    def _expiry(path: Path) -> Optional[float]:
+        try:
+            return float(path.with_name(path.name + ".expires").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _lock_path(self, key: str) -> Path:
+        return self.local_path(key).with_name(self.local_path(key).name + ".lock")
+
+    def _guard(self, lock: Path):
+        """flock serializing stale-lock takeover, unlock and extend (one per directory, held briefly)."""
+        return file_lock(lock.parent / ".locks.guard")
+
+    def try_lock(self, key: str, ttl: float = LOCK_TTL_SECONDS) -> Optional[str]:
+        lock = self._lock_path(key)
+        lock.parent.mkdir(parents=True, exist_ok=True)
+        token = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime <= ttl:
+                        return None
+                except FileNotFoundError:
+                    continue
+                # Stale: the producer died. Re-check under the guard, so that of several waiters
+                # that saw it stale only the first removes it (not a lock another just took).
+                with self._guard(lock):
+                    try:
+                        if time.time() - lock.stat().st_mtime > ttl:
+                            lock.unlink()
+                    except FileNotFoundError:
+                        pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(token)
+            return token
+        return None
+
+    def _holds(self, lock: Path, token: str) -> bool:
+        try:
+            return lock.read_text() == token
+        except OSError:
+            return False
+
+    def unlock(self, key: str, token: str) -> None:
+        lock = self._lock_path(key)
+        with self._guard(lock):
+            if self._holds(lock, token):
+                lock.unlink(missing_ok=True)
+
+    def extend(self, key: str, token: str, ttl: float = LOCK_TTL_SECONDS) -> bool:
+        lock = self._lock_path(key)
+        with self._guard(lock):
+            if not self._holds(lock, token):
+                return False
+            os.utime(lock)  # staleness is judged by mtime
+            return True
+
+
+class RedisBackend(CacheBackend):
+    """Redis-compatible backend; locks are SET NX PX keys."""
+
+    def __init__(self, client, prefix: str = "recdotgov:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f"CACHE_URL={url} needs the redis package (pip install 'redis>=5.0.0')") from None
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> Optional[bytes]:
+        data = self.client.get(self.prefix + key)
+        return jsonio.decompress(data) if data is not None else None
+
+    def put(self, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        px = int(ttl * 1000) if ttl else None
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, jsonio.compress(data), px=px)
+        pipe.set(f"{self.prefix}at:{key}", str(time.time()), px=px)
+        pipe.execute()
+
+    def age(self, key: str) -> Optional[float]:
+        written = self.client.get(f"{self.prefix}at:{key}")
+        return time.time() - float(written) if written is not None else None
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key, f"{self.prefix}at:{key}")
+
+    def try_lock(self, key: str, ttl: float = LOCK_TTL_SECONDS) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self.client.set(f"{self.prefix}lock:{key}", token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def unlock(self, key: str, token: str) -> None:
+        self.client.eval(_REDIS_UNLOCK, 1, f"{self.prefix}lock:{key}", token)
+
+    def extend(self, key: str, token: str, ttl: float = LOCK_TTL_SECONDS) -> bool:
+        return bool(self.client.eval(_REDIS_EXTEND, 1, f"{self.prefix}lock:{key}", token, int(ttl * 1000)))
+
+
+# Compare-and-delete / compare-and-expire, atomic on the server
+_REDIS_UNLOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+_REDIS_EXTEND = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+_backend: Optional[CacheBackend] = None
+
+# Locks taken by single_flight() in this process, by token
+_held: Dict[str, Tuple[CacheBackend, str]] = {}
+_held_lock = threading.Lock()
+
+
+def backend_from_url(url: Optional[str]) -> CacheBackend:
+    """Build a backend from a CACHE_URL value (see module docstring)."""
+    if not url:
+        return LocalBackend(DEFAULT_CACHE_ROOT)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend.from_url(url)
+    if url.startswith("file://"):
+        url = url[len("file://"):]
+    return LocalBackend(url)
+
+
+def get_backend() -> CacheBackend:
+    """Process-wide backend configured by CACHE_URL."""
+    global _backend
+    if _backend is None:
+        _backend = backend_from_url(os.environ.get("CACHE_URL"))
+    return _backend
+
+
+def release_held_locks() -> int:
+    """
+    Release every single_flight() lock this process holds; returns how many.
+
+    For shutdown: a producer still running afterwards may see another instance fetch the same
+    key (one duplicate request), which beats everyone waiting out LOCK_TTL_SECONDS.
+    """
+    with _held_lock:
+        held = list(_held.items())
+        _held.clear()
+    for token, (backend, key) in held:
+        try:
+            backend.unlock(key, token)
+        except Exception as e:
+            print(f"[!] Could not release cache lock {key}: {e}")
+    return len(held)
+
+
+def availability_key(month: str, facility_id: str) -> str:
+    """Backend key of a facility's availability payload; matches temp/<MONTH>/avail_<ID>.json."""
+    return f"{month}/avail_{facility_id}.json"
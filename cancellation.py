@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+cancellation.py - Cooperative cancellation from the web request down to fetch.py
+
+    browser disconnects
+      → web_frontend.py cancels the agent task
+      → ADKCampgroundAgent cancels its CancelToken (visible to tools via current_token())
+      → run_cancellable() sends the fetch.py child SIGTERM, then SIGKILL after a grace period
+      → fetch.py's SIGTERM handler stops issuing requests; in-flight writes finish atomically,
+        unused rate-limit tokens are refunded and shared-cache locks are released at once
+        (a request still in flight when SIGKILL comes cannot leave its lock behind)
+
+Usage:
+    token = CancelToken()
+    with cancel_scope(token):
+        result = run_cancellable(["python3", "fetch.py", "2025-08"], cwd=".", timeout=600)
+    # from another thread / task:
+    token.cancel()
+"""
+
+from __future__ import annotations
+
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Union
+
+# subprocess is only needed by run_cancellable(); fetch.py imports this module for CancelToken
+# alone and keeps its start-up fast (see benchmark.py IMPORT_BUDGET_S)
+if TYPE_CHECKING:
+    import subprocess
+
+GRACE_SECONDS = 10.0   # time a child gets to finish in-flight writes after SIGTERM
+POLL_SECONDS = 0.2
+
+
+class Cancelled(Exception):
+    """The operation was cancelled because its requester went away."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag that can also be waited on."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep up to timeout seconds, returning early (True) if cancelled."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise Cancelled()
+
+
+_current: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    """Token of the request being served (propagates into asyncio tasks and asyncio.to_thread)."""
+    return _current.get()
+
+
+@contextmanager
+def cancel_scope(token: CancelToken) -> Iterator[CancelToken]:
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def stop_on_signals(token: CancelToken, signals=(signal.SIGTERM, signal.SIGINT),
+                    on_stop: Optional[Callable[[], object]] = None) -> None:
+    """
+    Cancel the token on SIGTERM/SIGINT instead of dying mid-write (main thread only).
+
+    on_stop runs at once in a background thread, so cleanup that must not wait for the grace
+    period (e.g. cache_backend.release_held_locks) happens even if an in-flight request outlasts it.
+    """
+    def handler(signum, frame):
+        token.cancel()
+        if on_stop is not None:
+            threading.Thread(target=on_stop, name="on-stop", daemon=True).start()
+
+    for sig in signals:
+        signal.signal(sig, handler)
+
+
+def terminate(proc: subprocess.Popen, grace: float = GRACE_SECONDS) -> Optional[str]:
+    """SIGTERM the child, then SIGKILL it if it has not exited after the grace period; returns its stdout."""
+    import subprocess
+
+    if proc.poll() is not None:
+        return None
+    proc.terminate()
+    try:
+        stdout, _ = proc.communicate(timeout=grace)  # keep draining pipes so the child can exit cleanly
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        stdout, _ = proc.communicate()
+    return stdout
+
+
+def run_cancellable(cmd: List[str], cwd: Union[str, None] = None, timeout: Optional[float] = None,
+                    token: Optional[CancelToken] = None, grace: float = GRACE_SECONDS) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, capture_output=True, text=True, timeout=...) that also stops on cancellation.
+
+    On timeout or cancellation the child gets SIGTERM and `grace` seconds to finish before
+    SIGKILL. Raises subprocess.TimeoutExpired or Cancelled respectively.
+
+    The child's metrics summary line, if it prints one, is added to this process's metrics
+    and left out of the returned stdout (see metrics.py).
+    """
+    import os
+    import subprocess
+    from metrics import SUBPROCESS_SECONDS, SUMMARY_ENV, absorb_summary
+
+    token = token or current_token()
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                            env=dict(os.environ, **{SUMMARY_ENV: "1"}))
+    waited = 0.0
+    try:
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=POLL_SECONDS)
+                return subprocess.CompletedProcess(cmd, proc.returncode, absorb_summary(stdout), stderr)
+            except subprocess.TimeoutExpired:
+                waited += POLL_SECONDS
+            if token is not None and token.cancelled:
+                absorb_summary(terminate(proc, grace))
+                raise Cancelled()
+            if timeout is not None and waited >= timeout:
+                absorb_summary(terminate(proc, grace))
+                raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        if proc.poll() is None:
+            absorb_summary(terminate(proc, grace))
+        script = Path(cmd[1]).name if len(cmd) > 1 else Path(cmd[0]).name
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - started, script=script)
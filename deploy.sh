@@ -77,7 +77,7 @@ echo "   (This prevents using cached old images)"
 
 # Submit build
 gcloud builds submit --config cloudbuild.yaml \
-    --substitutions _ANTHROPIC_API_KEY="${ANTHROPIC_API_KEY:-}",_GOOGLE_API_KEY="${GOOGLE_API_KEY:-}",_BUILD_TIMESTAMP="$TIMESTAMP"
+    --substitutions _ANTHROPIC_API_KEY="${ANTHROPIC_API_KEY:-}",_GOOGLE_API_KEY="${GOOGLE_API_KEY:-}",_CACHE_URL="${CACHE_URL:-}",_BUILD_TIMESTAMP="$TIMESTAMP"
 
 # Get the service URL
 SERVICE_URL=$(gcloud run services describe $SERVICE_NAME --region=$REGION --format="value(status.url)")
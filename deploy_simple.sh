@@ -94,6 +94,14 @@ if [ ! -z "$GOOGLE_API_KEY" ]; then
         ENV_VARS="GOOGLE_API_KEY=$GOOGLE_API_KEY"
     fi
 fi
+if [ ! -z "$CACHE_URL" ]; then
+    # Shared cache backend so instances share availability payloads (see cache_backend.py)
+    if [ ! -z "$ENV_VARS" ]; then
+        ENV_VARS="$ENV_VARS,CACHE_URL=$CACHE_URL"
+    else
+        ENV_VARS="CACHE_URL=$CACHE_URL"
+    fi
+fi
 
 # Show what will be deployed
 echo "📦 Environment variables to be set:"
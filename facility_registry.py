@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+facility_registry.py - Campground lists per (center, radius) that share one superset
+
+The filtered RIDB campgrounds (with coordinates) are kept once in temp/campgrounds.csv, and
+each search's facility set is computed from that table with a plain haversine filter - no
+RIDB re-read or pandas - and recorded in temp/facility_sets.json:
+
+    {"37.77,-122.42,50": {"center": [37.77, -122.42], "radius": 50, "facility_ids": [...]}, ...}
+
+Because every set is drawn from the same superset and availability files are keyed by
+facility ID, a new search can see which facilities it shares with earlier regions and which
+ones actually need fetching. A repeat search reuses its registered set and only measures the
+distance to those facilities, unless temp/campgrounds.csv has been rebuilt since. Sets not
+re-registered for REGISTRY_MAX_AGE_SECONDS are dropped, and at most REGISTRY_MAX_REGIONS are kept.
+
+Usage:
+    campgrounds = load_campgrounds()
+    registry = FacilityRegistry()
+    nearby = region_facilities(campgrounds, lat, lon, 30, registry)
+    ids = [c["FacilityID"] for c in nearby]
+    cache_dir = month_cache_dir("2025-08")
+    cached, to_fetch = registry.plan(ids, lambda fid: is_cached(fid, cache_dir))
+"""
+
+import csv
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import jsonio
+from geo import haversine_distance
+
+CAMPGROUNDS_CSV = "temp/campgrounds.csv"
+REGISTRY_FILE = "temp/facility_sets.json"
+REGISTRY_MAX_REGIONS = 500
+REGISTRY_MAX_AGE_SECONDS = 30 * 24 * 3600
+CAMPGROUND_COLUMNS = ["FacilityID", "FacilityName", "AddressStateCode", "FacilityLatitude", "FacilityLongitude"]
+
+
+def load_campgrounds(path: Union[str, Path] = CAMPGROUNDS_CSV) -> List[Dict[str, str]]:
+    """Read the campground superset written by fetch.build_campground_table()."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def facilities_within(campgrounds: Iterable[Dict[str, str]], lat: float, lon: float,
+                      radius: float) -> List[Dict[str, object]]:
+    """
+    Campgrounds within `radius` miles of (lat, lon), nearest first.
+
+    Returned rows have the download.csv columns: FacilityID, FacilityName, AddressStateCode,
+    distance_miles.
+    """
+    nearby = []
+    for c in campgrounds:
+        try:
+            d = haversine_distance(lat, lon, float(c["FacilityLatitude"]), float(c["FacilityLongitude"]))
+        except (TypeError, ValueError):
+            continue
+        if d <= radius:
+            nearby.append({
+                "FacilityID": c["FacilityID"],
+                "FacilityName": c["FacilityName"],
+                "AddressStateCode": c["AddressStateCode"],
+                "distance_miles": d,
+            })
+    nearby.sort(key=lambda row: row["distance_miles"])
+    return nearby
+
+
+def region_key(lat: float, lon: float, radius: float) -> str:
+    return f"{lat:.2f},{lon:.2f},{float(radius):g}"
+
+
+class FacilityRegistry:
+    """Persistent map of (center, radius) → facility IDs."""
+
+    def __init__(self, path: Union[str, Path] = REGISTRY_FILE):
+        self.path = Path(path)
+        try:
+            self.regions: Dict[str, dict] = jsonio.load(self.path)
+        except (OSError, *jsonio.DecodeError):
+            self.regions = {}
+
+    def get(self, lat: float, lon: float, radius: float, newer_than: Optional[float] = None) -> Optional[List[str]]:
+        """A registered region's facility IDs, or None if it is unknown or registered before `newer_than`."""
+        region = self.regions.get(region_key(lat, lon, radius))
+        if not region or (newer_than is not None and region.get("updated", 0) < newer_than):
+            return None
+        return region["facility_ids"]
+
+    def register(self, lat: float, lon: float, radius: float, facility_ids: List[str]) -> None:
+        """Record a region's facility set, merged under a lock with regions other processes registered."""
+        key = region_key(lat, lon, radius)
+        region = {
+            "center": [round(lat, 4), round(lon, 4)],
+            "radius": float(radius),
+            "facility_ids": list(facility_ids),
+            "updated": time.time(),
+        }
+
+        def add(regions: Dict[str, dict]) -> Dict[str, dict]:
+            regions[key] = region
+            return _prune(regions)
+
+        self.regions = jsonio.update_locked(self.path, add)
+
+    def overlaps(self, facility_ids: Iterable[str], exclude: Optional[str] = None) -> Dict[str, int]:
+        """Number of facilities shared with each other registered region (non-zero only)."""
+        ids = set(facility_ids)
+        shared = {}
+        for key, region in self.regions.items():
+            if key == exclude:
+                continue
+            n = len(ids.intersection(region["facility_ids"]))
+            if n:
+                shared[key] = n
+        return shared
+
+    def plan(self, facility_ids: Iterable[str], is_cached: Callable[[str], bool]) -> Tuple[List[str], List[str]]:
+        """Split a facility set into (already fetched, still to fetch)."""
+        cached, to_fetch = [], []
+        for fid in facility_ids:
+            (cached if is_cached(fid) else to_fetch).append(fid)
+        return cached, to_fetch
+
+
+def _prune(regions: Dict[str, dict]) -> Dict[str, dict]:
+    """Drop regions older than REGISTRY_MAX_AGE_SECONDS, then all but the newest REGISTRY_MAX_REGIONS."""
+    cutoff = time.time() - REGISTRY_MAX_AGE_SECONDS
+    kept = sorted(((key, region) for key, region in regions.items() if region.get("updated", 0) >= cutoff),
+                  key=lambda item: item[1].get("updated", 0), reverse=True)
+    return dict(kept[:REGISTRY_MAX_REGIONS])
+
+
+def _table_mtime(path: Union[str, Path] = CAMPGROUNDS_CSV) -> Optional[float]:
+    try:
+        return Path(path).stat().st_mtime
+    except OSError:
+        return None
+
+
+def region_facilities(campgrounds: List[Dict[str, str]], lat: float, lon: float, radius: float,
+                      registry: Optional[FacilityRegistry] = None) -> List[Dict[str, object]]:
+    """
+    facilities_within() for a search region, registering its facility set.
+
+    A region registered since the campground table was last built only has the distance to
+    its own facilities computed; anything else is filtered from the whole table and registered.
+    """
+    registry = registry if registry is not None else FacilityRegistry()
+    known = registry.get(lat, lon, radius, newer_than=_table_mtime())
+    if known is not None:
+        by_id = {c["FacilityID"]: c for c in campgrounds}
+        if all(fid in by_id for fid in known):
+            return facilities_within((by_id[fid] for fid in known), lat, lon, radius)
+    rows = facilities_within(campgrounds, lat, lon, radius)
+    registry.register(lat, lon, radius, [str(row["FacilityID"]) for row in rows])
+    return rows
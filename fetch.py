@@ -4,7 +4,7 @@ fetch.py - Fetch availability data from Recreation.gov
 
 1. Auto-downloads campground IDs within specified miles of a location from RIDB if download.csv doesn't exist
 2. Fetches one month of availability for each campground
-3. Rate-limits with randomized delays to appear more human-like
+3. Rate-limits with randomized delays and one token bucket shared by all fetches (rate_limiter.py)
 4. Uses rotating user agents to appear as browser traffic
 5. Produces a single JSON object mapping FacilityID → availability payload
 
@@ -15,33 +15,54 @@ Usage:
     python fetch.py --build-csv --distance 75                  # Build CSV with campgrounds within 75 miles of SF
     python fetch.py --build-csv --location "South Lake Tahoe"  # Build CSV around South Lake Tahoe
     python fetch.py 2025-08 --distance 100 --location "Yosemite"  # Fetch data for campgrounds within 100 miles of Yosemite
+    python fetch.py 2025-08 --workers 0                        # Parse/index the merge on every core
+    python fetch.py 2025-08 --full-merge                       # Re-merge every file, not just the changed ones
+    python fetch.py 2025-08 --location "Yosemite" --workspace   # Per-search download.csv/merged output (safe to run concurrently)
+    python fetch.py 2025-08 --trace-stages                     # Time each stage; JSON report in temp/profiles/
+    python fetch.py --build-csv --refresh-ridb --profile --trace-memory  # + cProfile and tracemalloc (see profiling.py)
 
 Requirements:
     pip install requests pandas tqdm
+    pip install orjson                 # Optional: faster JSON merge (see jsonio.py)
+    pip install "httpx[http2]"         # Optional: --http2 multiplexes parallel fetches on one connection
+    pip install zstandard              # Optional: CACHE_COMPRESSION=zstd (gzip needs nothing extra)
+    pip install redis                  # Optional: CACHE_URL=redis://... shares fetches across instances
 
 Creates:
     download.csv              # Campgrounds within specified miles of location (auto-generated)
-    temp/avail_<ID>.json     # Individual availability files
+    temp/campgrounds.csv      # All reservable RIDB campgrounds, shared by every search
+    temp/facility_sets.json   # Facility IDs per (center, radius) search
+    temp/<MONTH>/avail_<ID>.json  # Individual availability files (shared cache; older flat
+                                  # temp/avail_<ID>.json files are linked in on first run, see avail_cache.py)
     all_avail_<MONTH>.json   # Merged availability data
+    all_avail_<MONTH>.index.json  # Date → Available sites query index (see availability_index.py)
+    all_avail_<MONTH>.manifest.json  # What the last merge contained, so the next one only re-merges changes
 """
 
+from __future__ import annotations
+
 import csv
-import json
 import os
 import random
 import sys
-import time
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
-import requests
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Optional
 from urllib.parse import quote
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-import io
-import zipfile
-import pandas as pd
-from tqdm import tqdm
-import math
+
+from avail_cache import is_cached, month_cache_dir
+from cancellation import CancelToken
+from geo import DEFAULT_LAT, DEFAULT_LON, geocode_location
+
+if TYPE_CHECKING:
+    from http_client import FetchClient
+
+# Set by SIGTERM/SIGINT (see main): stop issuing requests, but let in-flight writes finish
+STOP = CancelToken()
+
+# requests, pandas, tqdm and zipfile - and this repo's own cache, index, metrics and profiling
+# modules - are imported inside the functions that need them so that `import fetch` and a
+# warm-cache run (`python fetch.py 2025-08` with every avail_<ID>.json present) start fast.
+# benchmark.py checks the import against IMPORT_BUDGET_S.
 
 # Constants for RIDB data
 RIDB_URL = "https://ridb.recreation.gov/downloads/RIDBFullExport_V1_CSV.zip"
@@ -50,9 +71,6 @@ FAC_CSV = "Facilities_API_v1.csv"
 ADDR_CSV = "FacilityAddresses_API_v1.csv"
 DOWNLOAD_CSV = "download.csv"
 
-# Default location: San Francisco coordinates (approximately downtown)
-DEFAULT_LAT = 37.7749
-DEFAULT_LON = -122.4194
 MAX_DISTANCE_MILES = 150
 
 # User agents to rotate through for human-like requests
@@ -83,61 +101,6 @@ def get_random_headers() -> Dict[str, str]:
     }
 
 
-def geocode_location(location: str) -> Tuple[float, float]:
-    """
-    Geocode a location name to latitude and longitude using a free geocoding service.
-    Returns (latitude, longitude) tuple.
-    """
-    # Using Nominatim (OpenStreetMap) free geocoding service
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        'q': location,
-        'format': 'json',
-        'limit': 1,
-        'countrycodes': 'us'  # Limit to US since this is for US campgrounds
-    }
-    headers = {
-        'User-Agent': 'campground-finder/1.0 (https://github.com/user/repo)'
-    }
-    
-    try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        results = response.json()
-        
-        if not results:
-            raise ValueError(f"Location '{location}' not found")
-        
-        result = results[0]
-        lat = float(result['lat'])
-        lon = float(result['lon'])
-        
-        print(f"[✓] Geocoded '{location}' to ({lat:.4f}, {lon:.4f})")
-        return lat, lon
-        
-    except requests.exceptions.RequestException as e:
-        raise ValueError(f"Failed to geocode '{location}': {e}")
-    except (KeyError, ValueError, IndexError) as e:
-        raise ValueError(f"Invalid geocoding response for '{location}': {e}")
-
-
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate the great circle distance between two points on Earth in miles."""
-    # Convert latitude and longitude from degrees to radians
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    
-    # Haversine formula
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    # Radius of earth in miles
-    r = 3956
-    
-    return c * r
-
-
 def random_sleep(base_delay: float = 0.6) -> None:
     """Sleep for a randomized duration to appear more human-like."""
     # Add random variation: 80% to 150% of base delay
@@ -146,7 +109,7 @@ def random_sleep(base_delay: float = 0.6) -> None:
     # Add occasional longer pauses (5% chance)
     if random.random() < 0.05:
         delay += random.uniform(2, 5)
-    time.sleep(delay)
+    STOP.wait(delay)  # returns early when the fetch is cancelled
 
 
 def fetch_ridb_zip(url: str, local_name: str) -> Path:
@@ -156,8 +119,12 @@ def fetch_ridb_zip(url: str, local_name: str) -> Path:
         print(f"[✓] Using cached {local_name} ({p.stat().st_size/1e6:.1f} MB)")
         return p
 
+    import requests
+    from tqdm import tqdm
+    from profiling import trace_stage
+
     print(f"[→] Downloading {url} ...")
-    with requests.get(url, stream=True) as r:
+    with trace_stage("ridb_download") as info, requests.get(url, stream=True) as r:
         r.raise_for_status()
         total = int(r.headers.get("Content-Length", 0))
         with open(p, "wb") as f, tqdm(
@@ -166,12 +133,21 @@ def fetch_ridb_zip(url: str, local_name: str) -> Path:
             for chunk in r.iter_content(chunk_size=1 << 20):
                 f.write(chunk)
                 bar.update(len(chunk))
+        info["bytes"] = p.stat().st_size
     return p
 
 
-def build_download_csv(start_zip: Path, max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None) -> None:
-    """Build download.csv from RIDB data - campgrounds within specified miles of given location."""
-    with zipfile.ZipFile(start_zip) as z:
+def build_campground_table(start_zip: Path) -> None:
+    """
+    Write temp/campgrounds.csv from RIDB data - every reservable campground with coordinates.
+
+    This superset is shared by all searches; select_region() filters it per (center, radius).
+    """
+    import zipfile
+    import pandas as pd
+    from profiling import trace_stage
+
+    with trace_stage("csv_read"), zipfile.ZipFile(start_zip) as z:
         print("[→] Reading Facilities …")
         fac = pd.read_csv(
             z.open(FAC_CSV),
@@ -191,25 +167,48 @@ def build_download_csv(start_zip: Path, max_distance: float = MAX_DISTANCE_MILES
             usecols=["FacilityID", "AddressStateCode"],
         )
 
-    print("[→] Filtering reservable campgrounds …")
-    # Filter out boat/sailing facilities by name patterns
-    boat_patterns = r'(?i)(boat|sailing|aquatic|anchor|marina|pier|dock|vessel)'
-    
-    camp = fac[
-        (fac["FacilityTypeDescription"] == "Campground")
-        & (fac["Reservable"].astype(str).str.lower() == "true")
-        & (fac["FacilityLatitude"].notna())
-        & (fac["FacilityLongitude"].notna())
-        & (~fac["FacilityName"].str.contains(boat_patterns, na=False))
-    ]
-
-    print("[→] Joining with address data …")
-    # Ensure FacilityID columns have the same data type
-    camp['FacilityID'] = camp['FacilityID'].astype(str)
-    addr['FacilityID'] = addr['FacilityID'].astype(str)
-    
-    merged = camp.merge(addr, on="FacilityID", how="inner")
-    
+    with trace_stage("filter_join") as info:
+        print("[→] Filtering reservable campgrounds …")
+        # Filter out boat/sailing facilities by name patterns
+        boat_patterns = r'(?i)(boat|sailing|aquatic|anchor|marina|pier|dock|vessel)'
+        
+        camp = fac[
+            (fac["FacilityTypeDescription"] == "Campground")
+            & (fac["Reservable"].astype(str).str.lower() == "true")
+            & (fac["FacilityLatitude"].notna())
+            & (fac["FacilityLongitude"].notna())
+            & (~fac["FacilityName"].str.contains(boat_patterns, na=False))
+        ]
+
+        print("[→] Joining with address data …")
+        # Ensure FacilityID columns have the same data type
+        camp['FacilityID'] = camp['FacilityID'].astype(str)
+        addr['FacilityID'] = addr['FacilityID'].astype(str)
+        
+        merged = camp.merge(addr, on="FacilityID", how="inner")
+
+        from facility_registry import CAMPGROUNDS_CSV, CAMPGROUND_COLUMNS
+
+        table = merged[CAMPGROUND_COLUMNS].drop_duplicates(subset="FacilityID").reset_index(drop=True)
+        info.update(facilities=len(fac), campgrounds=len(table))
+    with trace_stage("write", file=CAMPGROUNDS_CSV):
+        Path(CAMPGROUNDS_CSV).parent.mkdir(parents=True, exist_ok=True)
+        table.to_csv(CAMPGROUNDS_CSV, index=False)
+    print(f"[✓] Wrote {CAMPGROUNDS_CSV} ({len(table)} campgrounds)")
+
+
+def select_region(max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None,
+                  month: Optional[str] = None) -> List[str]:
+    """
+    Write download.csv for one search from the shared campground table and register it.
+
+    Reports which facilities are shared with previously registered regions and, given the
+    month about to be fetched, how many of them are already in that month's cache.
+    Returns the selected facility IDs.
+    """
+    from facility_registry import FacilityRegistry, load_campgrounds, region_facilities, region_key
+    from profiling import trace_stage
+
     # Determine center coordinates
     if location:
         center_lat, center_lon = geocode_location(location)
@@ -217,45 +216,82 @@ def build_download_csv(start_zip: Path, max_distance: float = MAX_DISTANCE_MILES
     else:
         center_lat, center_lon = DEFAULT_LAT, DEFAULT_LON
         location_name = "San Francisco"
-    
-    print(f"[→] Calculating distances from {location_name} ({center_lat:.4f}, {center_lon:.4f}) …")
-    # Calculate distance for each campground
-    merged['distance_miles'] = merged.apply(
-        lambda row: haversine_distance(
-            center_lat, center_lon, 
-            float(row['FacilityLatitude']), float(row['FacilityLongitude'])
-        ), axis=1
-    )
-    
-    print(f"[→] Filtering campgrounds within {max_distance} miles of {location_name} …")
-    nearby = merged[merged['distance_miles'] <= max_distance]
-    
-    # Select final columns and sort
-    result = (
-        nearby[["FacilityID", "FacilityName", "AddressStateCode", "distance_miles"]]
-        .drop_duplicates()
-        .sort_values("distance_miles")
-        .reset_index(drop=True)
-    )
+
+    print(f"[→] Filtering campgrounds within {max_distance} miles of {location_name} ({center_lat:.4f}, {center_lon:.4f}) …")
+    registry = FacilityRegistry()
+    with trace_stage("csv_read", file="campgrounds.csv"):
+        campgrounds = load_campgrounds()
+    with trace_stage("distance_calc", candidates=len(campgrounds)):
+        result = region_facilities(campgrounds, center_lat, center_lon, max_distance, registry)
+    facility_ids = [row["FacilityID"] for row in result]
 
     print(f"[✓] Writing {DOWNLOAD_CSV} ({len(result)} rows)")
     # Save with distance info for reference
-    result.to_csv(DOWNLOAD_CSV, index=False)
-    
-    states = result['AddressStateCode'].dropna().unique()
-    print(f"[✓] Found campgrounds in states: {sorted(states)}")
-    print(f"[✓] Distance range: {result['distance_miles'].min():.1f} - {result['distance_miles'].max():.1f} miles")
+    with trace_stage("write", file=DOWNLOAD_CSV), open(DOWNLOAD_CSV, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["FacilityID", "FacilityName", "AddressStateCode", "distance_miles"])
+        writer.writeheader()
+        writer.writerows(result)
+
+    if result:
+        states = {row["AddressStateCode"] for row in result if row["AddressStateCode"]}
+        print(f"[✓] Found campgrounds in states: {sorted(states)}")
+        print(f"[✓] Distance range: {result[0]['distance_miles']:.1f} - {result[-1]['distance_miles']:.1f} miles")
+
+    key = region_key(center_lat, center_lon, max_distance)
+    for other, shared in registry.overlaps(facility_ids, exclude=key).items():
+        print(f"[✓] Shares {shared} campground(s) with region {other}")
+    if month:
+        cache_dir = month_cache_dir(month)
+        cached, to_fetch = registry.plan(facility_ids, lambda fid: is_cached(fid, cache_dir))
+        print(f"[✓] {len(cached)} campground(s) already fetched for {month}, {len(to_fetch)} to fetch")
+    return facility_ids
+
+
+def build_download_csv(start_zip: Path, max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None,
+                       month: Optional[str] = None) -> None:
+    """Build download.csv from RIDB data - campgrounds within specified miles of given location."""
+    build_campground_table(start_zip)
+    select_region(max_distance, location, month)
 
 
-def ensure_download_csv(max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None) -> None:
+def ensure_download_csv(max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None,
+                        month: Optional[str] = None) -> None:
     """Ensure download.csv exists, creating it from RIDB data if needed."""
     if Path(DOWNLOAD_CSV).exists():
         print(f"[✓] Using existing {DOWNLOAD_CSV}")
         return
     
     print(f"[!] {DOWNLOAD_CSV} not found, building from RIDB data...")
-    zip_path = fetch_ridb_zip(RIDB_URL, ZIP_NAME)
-    build_download_csv(zip_path, max_distance, location)
+    build_region_csv(max_distance, location, month=month)
+
+
+def ensure_campground_table(refresh_ridb: bool = False) -> None:
+    """Ensure the shared temp/campgrounds.csv exists, building it from RIDB data if needed."""
+    from facility_registry import CAMPGROUNDS_CSV
+
+    if Path(CAMPGROUNDS_CSV).exists() and not refresh_ridb:
+        print(f"[✓] Using shared campground table {CAMPGROUNDS_CSV}")
+        return
+    build_campground_table(fetch_ridb_zip(RIDB_URL, ZIP_NAME))
+
+
+def build_region_csv(max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None,
+                     refresh_ridb: bool = False, month: Optional[str] = None) -> None:
+    """Build download.csv, reusing the shared campground table when it exists (no pandas needed)."""
+    ensure_campground_table(refresh_ridb)
+    select_region(max_distance, location, month)
+
+
+def open_workspace(max_distance: float = MAX_DISTANCE_MILES, location: Optional[str] = None,
+                   refresh_ridb: bool = False):
+    """Open the per-search workspace for a region and write its download.csv."""
+    from workspace import Workspace
+
+    ensure_campground_table(refresh_ridb)
+    ws = Workspace.for_location(location, max_distance)
+    ws.write_download_csv()
+    print(f"[✓] Workspace {ws.root} ({len(ws.facility_ids)} campgrounds)")
+    return ws
 
 
 def read_facility_ids(csv_file: str = DOWNLOAD_CSV) -> List[str]:
@@ -270,121 +306,288 @@ def read_facility_ids(csv_file: str = DOWNLOAD_CSV) -> List[str]:
     return ids
 
 
-def fetch_availability(facility_id: str, month: str, temp_dir: Path, session: requests.Session) -> bool:
+def new_session(pool_size: int = 1, http2: bool = False) -> FetchClient:
+    """Create a pooled HTTP client with one browser-like header set, importing requests/httpx on first use."""
+    from http_client import FetchClient
+
+    return FetchClient(pool_size=pool_size, http2=http2, headers=get_random_headers())
+
+
+def fetch_availability(facility_id: str, month: str, temp_dir: Path, session: FetchClient,
+                       max_age: Optional[float] = None, cancel: Optional[CancelToken] = None) -> bool:
     """
     Fetch availability data for a single facility.
     Returns True if successful, False otherwise.
+
+    See fetch_outcome() for the details, and for telling a real request from a cache hit.
+    """
+    return fetch_outcome(facility_id, month, temp_dir, session, max_age, cancel) is not None
+
+
+def fetch_outcome(facility_id: str, month: str, temp_dir: Path, session: FetchClient,
+                  max_age: Optional[float] = None, cancel: Optional[CancelToken] = None) -> Optional[str]:
+    """
+    fetch_availability(), returning how the payload was obtained: "cached" (already in
+    temp_dir), "shared" (another instance fetched it), "fetched" (this call made the request),
+    or None on failure.
+
+    Cold fetches go through the shared cache backend (see cache_backend.py): if another instance
+    already has the payload it is copied locally, and if another instance is fetching it right
+    now this call waits for that result instead of issuing a second request. With max_age
+    (seconds), payloads older than that are refreshed instead of reused. `cancel` (default: the
+    process-wide STOP token) aborts a fetch that is still waiting for rate budget.
     """
+    import jsonio
+    from cache_backend import availability_key, get_backend
+    from metrics import CACHE_LOOKUPS, FACILITY_FETCHES
+
     output_file = temp_dir / f"avail_{facility_id}.json"
-    temp_file = temp_dir / f"avail_{facility_id}.json.tmp"
     
     # Skip if already exists and is non-empty
-    if output_file.exists() and output_file.stat().st_size > 0:
+    if is_cached(facility_id, temp_dir, max_age):
         print(f"skipped (already exists)")
-        return True
-    
+        record_cache_hits()
+        return "cached"
+
+    backend = get_backend()
+    key = availability_key(month, facility_id)
+    data, produced = backend.single_flight(
+        key, lambda: _download_availability(facility_id, month, session, cancel or STOP), max_age=max_age)
+    if data is None:
+        CACHE_LOOKUPS.inc(cache="availability", result="miss")
+        FACILITY_FETCHES.inc(outcome="failed")
+        return None
+    CACHE_LOOKUPS.inc(cache="availability", result="miss" if produced else "shared")
+    FACILITY_FETCHES.inc(outcome="fetched")
+
+    # The default backend stores exactly this file; other backends are mirrored into temp/
+    shared_path = backend.local_path(key)
+    if shared_path is None or shared_path.resolve() != output_file.resolve():
+        jsonio.write_compressed_atomic(output_file, data)
+    print("done" if produced else "done (shared cache)")
+    return "fetched" if produced else "shared"
+
+
+def record_cache_hits(count: int = 1) -> None:
+    """Count facilities served from temp/<MONTH>/ without a fetch, for callers that check is_cached() first."""
+    from metrics import CACHE_LOOKUPS, FACILITY_FETCHES
+
+    CACHE_LOOKUPS.inc(count, cache="availability", result="hit")
+    FACILITY_FETCHES.inc(count, outcome="cached")
+
+
+def _download_availability(facility_id: str, month: str, session: FetchClient,
+                           cancel: CancelToken = STOP) -> Optional[bytes]:
+    """GET one facility's month of availability; returns the raw JSON body, or None on failure."""
+    import jsonio
+    from metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+    from profiling import trace_stage
+    from rate_limiter import get_rate_limiter
+
     # Construct URL with properly encoded date
     start_date = f"{month}-01T00:00:00.000Z"
     url = f"https://www.recreation.gov/api/camps/availability/campground/{facility_id}/month?start_date={quote(start_date)}"
     
+    # Every upstream request, from any process or instance, draws from one shared budget
+    limiter = get_rate_limiter()
+    if not limiter.acquire(cancel=cancel):
+        print("cancelled")
+        return None
+    if cancel.cancelled:
+        limiter.refund()  # cancelled while taking the token: give the budget back
+        print("cancelled")
+        return None
+
     try:
-        # Make request with browser-like headers
-        response = session.get(
-            url,
-            headers=get_random_headers(),
-            timeout=30,
-            allow_redirects=True
-        )
+        # Headers (and the User-Agent) are fixed per client, so connections are reused
+        with trace_stage("http_fetch", facility_id=facility_id) as info, UPSTREAM_SECONDS.time():
+            response = session.get(url, timeout=30)
+            info.update(status=response.status_code, bytes=len(response.content))
+        UPSTREAM_REQUESTS.inc(status=str(response.status_code))
         
         # Handle rate limiting
         if response.status_code == 429:
             print(f"rate limited (429)")
-            if temp_file.exists():
-                temp_file.unlink()
-            return False
+            limiter.backoff()
+            return None
         
         response.raise_for_status()
-        
-        # Save to temporary file first
-        with open(temp_file, 'w', encoding='utf-8') as f:
-            json.dump(response.json(), f)
-        
-        # Move to final location (atomic operation)
-        temp_file.rename(output_file)
-        print("done")
-        return True
-        
-    except requests.exceptions.HTTPError as e:
-        print(f"failed (HTTP {e.response.status_code})")
-        # Clean up any partial file
-        if temp_file.exists():
-            temp_file.unlink()
-        return False
-    except requests.exceptions.RequestException as e:
-        print(f"failed ({type(e).__name__})")
-        # Clean up any partial file
-        if temp_file.exists():
-            temp_file.unlink()
-        return False
-
-
-def merge_availability_files(temp_dir: Path, month: str) -> None:
-    """Merge individual availability JSON files into a single file."""
-    output_file = Path(f"all_avail_{month}.json")
-    temp_merged = output_file.with_suffix('.json.tmpmerge')
+        # The raw body is stored as-is (no re-encoding), but only once it is known to be a JSON
+        # object: an HTML/captcha/maintenance page served with 200 must not enter the shared cache
+        try:
+            payload = jsonio.loads(response.content)
+        except jsonio.DecodeError:
+            payload = None
+        if not isinstance(payload, dict):
+            print("failed (response is not a JSON object)")
+            return None
+        return response.content
+
+    except session.errors as e:
+        response = getattr(e, "response", None)
+        if response is None:
+            UPSTREAM_REQUESTS.inc(status="error")
+        if response is not None:
+            print(f"failed (HTTP {response.status_code})")
+        else:
+            print(f"failed ({type(e).__name__})")
+        return None
+
+
+def merge_availability_files(temp_dir: Path, month: str, facility_ids: Optional[List[str]] = None,
+                             output_file: Optional[Path] = None, workers: int = 1, full: bool = False) -> None:
+    """
+    Merge individual availability JSON files into a single file.
+
+    Each payload is validated with the fast JSON backend and then spliced into the merged
+    object as raw bytes, so nothing is re-encoded. The decoded payloads are compacted and
+    used to write the query index (all_avail_<MONTH>.index.json) alongside.
+
+    Parsing and indexing are incremental: a manifest (all_avail_<MONTH>.manifest.json, see
+    merge_manifest.py) records each facility's file size/mtime and its segment of the merged
+    file, so files that have not changed since the last merge keep their index entries and their
+    segments are copied file-to-file (merge_manifest.write_merged), never read into memory; only
+    new or changed files are read, parsed and indexed. The merged file is still replaced whole,
+    so readers never see it half-updated. When nothing changed, nothing is read or written.
+
+    Args:
+        temp_dir: Directory of avail_<ID>.json files for the month
+        month: Month being merged (YYYY-MM)
+        facility_ids: Only merge these facilities (default: every file in temp_dir)
+        output_file: Merged file path (default: all_avail_<MONTH>.json in the CWD)
+        workers: Processes used to parse, compact and index the payloads (0 = one per core);
+            see parallel_analysis.py
+        full: Ignore the manifest and re-merge every file
+    """
+    import jsonio
+    from availability_index import AvailabilityIndex, index_path_for
+    from availability_model import Campground
+    from merge_manifest import MergeManifest, file_stamp, write_merged
+    from profiling import trace_stage
+
+    output_file = Path(output_file or f"all_avail_{month}.json")
+    index_file = index_path_for(output_file)
     
     # Find all availability files
-    avail_files = list(temp_dir.glob('avail_*.json'))
+    if facility_ids is None:
+        avail_files = list(temp_dir.glob('avail_*.json'))
+    else:
+        avail_files = [temp_dir / f"avail_{fid}.json" for fid in facility_ids]
+        avail_files = [p for p in avail_files if p.exists()]
     
     if not avail_files:
         print(f"No avail_*.json files found to merge. Creating an empty JSON object: {output_file}")
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump({}, f)
+        jsonio.write_atomic(output_file, b"{}")
+        AvailabilityIndex.build({}).save(index_file)
         return
     
     print(f"Found {len(avail_files)} 'avail_*.json' file(s) to merge.")
-    
-    # Build merged JSON object
-    merged_data = {}
-    
+
+    # Stamp each file before reading it, so a file rewritten during the merge is re-merged next time
+    files: Dict[str, Path] = {}
+    stamps = {}
     for avail_file in avail_files:
+        stamp = file_stamp(avail_file)
         # Skip empty files
-        if avail_file.stat().st_size == 0:
+        if stamp["size"] == 0:
             print(f"Warning: Skipping empty file during merge: {avail_file.name}")
             continue
-        
-        # Extract ID from filename
         facility_id = avail_file.stem.replace('avail_', '')
-        
+        files[facility_id] = avail_file
+        stamps[facility_id] = stamp
+
+    manifest = None if full else MergeManifest.load_for(output_file)
+    previous_index = None
+    if manifest is not None:
         try:
-            with open(avail_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                merged_data[facility_id] = data
-        except json.JSONDecodeError:
-            print(f"Warning: Skipping invalid JSON file: {avail_file.name}")
-            continue
-    
-    # Write merged data
-    with open(temp_merged, 'w', encoding='utf-8') as f:
-        json.dump(merged_data, f)
-    
-    # Atomically replace
-    temp_merged.rename(output_file)
+            previous_index = AvailabilityIndex.load(index_file)
+        except (OSError, KeyError, ValueError, *jsonio.DecodeError):
+            manifest = None
+    reused = [fid for fid in files if manifest is not None and manifest.unchanged(fid, stamps[fid])]
+    reused_ids = set(reused)
+    to_parse = [fid for fid in files if fid not in reused_ids]
+    dropped = set(manifest.facilities) - reused_ids if manifest is not None else set()
+    if manifest is not None:
+        if not to_parse and not dropped:
+            print(f"[✓] {output_file} is up to date ({len(reused)} unchanged file(s))")
+            return
+        print(f"    {len(reused)} unchanged, {len(to_parse)} new or changed, "
+              f"{len(dropped - set(to_parse))} removed")
+
+    # Build merged JSON object from raw payload bytes
+    invalid_ids = [fid for fid in reused if manifest.facilities[fid]["offset"] is None]
+    campgrounds = {}
+    index = None
+
+    with trace_stage("merge_read", files=len(to_parse), reused=len(reused), workers=workers):
+        # Unchanged segments in their order in the old file, so adjacent ones are copied as one range
+        segments = sorted(((fid, manifest.span(fid)) for fid in reused if fid not in invalid_ids),
+                          key=lambda item: item[1][0])
+        if workers != 1:
+            # Read, decode, compact and index in worker processes; only splice the bytes they return here
+            from parallel_analysis import compact_and_index
+
+            valid, invalid, index = compact_and_index([files[fid] for fid in to_parse], workers)
+            for name in invalid:
+                print(f"Warning: Skipping invalid JSON file: {name}")
+            for facility_id in to_parse:
+                if facility_id in valid:
+                    segments.append((facility_id, jsonio.dumps(facility_id) + b":" + valid.pop(facility_id)))
+                else:
+                    invalid_ids.append(facility_id)
+        else:
+            for facility_id in to_parse:
+                avail_file = files[facility_id]
+                try:
+                    raw = jsonio.read_bytes(avail_file)
+                    payload = jsonio.loads(raw)
+                except (OSError, *jsonio.DecodeError):
+                    payload = None
+                if not isinstance(payload, dict):
+                    print(f"Warning: Skipping invalid JSON file: {avail_file.name}")
+                    invalid_ids.append(facility_id)
+                    continue
+                segments.append((facility_id, jsonio.dumps(facility_id) + b":" + raw.strip()))
+                campgrounds[facility_id] = Campground(facility_id, payload)
+                campgrounds[facility_id].campsites  # compact now so the raw dict can be released
+    
+    # Write merged data atomically, never compressed: jq and the analysis scripts read it as is
+    with trace_stage("merge_write", file=str(output_file)):
+        layout = write_merged(output_file, segments, previous=output_file if reused else None)
     print(f"Merged availability written to {output_file}")
 
+    with trace_stage("index_build", incremental=previous_index is not None):
+        index = index or AvailabilityIndex.build(campgrounds)
+        if previous_index is not None:
+            index = AvailabilityIndex.merge([previous_index.without(dropped), index])
+    with trace_stage("index_write"):
+        index.save(index_file)
+    print(f"Query index written to {index_file}")
+
+    # Written last: a manifest only describes a merged file and index that were both completed
+    entries = {fid: dict(stamps[fid], offset=offset, length=length) for fid, (offset, length) in layout.items()}
+    entries.update({fid: dict(stamps[fid], offset=None, length=0) for fid in invalid_ids})
+    MergeManifest(file_stamp(output_file), entries).save_for(output_file)
+
+
+def fetch_parallel(facility_ids: List[str], month: str, temp_dir: Path, max_workers: int = 10,
+                   http2: bool = False) -> None:
+    """Fetch availability data in parallel over one shared connection pool."""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def fetch_parallel(facility_ids: List[str], month: str, temp_dir: Path, max_workers: int = 10) -> None:
-    """Fetch availability data in parallel."""
     print(f"\nUsing parallel mode with {max_workers} workers")
     
-    # Create a session for each thread
+    # One client for all workers, with a connection pool sized to the worker count
+    session = new_session(pool_size=max_workers, http2=http2)
+
     def worker(facility_id: str, i: int, total: int):
-        session = requests.Session()
+        if STOP.cancelled:
+            return None
         print(f"[{i:4d}/{total:4d}] ID {facility_id} ... ", end='', flush=True)
         return fetch_availability(facility_id, month, temp_dir, session)
     
     failed_count = 0
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
         # Submit all tasks
         future_to_id = {
             executor.submit(worker, fid, i, len(facility_ids)): (fid, i) 
@@ -394,38 +597,92 @@ def fetch_parallel(facility_ids: List[str], month: str, temp_dir: Path, max_work
         # Process completed tasks
         for future in as_completed(future_to_id):
             facility_id, i = future_to_id[future]
+            if STOP.cancelled:
+                # Drop queued work; running workers finish their current facility
+                for pending in future_to_id:
+                    pending.cancel()
+            if future.cancelled():
+                continue
             try:
                 success = future.result()
+                if success is None:
+                    continue
                 if not success:
                     failed_count += 1
             except Exception as e:
                 print(f"[{i:4d}/{len(facility_ids):4d}] ID {facility_id} ... failed ({type(e).__name__})")
                 failed_count += 1
+        print_connection_stats(session)
     
     if failed_count > 0:
         print(f"\nWarning: {failed_count} downloads failed")
 
 
+def print_connection_stats(session: FetchClient) -> None:
+    stats = session.stats()
+    print(f"\n[✓] {stats['requests']} requests over {stats['connections']} connections ({stats['backend']})")
+
+
 def main():
     import argparse
+    from cache_backend import release_held_locks
+    from cancellation import stop_on_signals
+    from metrics import write_summary
+    from profiling import profile_session
     
     parser = argparse.ArgumentParser(description="Fetch campground availability data from Recreation.gov")
     parser.add_argument("month", nargs="?", help="Month to fetch (YYYY-MM format)")
     parser.add_argument("--parallel", action="store_true", help="Use parallel requests (faster but may hit rate limits)")
+    parser.add_argument("--http2", action="store_true",
+                       help="Multiplex requests over HTTP/2 (needs 'pip install httpx[http2]')")
+    parser.add_argument("--workers", type=int, default=1,
+                       help="Processes for parsing/indexing during the merge (0 = one per core; default: 1)")
+    parser.add_argument("--full-merge", action="store_true",
+                       help="Re-merge every availability file instead of only those changed since the last merge")
     parser.add_argument("--build-csv", action="store_true", help="Force rebuild download.csv from RIDB data")
+    parser.add_argument("--workspace", action="store_true",
+                       help="Keep download.csv and merged output in a per-search temp/workspaces/<region>/ directory")
+    parser.add_argument("--refresh-ridb", action="store_true",
+                       help="With --build-csv, re-read the RIDB export instead of the shared temp/campgrounds.csv")
     parser.add_argument("--distance", type=float, default=MAX_DISTANCE_MILES, 
                        help=f"Maximum distance in miles (default: {MAX_DISTANCE_MILES})")
     parser.add_argument("--location", type=str, default=None,
                        help="Location to search around (default: San Francisco). Examples: 'South Lake Tahoe', 'Yosemite', 'Los Angeles'")
+    parser.add_argument("--trace-stages", action="store_true",
+                       help="Time each stage (download, CSV read, filter/join, distance, fetches, merge, write) and write a JSON report")
+    parser.add_argument("--trace-memory", action="store_true",
+                       help="With stage tracing, also track memory per stage with tracemalloc (slower)")
+    parser.add_argument("--profile", action="store_true",
+                       help="With stage tracing, also run cProfile (main and --parallel worker threads) and save a .prof file next to the report")
+    parser.add_argument("--profile-report", type=str, default=None,
+                       help="Report path for --trace-stages/--trace-memory/--profile (default: temp/profiles/fetch_<time>.json)")
     
     args = parser.parse_args()
+    stop_on_signals(STOP, on_stop=release_held_locks)
+    
+    try:
+        if args.trace_stages or args.trace_memory or args.profile:
+            with profile_session(args.profile_report, cpu=args.profile, memory=args.trace_memory):
+                run(args, parser)
+        else:
+            run(args, parser)
+    finally:
+        # Upstream requests, cache lookups and fetch outcomes for the parent's /metrics
+        write_summary()
+
+
+def run(args, parser) -> None:
+    """Carry out the fetch.py command line (after argument parsing)."""
+    from profiling import trace_stage
     
     # Handle special case for building CSV
     if args.build_csv:
         location_text = args.location if args.location else "San Francisco"
         print(f"Building download.csv from RIDB data (max distance: {args.distance} miles from {location_text})...")
-        zip_path = fetch_ridb_zip(RIDB_URL, ZIP_NAME)
-        build_download_csv(zip_path, args.distance, args.location)
+        if args.workspace:
+            open_workspace(args.distance, args.location, args.refresh_ridb)
+        else:
+            build_region_csv(args.distance, args.location, args.refresh_ridb, args.month)
         print("Done!")
         return
     
@@ -435,46 +692,77 @@ def main():
     month = args.month
     parallel = args.parallel
     
-    # Create temp directory
-    temp_dir = Path("temp")
-    temp_dir.mkdir(exist_ok=True)
-    
-    # Ensure download.csv exists with the specified distance and location
-    ensure_download_csv(args.distance, args.location)
+    # Create the shared cache directory for this month
+    temp_dir = month_cache_dir(month)
+    temp_dir.mkdir(parents=True, exist_ok=True)
     
-    print("Reading IDs from download.csv...")
-    facility_ids = read_facility_ids()
+    if args.workspace:
+        # Per-search facility set, held in memory; outputs go to the workspace directory
+        ws = open_workspace(args.distance, args.location)
+        facility_ids = ws.facility_ids
+        merged_file = ws.merged_file(month)
+    else:
+        # Ensure download.csv exists with the specified distance and location
+        ensure_download_csv(args.distance, args.location, month)
+
+        print("Reading IDs from download.csv...")
+        facility_ids = read_facility_ids()
+        merged_file = Path(f"all_avail_{month}.json")
     total = len(facility_ids)
     print(f"Found {total} Facility IDs")
     
     if parallel:
-        # Parallel mode
-        fetch_parallel(facility_ids, month, temp_dir)
+        # Parallel mode - only cache misses go through the worker pool
+        pending = [fid for fid in facility_ids if not is_cached(fid, temp_dir)]
+        print(f"{total - len(pending)} already cached, {len(pending)} to fetch")
+        record_cache_hits(total - len(pending))
+        if pending:
+            fetch_parallel(pending, month, temp_dir, http2=args.http2)
     else:
         # Sequential mode (default)
-        # Create a session for connection pooling
-        session = requests.Session()
+        # The session (and the requests import) is only created on the first cache miss
+        session = None
         
         # Fetch loop
         for i, facility_id in enumerate(facility_ids, 1):
+            if STOP.cancelled:
+                break
             print(f"[{i:4d}/{total:4d}] ID {facility_id} ... ", end='', flush=True)
+
+            if is_cached(facility_id, temp_dir):
+                print("skipped (already exists)")
+                record_cache_hits()
+                continue
+
+            if session is None:
+                session = new_session(http2=args.http2)
             
             success = fetch_availability(facility_id, month, temp_dir, session)
             
-            if not success:
+            if not success and not STOP.cancelled:
                 # Exit on failure like the bash script
                 sys.exit(1)
             
-            # Random delay between requests
+            # Random delay between requests (cache hits above never sleep)
             if i < total:  # Don't sleep after the last request
                 random_sleep()
+
+        if session is not None:
+            print_connection_stats(session)
+            session.close()
+
+    if STOP.cancelled:
+        print("\n[!] Cancelled; payloads fetched so far stay in the shared cache")
+        sys.exit(130)
     
     print()  # New line for better output separation
-    print(f"Merging into all_avail_{month}.json ...")
-    merge_availability_files(temp_dir, month)
+    print(f"Merging into {merged_file} ...")
+    with trace_stage("merge", month=month):
+        merge_availability_files(temp_dir, month, facility_ids, merged_file, workers=args.workers,
+                                 full=args.full_merge)
     
     print("\nExample query:")
-    print(f'  jq \'.[\"232450\"].campsites | keys[0]\' all_avail_{month}.json')
+    print(f'  jq \'.[\"232450\"].campsites | keys[0]\' {merged_file}')
 
 
 if __name__ == "__main__":
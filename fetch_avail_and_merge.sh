@@ -17,6 +17,11 @@
     #       avail_<ID>.json  (one per campground)
     #       all_avail_<MONTH>.json  (merged)
     #
+    #   Only merges the plain files it fetched itself. fetch.py's cached payloads under
+    #   temp/<MONTH>/ may be compressed (CACHE_COMPRESSION); read those with
+    #   `python jsonio.py cat temp/<MONTH>/avail_<ID>.json`. fetch.py's merged
+    #   all_avail_<MONTH>.json is always plain JSON.
+    #
 
     set -euo pipefail
 
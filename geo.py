@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+geo.py - Geocoding and great-circle distances
+
+Shared by fetch.py, facility_registry.py and workspace.py, none of which needs the others'
+fetch machinery to turn a place name into coordinates or to measure how far a campground is.
+Geocoded locations are cached in temp/geocode_cache.json; requests is only imported on a miss.
+
+Usage:
+    lat, lon = geocode_location("South Lake Tahoe")
+    miles = haversine_distance(lat, lon, DEFAULT_LAT, DEFAULT_LON)
+"""
+
+import json
+import math
+from typing import Dict, List, Tuple
+
+GEOCODE_CACHE = "temp/geocode_cache.json"
+
+# Default location: San Francisco coordinates (approximately downtown)
+DEFAULT_LAT = 37.7749
+DEFAULT_LON = -122.4194
+
+
+def load_geocode_cache(cache_file: str = GEOCODE_CACHE) -> Dict[str, List[float]]:
+    """Load the location → [lat, lon] geocode cache, or an empty dict."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_geocode_cache(cache: Dict[str, List[float]], cache_file: str = GEOCODE_CACHE) -> None:
+    """Add entries to the geocode cache file, merged under a lock with those other processes saved."""
+    import jsonio
+
+    jsonio.update_locked(cache_file, lambda current: {**current, **cache})
+
+
+def geocode_location(location: str) -> Tuple[float, float]:
+    """
+    Geocode a location name to latitude and longitude using a free geocoding service.
+    Results are cached in temp/geocode_cache.json so repeat lookups skip the network.
+    Returns (latitude, longitude) tuple.
+    """
+    cache = load_geocode_cache()
+    key = location.strip().lower()
+    if key in cache:
+        lat, lon = cache[key]
+        print(f"[✓] Geocoded '{location}' to ({lat:.4f}, {lon:.4f}) (cached)")
+        return lat, lon
+
+    # Using Nominatim (OpenStreetMap) free geocoding service
+    url = "https://nominatim.openstreetmap.org/search"
+    params = {
+        'q': location,
+        'format': 'json',
+        'limit': 1,
+        'countrycodes': 'us'  # Limit to US since this is for US campgrounds
+    }
+    headers = {
+        'User-Agent': 'campground-finder/1.0 (https://github.com/user/repo)'
+    }
+    
+    import requests
+
+    try:
+        response = requests.get(url, params=params, headers=headers, timeout=10)
+        response.raise_for_status()
+        results = response.json()
+        
+        if not results:
+            raise ValueError(f"Location '{location}' not found")
+        
+        result = results[0]
+        lat = float(result['lat'])
+        lon = float(result['lon'])
+
+        print(f"[✓] Geocoded '{location}' to ({lat:.4f}, {lon:.4f})")
+        cache[key] = [lat, lon]
+        save_geocode_cache(cache)
+        return lat, lon
+        
+    except requests.exceptions.RequestException as e:
+        raise ValueError(f"Failed to geocode '{location}': {e}")
+    except (KeyError, ValueError, IndexError) as e:
+        raise ValueError(f"Invalid geocoding response for '{location}': {e}")
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate the great circle distance between two points on Earth in miles."""
+    # Convert latitude and longitude from degrees to radians
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    
+    # Haversine formula
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    
+    # Radius of earth in miles
+    r = 3956
+    
+    return c * r
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+http_client.py - Pooled keep-alive HTTP client for the availability fetcher
+
+One FetchClient is shared by every worker of a fetch run. It holds a bounded connection pool
+sized to the worker count, so connections to www.recreation.gov are opened once and reused
+instead of paying a TCP+TLS handshake per facility. The browser-like headers (including the
+User-Agent) are chosen once per client, which keeps every request on the same connections.
+
+Backends:
+    requests   default; urllib3 pool with pool_maxsize = pool size, blocking when exhausted
+    httpx      http2=True; one HTTP/2 connection multiplexes all workers (pip install httpx[http2])
+
+stats() reports requests made and connections opened (= handshakes), e.g.
+    {"backend": "requests", "requests": 120, "connections": 10}
+
+Usage:
+    client = FetchClient(pool_size=10, http2=False)
+    try:
+        response = client.get(url)
+    except client.errors as e:
+        ...
+    print(client.stats())
+    client.close()
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+DEFAULT_TIMEOUT = 30
+
+
+class FetchClient:
+    """Thread-safe pooled HTTP client with one fixed set of headers."""
+
+    def __init__(self, pool_size: int = 10, http2: bool = False, headers: Optional[Dict[str, str]] = None):
+        self.pool_size = max(1, pool_size)
+        self.headers = dict(headers or {})
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connections = 0
+        self.backend = "requests"
+
+        if http2:
+            try:
+                import h2  # noqa: F401  (httpx needs it for http2=True)
+                import httpx
+            except ImportError:
+                print("⚠️ HTTP/2 needs 'pip install httpx[http2]'; using a pooled requests session")
+            else:
+                self.backend = "httpx"
+                self._client = httpx.Client(
+                    http2=True,
+                    headers=self.headers,
+                    follow_redirects=True,
+                    timeout=DEFAULT_TIMEOUT,
+                    limits=httpx.Limits(max_connections=self.pool_size,
+                                        max_keepalive_connections=self.pool_size),
+                )
+                self.errors = (httpx.HTTPError,)
+                return
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self._client = session
+        self._adapter = adapter
+        self.errors = (requests.exceptions.RequestException,)
+
+    def get(self, url: str, timeout: float = DEFAULT_TIMEOUT) -> Any:
+        """GET a URL over a pooled connection; the response has status_code, content, raise_for_status()."""
+        with self._lock:
+            self._requests += 1
+        if self.backend == "httpx":
+            return self._client.get(url, timeout=timeout, extensions={"trace": self._trace})
+        return self._client.get(url, timeout=timeout, allow_redirects=True)
+
+    def _trace(self, event: str, info: Dict[str, Any]) -> None:
+        # httpcore trace hook: one connect_tcp per new connection
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections += 1
+
+    def connections_opened(self) -> int:
+        """Connections opened so far - each one is a TCP (+TLS) handshake."""
+        if self.backend == "httpx":
+            return self._connections
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "requests": self._requests, "connections": self.connections_opened()}
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self) -> "FetchClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
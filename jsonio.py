@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+jsonio.py - Fast JSON encode/decode for availability payloads
+
+Uses the fastest backend that is installed:
+    orjson   → pip install orjson
+    msgspec  → pip install msgspec
+    json     (standard library fallback)
+
+All encoders return UTF-8 bytes so callers can write them straight to disk.
+
+Cached payloads (temp/<MONTH>/avail_<ID>.json, shared cache entries) can be compressed with
+CACHE_COMPRESSION=zstd (pip install zstandard) or CACHE_COMPRESSION=gzip. File names do not
+change: readers detect the format from the first bytes, so plain and compressed files can
+coexist and every load()/read_bytes() caller reads both transparently. Merged files
+(all_avail_<MONTH>.json) are always written plain, since jq and the analysis scripts read them
+directly; to inspect a cached payload from the shell, use `python jsonio.py cat <file>`.
+
+Small shared JSON files that several processes add to (the facility registry, the geocode
+cache) are changed with update_locked(), which re-reads and rewrites them under a file lock.
+The atomic write and the lock themselves live in atomic_file.py and are re-exported here.
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from atomic_file import file_lock, temp_path_for, write_atomic
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+    DecodeError = (orjson.JSONDecodeError,)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        """Decode a JSON document."""
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Encode an object as compact JSON bytes."""
+        return orjson.dumps(obj)
+
+except ImportError:
+    try:
+        import msgspec
+
+        BACKEND = "msgspec"
+        DecodeError = (msgspec.DecodeError,)
+        _decoder = msgspec.json.Decoder()
+        _encoder = msgspec.json.Encoder()
+
+        def loads(data: Union[bytes, str]) -> Any:
+            """Decode a JSON document."""
+            return _decoder.decode(data)
+
+        def dumps(obj: Any) -> bytes:
+            """Encode an object as compact JSON bytes."""
+            return _encoder.encode(obj)
+
+    except ImportError:
+        BACKEND = "json"
+        DecodeError = (json.JSONDecodeError, UnicodeDecodeError)
+
+        def loads(data: Union[bytes, str]) -> Any:
+            """Decode a JSON document."""
+            return json.loads(data)
+
+        def dumps(obj: Any) -> bytes:
+            """Encode an object as compact JSON bytes."""
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# none | gzip | zstd - applied by compress() / write_compressed_atomic()
+COMPRESSION = os.environ.get("CACHE_COMPRESSION", "none").lower()
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(data: bytes, codec: Optional[str] = None) -> bytes:
+    """Compress with the given codec (default: CACHE_COMPRESSION); "none" returns data unchanged."""
+    codec = codec or COMPRESSION
+    if codec == "zstd":
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        codec = "gzip"  # zstandard not installed: gzip is always available
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+
+def decompress(data: bytes) -> bytes:
+    """Undo compress(), detecting the codec from its magic bytes (plain JSON passes through)."""
+    if data[:2] == _GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed cache file found; pip install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def read_bytes(path: Union[str, Path]) -> bytes:
+    """Read a file's JSON bytes, decompressing if it was stored compressed."""
+    with open(path, "rb") as f:
+        return decompress(f.read())
+
+
+def load(path: Union[str, Path]) -> Any:
+    """Read and decode a JSON file (plain or compressed)."""
+    return loads(read_bytes(path))
+
+
+def dump(obj: Any, path: Union[str, Path]) -> None:
+    """Encode an object and write it to a file."""
+    with open(path, "wb") as f:
+        f.write(dumps(obj))
+
+
+def dump_atomic(obj: Any, path: Union[str, Path]) -> None:
+    """Encode an object and write it atomically."""
+    write_atomic(path, dumps(obj))
+
+
+def write_compressed_atomic(path: Union[str, Path], data: bytes, codec: Optional[str] = None) -> None:
+    """write_atomic() after compressing with the given codec (default: CACHE_COMPRESSION)."""
+    write_atomic(path, compress(data, codec))
+
+
+def update_locked(path: Union[str, Path], change: Callable[[Any], Any], default: Callable[[], Any] = dict) -> Any:
+    """
+    Read-modify-write a JSON file under an exclusive lock on <path>.lock and return the new value.
+
+    change() gets the file's current contents (default() if it is missing or unreadable) and
+    returns what to write, so concurrent writers merge their changes instead of the last one
+    overwriting the others.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with file_lock(path.with_name(path.name + ".lock")):
+        try:
+            current = load(path)
+        except (OSError, *DecodeError):
+            current = default()
+        updated = change(current)
+        dump_atomic(updated, path)
+        return updated
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Print JSON files, decompressing cached payloads")
+    parser.add_argument("command", choices=["cat"])
+    parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+    for path in args.files:
+        sys.stdout.buffer.write(read_bytes(path))
+        sys.stdout.buffer.write(b"\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+merge_manifest.py - Lets fetch.py re-merge only the availability files that changed
+
+Written next to the merged file after every merge:
+
+    all_avail_<MONTH>.manifest.json
+        merged      {"size": ..., "mtime_ns": ...}       the merged file this manifest describes
+        facilities  {facility_id: {"size", "mtime_ns",   its avail_<ID>.json when it was merged
+                                   "offset", "length"}}  its "<ID>":<payload> segment in the
+                                                         (decompressed) merged JSON; offset is
+                                                         null for a file skipped as invalid
+
+On the next merge a facility whose avail_<ID>.json still has the same size and mtime is
+copied from its segment as raw bytes and keeps its entries in the query index; only new or
+changed files are parsed, and removed facilities are dropped from the index. If nothing
+changed, nothing is rewritten. A manifest whose merged file was replaced or is missing, or
+whose index is missing, is ignored (a full merge).
+
+The new merged file is still written whole and renamed into place (readers - jq, mmap in
+load_merged - must never see it half-patched), but write_merged() copies the unchanged
+segments file-to-file with os.copy_file_range, one range per run of segments that were
+adjacent, so they never pass through this process's memory; on reflink filesystems (btrfs,
+XFS) the kernel shares their blocks instead of copying them.
+
+Usage:
+    manifest = MergeManifest.load_for("all_avail_2025-08.json")     # None → full merge
+    if manifest and manifest.unchanged("232450", file_stamp(path)):
+        span = manifest.span("232450")            # (offset, length) in the old merged file
+
+    layout = write_merged("all_avail_2025-08.json", [("232450", span), ("70926", b'"70926":{...}')],
+                          previous="all_avail_2025-08.json")
+    fresh = manifest.current_facilities("temp/2025-08")   # facilities the index is still right about
+"""
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple, Union
+
+import jsonio
+from atomic_file import temp_path_for
+from availability_index import index_path_for
+
+MANIFEST_VERSION = 1
+
+Stamp = Dict[str, int]  # {"size", "mtime_ns"}
+Segment = Union[bytes, Tuple[int, int]]  # '"<ID>":<payload>' bytes, or (offset, length) in the previous file
+COPY_CHUNK = 1 << 20  # read/write fallback when os.copy_file_range is unavailable
+
+
+def manifest_path_for(merged_file: Union[str, Path]) -> Path:
+    """all_avail_<MONTH>.json → all_avail_<MONTH>.manifest.json"""
+    merged_file = Path(merged_file)
+    return merged_file.with_name(merged_file.name.split(".")[0] + ".manifest.json")
+
+
+def file_stamp(path: Union[str, Path]) -> Stamp:
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_merged(path: Union[str, Path], segments: List[Tuple[str, Segment]],
+                 previous: Optional[Union[str, Path]] = None) -> Dict[str, Tuple[int, int]]:
+    """
+    Atomically write the merged JSON object for (facility_id, segment) pairs and return its
+    layout {facility_id: (offset, length)}. Ranges are read from the `previous` merged file.
+    """
+    # Pieces of output: bytes, or a [start, end) range of the previous file
+    pieces: List[Union[bytes, List[int]]] = [b"{"]
+    layout: Dict[str, Tuple[int, int]] = {}
+    size = 1
+    for i, (facility_id, segment) in enumerate(segments):
+        if i:
+            pieces.append(b",")
+            size += 1
+        length = len(segment) if isinstance(segment, bytes) else segment[1]
+        layout[facility_id] = (size, length)
+        size += length
+        if isinstance(segment, bytes):
+            pieces.append(segment)
+            continue
+        start, end = segment[0], segment[0] + segment[1]
+        last = pieces[-2] if i else None
+        if isinstance(last, list) and last[1] + 1 == start:
+            pieces.pop()  # adjacent in the previous file too: copy the "," with the range
+            last[1] = end
+        else:
+            pieces.append([start, end])
+    pieces.append(b"}")
+
+    path = Path(path)
+    tmp = temp_path_for(path)
+    source = open(previous, "rb") if previous is not None else None
+    try:
+        head = source.read(1) if source is not None else b"{"
+        buffered = None if head == b"{" else jsonio.decompress(head + source.read())  # compressed by an older merge
+        with open(tmp, "wb") as out:
+            pending = []
+            for piece in pieces:
+                if isinstance(piece, bytes):
+                    pending.append(piece)
+                    continue
+                out.write(b"".join(pending))
+                pending = []
+                if buffered is not None:
+                    out.write(buffered[piece[0]:piece[1]])
+                else:
+                    _copy_range(source, out, piece[0], piece[1] - piece[0])
+            out.write(b"".join(pending))
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        if source is not None:
+            source.close()
+    return layout
+
+
+def _copy_range(source: BinaryIO, out: BinaryIO, offset: int, length: int) -> None:
+    """Append source[offset:offset + length] to out, in the kernel where the platform allows."""
+    out.flush()
+    copy_file_range = getattr(os, "copy_file_range", None)
+    while length > 0 and copy_file_range is not None:
+        try:
+            copied = copy_file_range(source.fileno(), out.fileno(), length, offset)
+        except OSError:  # e.g. not supported between these filesystems
+            break
+        if copied == 0:
+            raise EOFError(f"{source.name} ends before the segment at {offset}")
+        offset += copied
+        length -= copied
+    source.seek(offset)
+    while length > 0:
+        chunk = source.read(min(length, COPY_CHUNK))
+        if not chunk:
+            raise EOFError(f"{source.name} ends before the segment at {offset}")
+        out.write(chunk)
+        length -= len(chunk)
+
+
+class MergeManifest:
+    """Per-facility source stamps and segment positions of one merged file."""
+
+    def __init__(self, merged: Stamp, facilities: Dict[str, Dict[str, Optional[int]]]):
+        self.merged = merged
+        self.facilities = facilities
+
+    @classmethod
+    def load_for(cls, merged_file: Union[str, Path]) -> Optional["MergeManifest"]:
+        """The manifest of a merged file, or None unless it, the merged file and its index all agree."""
+        merged_file = Path(merged_file)
+        path = manifest_path_for(merged_file)
+        if not (path.exists() and merged_file.exists() and index_path_for(merged_file).exists()):
+            return None
+        try:
+            data = jsonio.load(path)
+        except (OSError, *jsonio.DecodeError):
+            return None
+        if data.get("version") != MANIFEST_VERSION or data.get("merged") != file_stamp(merged_file):
+            return None
+        return cls(data["merged"], data["facilities"])
+
+    def unchanged(self, facility_id: str, stamp: Stamp) -> bool:
+        entry = self.facilities.get(facility_id)
+        return entry is not None and entry["size"] == stamp["size"] and entry["mtime_ns"] == stamp["mtime_ns"]
+
+    def current_facilities(self, source_dir: Union[str, Path]) -> Set[str]:
+        """Facilities whose segment and index entries still match their avail_<ID>.json in source_dir."""
+        current = set()
+        for facility_id, entry in self.facilities.items():
+            if entry["offset"] is None:
+                continue
+            try:
+                stamp = file_stamp(Path(source_dir) / f"avail_{facility_id}.json")
+            except OSError:
+                continue
+            if self.unchanged(facility_id, stamp):
+                current.add(facility_id)
+        return current
+
+    def span(self, facility_id: str) -> Optional[Tuple[int, int]]:
+        """A facility's (offset, length) in the merged file; None if its file was skipped as invalid."""
+        entry = self.facilities[facility_id]
+        if entry["offset"] is None:
+            return None
+        return entry["offset"], entry["length"]
+
+    def save_for(self, merged_file: Union[str, Path]) -> None:
+        jsonio.dump_atomic({"version": MANIFEST_VERSION, "merged": self.merged, "facilities": self.facilities},
+                           manifest_path_for(merged_file))
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+metrics.py - Prometheus-style metrics for the web service, agent tools and fetch layer
+
+A small in-process registry (no client library needed) rendered in the Prometheus text
+exposition format by web_frontend.py's /metrics endpoint:
+
+    recdotgov_queries_total{endpoint,outcome}           finished /query and /query-detailed streams
+    recdotgov_query_seconds{endpoint}                   end-to-end stream latency
+    recdotgov_agent_tasks_in_flight                     agent tasks currently running
+    recdotgov_update_queue_depth                        agent updates waiting to be streamed
+    recdotgov_tool_calls_total{tool,command,status}     agent tool invocations
+    recdotgov_tool_seconds{tool,command}                agent tool latency
+    recdotgov_subprocess_seconds{script}                time spent in fetch.py / analysis scripts
+    recdotgov_cache_lookups_total{cache,result}         query-result and availability cache hits/misses
+    recdotgov_upstream_requests_total{status}           recreation.gov requests (200, 429, error, ...)
+    recdotgov_upstream_seconds                          recreation.gov request latency
+    recdotgov_facility_fetches_total{outcome}           per-facility fetch outcomes
+
+Metrics live in the process that records them. Counters and histograms recorded in children
+started by cancellation.run_cancellable() (fetch.py, which makes the upstream requests and
+availability cache lookups) reach /metrics too: run_cancellable() sets METRICS_SUMMARY=1, the
+child prints its values as one "#metrics {...}" line on exit (write_summary), and the parent
+adds them to its own and removes the line from the output (absorb_summary). A child killed
+before it exits reports nothing.
+
+Usage:
+    from metrics import TOOL_SECONDS, render
+    with TOOL_SECONDS.time(tool="recreation_api_tool", command="analyze_results"):
+        ...
+    print(render())
+
+    @instrument_tool          # counts calls by command/status and times them
+    def recreation_api_tool(command: str, ...): ...
+
+    write_summary()                             # in a child, at exit
+    stdout = absorb_summary(result.stdout)      # in the parent
+"""
+
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+PREFIX = "recdotgov_"
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SUMMARY_ENV = "METRICS_SUMMARY"
+SUMMARY_PREFIX = "#metrics "
+
+_registry: List["Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named metric family with a fixed label set; values are keyed by label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def _snapshot(self) -> List[List[Any]]:
+        """[[label values, value], ...] for write_summary(); empty for metrics not forwarded."""
+        return []
+
+    def _merge(self, entries: List[List[Any]]) -> None:
+        pass
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._values[()] = 0  # unlabelled series are exported from the start
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def _snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items() if value]
+
+    def _merge(self, entries: List[List[Any]]) -> None:
+        for key, value in entries:
+            self.inc(value, **dict(zip(self.labelnames, key)))
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    # A child's gauges describe the child only
+    def _snapshot(self) -> List[List[Any]]:
+        return []
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return state["count"] if state else 0
+
+    def _samples(self) -> Iterator[str]:
+        for key, state in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, state["buckets"]):
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}"
+            inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{inf} {state['count']}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state['sum'])}"
+            yield f"{self.name}_count{labels} {state['count']}"
+
+    def _snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(key), dict(state, buckets=list(state["buckets"]))] for key, state in self._values.items()]
+
+    def _merge(self, entries: List[List[Any]]) -> None:
+        for key, other in entries:
+            if len(other["buckets"]) != len(self.buckets):
+                continue  # recorded by a different version of this module
+            key = self._key(dict(zip(self.labelnames, key)))
+            with self._lock:
+                state = self._values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+                state["buckets"] = [a + b for a, b in zip(state["buckets"], other["buckets"])]
+                state["sum"] += other["sum"]
+                state["count"] += other["count"]
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+def write_summary(stream: Optional[TextIO] = None) -> None:
+    """Print this process's counters and histograms as one line, if the parent asked (METRICS_SUMMARY)."""
+    if not os.environ.get(SUMMARY_ENV):
+        return
+    summary = {m.name: entries for m in _registry for entries in [m._snapshot()] if entries}
+    print(SUMMARY_PREFIX + json.dumps(summary), file=stream or sys.stdout, flush=True)
+
+
+def absorb_summary(output: Optional[str]) -> Optional[str]:
+    """Add the values of a child's write_summary() line(s) to this process's metrics; returns the other lines."""
+    if not output or SUMMARY_PREFIX not in output:
+        return output
+    by_name = {m.name: m for m in _registry}
+    kept = []
+    for line in output.splitlines(keepends=True):
+        if not line.startswith(SUMMARY_PREFIX):
+            kept.append(line)
+            continue
+        try:
+            summary = json.loads(line[len(SUMMARY_PREFIX):])
+        except ValueError:
+            continue
+        for name, entries in summary.items():
+            if name in by_name:
+                by_name[name]._merge(entries)
+    return "".join(kept)
+
+
+QUERIES = Counter("queries_total", "Finished query streams", ["endpoint", "outcome"])
+QUERY_SECONDS = Histogram("query_seconds", "End-to-end query stream latency", ["endpoint"])
+AGENT_TASKS_IN_FLIGHT = Gauge("agent_tasks_in_flight", "Agent tasks currently running")
+UPDATE_QUEUE_DEPTH = Gauge("update_queue_depth", "Agent updates queued but not yet streamed")
+TOOL_CALLS = Counter("tool_calls_total", "Agent tool invocations", ["tool", "command", "status"])
+TOOL_SECONDS = Histogram("tool_seconds", "Agent tool latency", ["tool", "command"])
+SUBPROCESS_SECONDS = Histogram("subprocess_seconds", "Time spent in child scripts", ["script"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+UPSTREAM_REQUESTS = Counter("upstream_requests_total", "recreation.gov requests by status", ["status"])
+UPSTREAM_SECONDS = Histogram("upstream_seconds", "recreation.gov request latency",
+                             buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30))
+FACILITY_FETCHES = Counter("facility_fetches_total", "Per-facility fetch outcomes", ["outcome"])
+
+
+def instrument_tool(func: Callable) -> Callable:
+    """
+    Record an agent tool's calls and latency, labelled by its command/action argument and the
+    "status" of the dict it returns. The wrapper keeps the tool's signature for FunctionTool.
+    """
+    import inspect
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        command = str(arguments.get("command") or arguments.get("action") or "")
+        status = "exception"
+        with TOOL_SECONDS.time(tool=func.__name__, command=command):
+            try:
+                result = func(*args, **kwargs)
+                status = str(result.get("status", "")) if isinstance(result, dict) else ""
+                return result
+            finally:
+                TOOL_CALLS.inc(tool=func.__name__, command=command, status=status)
+    return wrapper
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+parallel_analysis.py - Shard availability parsing and queries across a process pool
+
+Decoding JSON payloads, compacting them (availability_model.py) and evaluating queries is
+CPU-bound, so with one process it runs on a single core under the GIL. This module shards
+facilities across worker processes and reduces the per-shard results in the parent:
+
+    compact_and_index()      parse + validate + compact + build the query index per shard,
+                             then AvailabilityIndex.merge() the shard indexes (fetch.py merge)
+    load_parallel()          compact campgrounds in workers and return them to the parent
+    parallel_stay_search()   run StaySearch per shard and concatenate the matches
+
+Shards are balanced by file size, and each worker reads its own files, so only the compact
+results cross process boundaries (plus, for compact_and_index, the raw bytes the merge
+splices, so the parent does not read each file again).
+
+Usage:
+    python fetch.py 2025-08 --workers 8             # merge + index on 8 cores
+    python stay_search.py 2025-08 --nights 2 --workers 0   # 0 = one worker per core
+
+    from parallel_analysis import parallel_stay_search
+    matches = parallel_stay_search(paths, nights=2, workers=8)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import jsonio
+from availability_index import AvailabilityIndex
+from availability_model import Campground
+
+# Below this many files a pool's startup cost outweighs the parallel speedup
+MIN_FILES_PER_WORKER = 8
+
+
+def resolve_workers(workers: Optional[int], num_items: int) -> int:
+    """Worker count to use: 0/None means one per core; capped at the core count and so each worker gets enough files."""
+    cores = os.cpu_count() or 1
+    workers = min(workers or cores, cores)
+    return max(1, min(workers, num_items // MIN_FILES_PER_WORKER))
+
+
+def shard_paths(paths: Sequence[Path], num_shards: int) -> List[List[Path]]:
+    """Split files into num_shards groups of roughly equal total size (largest first, greedy)."""
+    shards: List[List[Path]] = [[] for _ in range(num_shards)]
+    loads = [0] * num_shards
+    for path in sorted(paths, key=lambda p: p.stat().st_size, reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(path)
+        loads[lightest] += path.stat().st_size
+    return [shard for shard in shards if shard]
+
+
+def _facility_id(path: Path) -> str:
+    return path.stem.replace("avail_", "")
+
+
+def _compact_shard(paths: List[Path]) -> Tuple[Dict[str, Campground], List[str]]:
+    """Parse and compact one shard's files; returns (campgrounds, names of invalid files)."""
+    campgrounds: Dict[str, Campground] = {}
+    invalid: List[str] = []
+    for path in paths:
+        try:
+            payload = jsonio.load(path)
+        except (OSError, *jsonio.DecodeError):
+            payload = None
+        if not isinstance(payload, dict):
+            invalid.append(path.name)
+            continue
+        campground = Campground(_facility_id(path), payload)
+        campground.campsites  # compact in the worker; only the compact form is pickled back
+        campgrounds[campground.facility_id] = campground
+    return campgrounds, invalid
+
+
+def _index_shard(paths: List[Path]) -> Tuple[Dict[str, bytes], List[str], AvailabilityIndex]:
+    """Like _compact_shard, but keeps each valid file's stripped bytes and returns the shard's index."""
+    raw: Dict[str, bytes] = {}
+    campgrounds: Dict[str, Campground] = {}
+    invalid: List[str] = []
+    for path in paths:
+        try:
+            data = jsonio.read_bytes(path)
+            payload = jsonio.loads(data)
+        except (OSError, *jsonio.DecodeError):
+            payload = None
+        if not isinstance(payload, dict):
+            invalid.append(path.name)
+            continue
+        campground = Campground(_facility_id(path), payload)
+        campground.campsites
+        campgrounds[campground.facility_id] = campground
+        raw[campground.facility_id] = data.strip()
+    return raw, invalid, AvailabilityIndex.build(campgrounds)
+
+
+def _map_shards(func, paths: Sequence[Path], workers: Optional[int]) -> list:
+    """Run func over size-balanced shards of paths in a process pool (in-process for one shard)."""
+    paths = list(paths)
+    num_workers = resolve_workers(workers, len(paths))
+    shards = shard_paths(paths, num_workers)
+    if len(shards) <= 1:
+        return [func(shard) for shard in shards]
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        return list(pool.map(func, shards))
+
+
+def compact_and_index(paths: Sequence[Path],
+                      workers: Optional[int] = None) -> Tuple[Dict[str, bytes], List[str], AvailabilityIndex]:
+    """
+    Validate, compact and index availability files across workers
+    → ({valid ID: its file's bytes, stripped}, invalid names, index).
+
+    The bytes come back so the caller can splice them into a merged file without reading
+    every file a second time.
+    """
+    valid: Dict[str, bytes] = {}
+    invalid: List[str] = []
+    indexes = []
+    for shard_valid, shard_invalid, index in _map_shards(_index_shard, paths, workers):
+        valid.update(shard_valid)
+        invalid.extend(shard_invalid)
+        indexes.append(index)
+    return valid, invalid, AvailabilityIndex.merge(indexes)
+
+
+def load_parallel(paths: Sequence[Path], workers: Optional[int] = None) -> Dict[str, Campground]:
+    """Compact availability files in worker processes and return every Campground."""
+    campgrounds: Dict[str, Campground] = {}
+    for shard, _ in _map_shards(_compact_shard, paths, workers):
+        campgrounds.update(shard)
+    return campgrounds
+
+
+class _StayJob:
+    """Picklable per-shard stay search (a closure would not survive the trip to a worker)."""
+
+    def __init__(self, nights: int, check_in_weekdays: Optional[Iterable[int]],
+                 first: Optional[date], last: Optional[date]):
+        self.nights = nights
+        self.check_in_weekdays = set(check_in_weekdays) if check_in_weekdays else None
+        self.first = first
+        self.last = last
+
+    def __call__(self, paths: List[Path]):
+        from stay_search import StaySearch
+
+        campgrounds, _ = _compact_shard(paths)
+        search = StaySearch(campgrounds)
+        return search.find(self.nights, self.check_in_weekdays, self.first, self.last), len(search.sites)
+
+
+def parallel_stay_search(paths: Sequence[Path], nights: int, check_in_weekdays: Optional[Iterable[int]] = None,
+                         first: Optional[date] = None, last: Optional[date] = None,
+                         workers: Optional[int] = None) -> Tuple[list, int]:
+    """StaySearch.find() sharded by facility → (matches, number of sites searched)."""
+    matches = []
+    num_sites = 0
+    for shard_matches, shard_sites in _map_shards(_StayJob(nights, check_in_weekdays, first, last), paths, workers):
+        matches.extend(shard_matches)
+        num_sites += shard_sites
+    return matches, num_sites
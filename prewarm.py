@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+prewarm.py - Keep popular regions' availability warm ahead of user queries
+
+Most searches hit a few regions for the next few months. This scheduler refreshes those
+facilities' temp/<MONTH>/avail_<ID>.json files whenever they are older than the cache TTL, so
+user queries find a warm cache instead of paying the full fetch in the request path.
+
+    - Runs only during the configured off-peak hours (local time) unless --any-time is given
+    - Draws every request from the shared rate budget (rate_limiter.py) and additionally paces
+      itself to budget_share of it, leaving the rest for user-triggered fetches
+    - Goes through the shared cache backend, so facilities another instance just fetched are
+      reused rather than fetched again
+    - Facilities shared by overlapping regions are refreshed once per month
+    - SIGTERM/SIGINT stop it between facilities (the same STOP token as fetch.py), never mid-write
+
+Configuration (prewarm.json, all keys optional):
+    {
+      "regions": [{"location": "South Lake Tahoe", "distance": 30}, ...],
+      "months_ahead": 3,              # current month plus the next two
+      "ttl_minutes": 30,              # refresh payloads older than this
+      "off_peak_hours": [0, 1, 2, 3, 4, 5, 6, 22, 23],
+      "budget_share": 0.5
+    }
+
+Usage:
+    python prewarm.py --once                    # one refresh pass, then exit
+    python prewarm.py                           # loop forever, refreshing during off-peak hours
+    python prewarm.py --config prewarm.json --any-time
+"""
+
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import jsonio
+from avail_cache import is_cached, month_cache_dir
+from fetch import STOP, ensure_campground_table, fetch_outcome, merge_availability_files, new_session
+from rate_limiter import get_rate_limiter
+from workspace import Workspace
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "regions": [
+        {"location": "South Lake Tahoe", "distance": 30},
+        {"location": "Yosemite", "distance": 30},
+        {"location": "Big Sur", "distance": 30},
+    ],
+    "months_ahead": 3,
+    "ttl_minutes": 30,
+    "off_peak_hours": [0, 1, 2, 3, 4, 5, 6, 22, 23],
+    "budget_share": 0.5,
+}
+DEFAULT_CONFIG_FILE = "prewarm.json"
+IDLE_CHECK_SECONDS = 300
+
+
+def load_config(path: str = DEFAULT_CONFIG_FILE) -> Dict[str, Any]:
+    """DEFAULT_CONFIG overlaid with the keys present in the config file (if it exists)."""
+    config = dict(DEFAULT_CONFIG)
+    if Path(path).exists():
+        config.update(jsonio.load(path))
+    return config
+
+
+def upcoming_months(count: int, today: Optional[date] = None) -> List[str]:
+    """The current month and the following count-1 months as YYYY-MM."""
+    today = today or date.today()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def is_off_peak(hours: List[int], now: Optional[datetime] = None) -> bool:
+    return (now or datetime.now()).hour in set(hours)
+
+
+def plan(config: Dict[str, Any]) -> Tuple[List[Tuple[str, str]], List[Tuple[Workspace, str]]]:
+    """
+    Work for one pass: (stale (month, facility_id) pairs, (workspace, month) pairs to re-merge).
+
+    Months are ordered nearest first, and a facility shared by several regions appears once.
+    """
+    max_age = config["ttl_minutes"] * 60
+    months = upcoming_months(config["months_ahead"])
+    workspaces = [Workspace.for_location(r["location"], r["distance"]) for r in config["regions"]]
+
+    stale: List[Tuple[str, str]] = []
+    seen = set()
+    for month in months:
+        cache_dir = month_cache_dir(month)
+        for ws in workspaces:
+            for fid in ws.facility_ids:
+                if (month, fid) not in seen and not is_cached(fid, cache_dir, max_age):
+                    seen.add((month, fid))
+                    stale.append((month, fid))
+    return stale, [(ws, month) for ws in workspaces for month in months]
+
+
+def run_pass(config: Dict[str, Any], any_time: bool = False) -> Dict[str, int]:
+    """
+    Refresh every stale facility in the configured regions; stops early when off-peak ends or
+    on SIGTERM/SIGINT (fetch.STOP), leaving what was refreshed so far in the cache.
+    """
+    ensure_campground_table()
+    stale, outputs = plan(config)
+    max_age = config["ttl_minutes"] * 60
+    # Our own pace, on top of the shared bucket, so user fetches keep most of the budget
+    interval = 1.0 / (get_rate_limiter().rate * config["budget_share"])
+    print(f"[→] Pre-warming {len(stale)} stale facility-months across {len(config['regions'])} regions")
+
+    refreshed = failed = 0
+    client = None
+    try:
+        for i, (month, fid) in enumerate(stale, 1):
+            if STOP.cancelled:
+                break
+            if not any_time and not is_off_peak(config["off_peak_hours"]):
+                print("[!] Off-peak window ended; stopping this pass")
+                break
+            if client is None:
+                client = new_session()
+            cache_dir = month_cache_dir(month)
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            started = time.monotonic()
+            print(f"[{i:4d}/{len(stale):4d}] {month} ID {fid} ... ", end="", flush=True)
+            outcome = fetch_outcome(fid, month, cache_dir, client, max_age=max_age, cancel=STOP)
+            if outcome is not None:
+                refreshed += 1
+            else:
+                failed += 1
+            # Pace upstream requests only: payloads another process or instance refreshed cost nothing
+            if outcome not in ("cached", "shared"):
+                STOP.wait(max(0.0, interval - (time.monotonic() - started)))
+    finally:
+        if client is not None:
+            client.close()
+
+    if STOP.cancelled:
+        print(f"[!] Stopped; {refreshed} refreshed payload(s) stay in the cache, merges are left for the next pass")
+        return {"stale": len(stale), "refreshed": refreshed, "failed": failed}
+    if refreshed:
+        # Rebuild each region's download.csv and merged files so analysis runs need no fetch
+        for ws, month in outputs:
+            ws.write_download_csv()
+            merge_availability_files(month_cache_dir(month), month, ws.facility_ids, ws.merged_file(month))
+    print(f"[✓] Pre-warm pass: {refreshed} refreshed, {failed} failed")
+    return {"stale": len(stale), "refreshed": refreshed, "failed": failed}
+
+
+def main():
+    import argparse
+
+    from cache_backend import release_held_locks
+    from cancellation import stop_on_signals
+
+    parser = argparse.ArgumentParser(description="Keep popular regions' availability warm")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_FILE, help=f"Config file (default: {DEFAULT_CONFIG_FILE})")
+    parser.add_argument("--once", action="store_true", help="Run one pass and exit")
+    parser.add_argument("--any-time", action="store_true", help="Ignore off_peak_hours")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    # SIGTERM/SIGINT end the current fetch cleanly and the loop instead of killing a write
+    stop_on_signals(STOP, on_stop=release_held_locks)
+    while not STOP.cancelled:
+        if args.any_time or is_off_peak(config["off_peak_hours"]):
+            run_pass(config, args.any_time)
+        elif args.once:
+            print("[!] Outside off-peak hours; use --any-time to run now")
+        if args.once:
+            return
+        # Re-check well within the TTL so nothing goes stale between passes
+        STOP.wait(min(IDLE_CHECK_SECONDS, config["ttl_minutes"] * 30))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+profiling.py - Per-stage timers, cProfile and tracemalloc for fetch.py runs
+
+Code marks its stages with trace_stage(); when tracing is off (the default) this costs one
+attribute check. fetch.py enables it with:
+
+    --trace-stages   wall/CPU time per stage (RIDB download, CSV read, filter/join, distance
+                     calculation, each HTTP fetch, merge read/write, index build/write)
+    --trace-memory   also tracemalloc: memory growth and peak per stage, top allocation sites
+    --profile        also cProfile for the whole run, including threads it starts (--parallel
+                     fetch workers); one merged .prof file opens in snakeviz/pstats
+
+and writes a JSON report (default temp/profiles/fetch_<timestamp>.json):
+
+    {"command": [...], "wall_s": 12.3,
+     "stages": [{"stage": "merge/merge_read", "count": 1, "total_s": 0.8, "max_s": 0.8,
+                 "cpu_s": 0.7, "mem_peak_bytes": 48123904}, ...],
+     "records": [{"stage": "http_fetch", "start_s": 0.4, "wall_s": 0.31, "facility_id": "232450", ...}, ...],
+     "cprofile": {"file": "...prof", "top": [...]}, "tracemalloc": {"top": [...]}}
+
+Nested stages are reported by path ("merge/index_build"). CPU time is per thread; memory
+figures are process-wide, so they are approximate while parallel fetch threads overlap.
+cProfile only sees the thread that enables it, so each thread started during the session gets
+its own profiler (via threading.setprofile) and their stats are added together at the end;
+threads that were already running when the session began are not profiled.
+
+Usage:
+    with trace_stage("http_fetch", facility_id=fid) as info:
+        response = session.get(url)
+        info["status"] = response.status_code
+
+    with profile_session("temp/profiles/run.json", cpu=True, memory=True):
+        run()
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import jsonio
+
+# cProfile, pstats and tracemalloc are imported only when profiling is switched on, so
+# importing this module keeps fetch.py's warm-cache start-up fast
+
+PROFILE_DIR = "temp/profiles"
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 25
+
+
+class StageTracer:
+    """Collects one record per traced stage; thread-safe, with per-thread stage nesting."""
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = time.perf_counter()
+
+    def start(self, memory: bool = False) -> None:
+        self.records = []
+        self.memory = memory
+        self._started = time.perf_counter()
+        if memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    @contextmanager
+    def stage(self, name: str, **info: Any) -> Iterator[Dict[str, Any]]:
+        import tracemalloc
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        frame = {"path": "/".join([f["name"] for f in stack] + [name]), "name": name, "peak": 0}
+        if self.memory and stack:
+            # Resetting the peak below would lose the parent's peak so far; keep it on the parent
+            stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        if self.memory:
+            mem_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        stack.append(frame)
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield info
+        finally:
+            record = {
+                "stage": frame["path"],
+                "start_s": round(wall - self._started, 6),
+                "wall_s": round(time.perf_counter() - wall, 6),
+                "cpu_s": round(time.thread_time() - cpu, 6),
+            }
+            stack.pop()
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(frame["peak"], peak)
+                record["mem_delta_bytes"] = current - mem_start
+                record["mem_peak_bytes"] = peak
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            record.update(info)
+            with self._lock:
+                self.records.append(record)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-stage aggregates, in the order the stages first started."""
+        stages: Dict[str, Dict[str, Any]] = {}
+        first_start: Dict[str, float] = {}
+        for r in self.records:
+            s = stages.setdefault(r["stage"], {"stage": r["stage"], "count": 0, "total_s": 0.0,
+                                               "max_s": 0.0, "cpu_s": 0.0})
+            first_start[r["stage"]] = min(first_start.get(r["stage"], r["start_s"]), r["start_s"])
+            s["count"] += 1
+            s["total_s"] += r["wall_s"]
+            s["max_s"] = max(s["max_s"], r["wall_s"])
+            s["cpu_s"] += r["cpu_s"]
+            if "mem_peak_bytes" in r:
+                s["mem_peak_bytes"] = max(s.get("mem_peak_bytes", 0), r["mem_peak_bytes"])
+        for s in stages.values():
+            s["mean_s"] = s["total_s"] / s["count"]
+            for key in ("total_s", "max_s", "cpu_s", "mean_s"):
+                s[key] = round(s[key], 6)
+        return sorted(stages.values(), key=lambda s: first_start[s["stage"]])
+
+
+TRACER = StageTracer()
+
+
+def trace_stage(name: str, **info: Any):
+    """Time a stage when tracing is enabled; yields a dict the stage can add fields to."""
+    if not TRACER.enabled:
+        return nullcontext(info)
+    return TRACER.stage(name, **info)
+
+
+class ThreadProfiles:
+    """cProfile for the calling thread and for every thread started while it is enabled."""
+
+    def __init__(self):
+        import cProfile
+
+        self._profile = cProfile.Profile
+        self.profiles = [cProfile.Profile()]
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg) -> None:
+        # threading.setprofile() hook: the first event in each new thread swaps it for a profiler
+        profiler = self._profile()
+        with self._lock:
+            self.profiles.append(profiler)
+        profiler.enable()
+
+    def enable(self) -> None:
+        threading.setprofile(self._start_thread)
+        self.profiles[0].enable()
+
+    def disable(self) -> None:
+        self.profiles[0].disable()
+        threading.setprofile(None)
+
+    def stats(self):
+        """All threads' stats added together (a pstats.Stats)."""
+        import pstats
+
+        stats = pstats.Stats(self.profiles[0])
+        with self._lock:
+            for profiler in self.profiles[1:]:
+                stats.add(profiler)
+        return stats
+
+
+def _top_functions(stats, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    rows = []
+    for (filename, line, func), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({"function": f"{filename}:{line}({func})", "ncalls": ncalls,
+                     "tottime_s": round(tottime, 6), "cumtime_s": round(cumtime, 6)})
+    rows.sort(key=lambda r: r["cumtime_s"], reverse=True)
+    return rows[:limit]
+
+
+def _top_allocations(snapshot, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    return [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+
+def default_report_path(name: str = "fetch") -> Path:
+    return Path(PROFILE_DIR) / f"{name}_{datetime.now():%Y%m%d-%H%M%S}.json"
+
+
+def print_summary(stages: List[Dict[str, Any]]) -> None:
+    print("\n[✓] Stage timings (wall s / CPU s / calls):")
+    for s in stages:
+        memory = f"  peak {s['mem_peak_bytes'] / 1e6:.1f} MB" if "mem_peak_bytes" in s else ""
+        print(f"    {s['stage']:<32} {s['total_s']:9.3f} {s['cpu_s']:9.3f} {s['count']:6d}{memory}")
+
+
+@contextmanager
+def profile_session(report_path: Optional[Union[str, Path]] = None, cpu: bool = False,
+                    memory: bool = False) -> Iterator[StageTracer]:
+    """
+    Trace stages (plus cProfile/tracemalloc if asked) for the enclosed run and write the report.
+
+    The report is also written when the run exits early (sys.exit, Ctrl-C).
+    """
+    import tracemalloc
+
+    report_path = Path(report_path or default_report_path())
+    TRACER.start(memory=memory)
+    profiler = ThreadProfiles() if cpu else None
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield TRACER
+    finally:
+        if profiler:
+            profiler.disable()
+        TRACER.stop()
+        report: Dict[str, Any] = {
+            "command": sys.argv,
+            "started": started_at,
+            "wall_s": round(time.perf_counter() - started, 6),
+            "stages": TRACER.summary(),
+            "records": TRACER.records,
+        }
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        if profiler:
+            prof_file = report_path.with_suffix(".prof")
+            stats = profiler.stats()
+            stats.dump_stats(str(prof_file))
+            report["cprofile"] = {"file": str(prof_file), "threads": len(profiler.profiles),
+                                  "top": _top_functions(stats)}
+        if memory:
+            report["tracemalloc"] = {"top": _top_allocations(tracemalloc.take_snapshot())}
+            tracemalloc.stop()
+        jsonio.dump_atomic(report, report_path)
+        print_summary(report["stages"])
+        print(f"[✓] Profile report written to {report_path}")
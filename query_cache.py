@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+query_cache.py - Result cache for availability analysis keyed on normalized query parameters
+
+A cache entry is keyed on:
+    - the search center (geocoded lat/lon rounded to COORD_PRECISION decimals)
+    - the radius in miles
+    - the normalized date set ("2025-08-06", "2025-08", or a sorted list of either)
+
+and stores the versions (a hash of the content) of every contributing temp/<MONTH>/avail_<ID>.json
+file. A hit is only returned when all of those versions still match, so refreshing any facility's
+availability with different data invalidates every result it contributed to - no explicit purge
+is needed.
+
+Entries are stored through a cache backend (cache_backend.py); QueryCache.shared() uses the
+CACHE_URL backend so every web instance sees the same results. Versions depend only on the
+payload bytes, not on when each instance wrote its local copy, so instances holding the same data
+share entries; an entry whose versions do not match is a miss for this caller but is left in
+place (another instance may still hold exactly that data).
+
+Usage:
+    cache = QueryCache()
+    key = cache.make_key(lat, lon, radius, "2025-08-06")
+    versions = facility_versions(facility_ids, month_cache_dir("2025-08"))
+    result = cache.get(key, versions)
+    if result is None:
+        result = analyze(...)
+        cache.put(key, versions, result)
+"""
+
+import hashlib
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import jsonio
+from cache_backend import CacheBackend, LocalBackend, get_backend
+from metrics import CACHE_LOOKUPS
+
+COORD_PRECISION = 2  # ~1 km; nearby spellings of the same place share entries
+DEFAULT_CACHE_DIR = "temp/query_cache"
+MAX_MEMOIZED_VERSIONS = 20000
+
+# (path, mtime_ns, size) → content hash
+_versions: Dict[Tuple[str, int, int], str] = {}
+_versions_lock = threading.Lock()
+
+
+def normalize_dates(dates: Union[str, Iterable[str]]) -> List[str]:
+    """Normalize a date spec (single date, month, comma-separated list or iterable) to a sorted list."""
+    if isinstance(dates, str):
+        dates = dates.split(",")
+    return sorted({d.strip() for d in dates if d and d.strip()})
+
+
+def normalize_params(lat: float, lon: float, radius: float, dates: Union[str, Iterable[str]]) -> Dict[str, Any]:
+    """Canonical form of a query; equal queries produce equal dicts."""
+    return {
+        "lat": round(float(lat), COORD_PRECISION),
+        "lon": round(float(lon), COORD_PRECISION),
+        "radius": float(radius),
+        "dates": normalize_dates(dates),
+    }
+
+
+def content_version(path: Union[str, Path]) -> str:
+    """
+    Hash of a payload file's (decompressed) bytes; raises OSError if it cannot be read.
+
+    Memoized per (path, mtime_ns, size), so each file is read once per process until it changes.
+    """
+    path = Path(path)
+    st = path.stat()
+    stamp = (str(path), st.st_mtime_ns, st.st_size)
+    with _versions_lock:
+        version = _versions.get(stamp)
+    if version is None:
+        version = hashlib.sha1(jsonio.read_bytes(path)).hexdigest()[:16]
+        with _versions_lock:
+            if len(_versions) >= MAX_MEMOIZED_VERSIONS:
+                _versions.clear()
+            _versions[stamp] = version
+    return version
+
+
+def facility_versions(facility_ids: Iterable[str], temp_dir: Union[str, Path]) -> Dict[str, str]:
+    """Content version of each facility's availability file, "missing" if absent."""
+    temp_dir = Path(temp_dir)
+    versions = {}
+    for fid in facility_ids:
+        try:
+            versions[fid] = content_version(temp_dir / f"avail_{fid}.json")
+        except OSError:
+            versions[fid] = "missing"
+    return versions
+
+
+class QueryCache:
+    """Result cache; one JSON entry per normalized query, stored in a cache backend."""
+
+    def __init__(self, cache_dir: Union[str, Path] = DEFAULT_CACHE_DIR, ttl_minutes: Optional[float] = None,
+                 backend: Optional[CacheBackend] = None):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_minutes * 60 if ttl_minutes else None
+        # Without an explicit backend, entries are plain files under cache_dir
+        self.backend = backend or LocalBackend(self.cache_dir)
+        self.prefix = "" if backend is None else "query_cache/"
+
+    @classmethod
+    def shared(cls, ttl_minutes: Optional[float] = None) -> "QueryCache":
+        """Cache stored in the process-wide backend (CACHE_URL; temp/query_cache by default)."""
+        return cls(ttl_minutes=ttl_minutes, backend=get_backend())
+
+    def make_key(self, lat: float, lon: float, radius: float, dates: Union[str, Iterable[str]]) -> str:
+        params = normalize_params(lat, lon, radius, dates)
+        return hashlib.sha1(jsonio.dumps(params)).hexdigest()
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}.json"
+
+    def get(self, key: str, versions: Dict[str, str]) -> Optional[Any]:
+        """Return the cached result if present, unexpired, and built from exactly these versions."""
+        result = self._lookup(key, versions)
+        CACHE_LOOKUPS.inc(cache="query", result="miss" if result is None else "hit")
+        return result
+
+    def _lookup(self, key: str, versions: Dict[str, str]) -> Optional[Any]:
+        data = self.backend.get(self._key(key))
+        if data is None:
+            return None
+        try:
+            entry = jsonio.loads(data)
+        except jsonio.DecodeError:
+            return None
+        if self.ttl_seconds is not None and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self.invalidate(key)
+            return None
+        if entry.get("versions") != versions:
+            return None  # built from other data; not ours to delete
+        return entry.get("result")
+
+    def put(self, key: str, versions: Dict[str, str], result: Any, params: Optional[Dict[str, Any]] = None) -> None:
+        """Atomically store a result together with the facility versions it was computed from."""
+        entry = {"created": time.time(), "params": params, "versions": versions, "result": result}
+        self.backend.put(self._key(key), jsonio.dumps(entry), self.ttl_seconds)
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(self._key(key))
+
+    def clear(self) -> int:
+        """Remove every locally stored entry; returns the number removed."""
+        removed = 0
+        for path in self.cache_dir.glob("*.json"):
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
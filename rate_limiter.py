@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+rate_limiter.py - One upstream request budget shared by every fetch, process and instance
+
+Every request to recreation.gov first takes a token from a single token bucket:
+
+    FileTokenBucket    state in temp/rate_limit.json, guarded by an flock'd lock file, so all
+                       fetch.py processes and fetch_parallel workers on a machine share it
+    RedisTokenBucket   state in a Redis hash updated by one Lua script, shared by all instances
+                       (used automatically when CACHE_URL points at Redis, see cache_backend.py)
+
+The bucket refills at RATE_LIMIT_RPS tokens per second up to RATE_LIMIT_BURST, so aggregate
+throughput stays at that rate however many searches run at once. A 429 calls backoff(), which
+pauses the bucket for everyone rather than just the worker that was throttled.
+
+Configuration (environment):
+    RATE_LIMIT_RPS     sustained requests per second (default 2)
+    RATE_LIMIT_BURST   bucket size (default 5)
+
+Usage:
+    limiter = get_rate_limiter()
+    limiter.acquire()            # blocks until a token is available
+    response = session.get(url)
+    if response.status_code == 429:
+        limiter.backoff()
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import jsonio
+from cache_backend import RedisBackend, get_backend
+from cancellation import CancelToken
+
+try:
+    import fcntl
+except ImportError:  # Windows: the bucket is then only shared between threads of one process
+    fcntl = None
+
+DEFAULT_RATE = float(os.environ.get("RATE_LIMIT_RPS", "2"))
+DEFAULT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "5"))
+BACKOFF_SECONDS = 30.0
+RATE_LIMIT_FILE = "temp/rate_limit.json"
+
+
+class TokenBucket:
+    """Shared token bucket; subclasses implement the atomic take-or-wait step."""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+
+    def _take(self, now: float) -> float:
+        """Take one token if available; return 0, or the seconds to wait before retrying."""
+        raise NotImplementedError
+
+    def backoff(self, seconds: float = BACKOFF_SECONDS) -> None:
+        """Pause the bucket for every caller (e.g. after a 429)."""
+        raise NotImplementedError
+
+    def refund(self) -> None:
+        """Return a token that was acquired but not used (e.g. the fetch was cancelled)."""
+        raise NotImplementedError
+
+    def try_acquire(self) -> bool:
+        return self._take(time.time()) == 0
+
+    def acquire(self, timeout: Optional[float] = None, cancel: Optional[CancelToken] = None) -> bool:
+        """Block until a token is taken; returns False if timeout expires or cancel fires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancel is not None and cancel.cancelled:
+                return False
+            wait = self._take(time.time())
+            if wait == 0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+
+    def _refill(self, tokens: float, updated: float, blocked_until: float, now: float):
+        """Shared bucket arithmetic: returns (new tokens, wait seconds)."""
+        if now < blocked_until:
+            return tokens, blocked_until - now
+        tokens = min(self.burst, tokens + max(0.0, now - max(updated, blocked_until)) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+
+class FileTokenBucket(TokenBucket):
+    """Token bucket stored in a JSON file and updated under an exclusive file lock."""
+
+    def __init__(self, path: Union[str, Path] = RATE_LIMIT_FILE, rate: float = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST):
+        super().__init__(rate, burst)
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self._thread_lock = threading.Lock()
+
+    def _update(self, now: float, change):
+        """Run change(state) → (state, result) with the state file locked."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._thread_lock, open(self.lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    state = jsonio.load(self.path)
+                except (OSError, *jsonio.DecodeError):
+                    state = {"tokens": self.burst, "updated": now, "blocked_until": 0.0}
+                state, result = change(state)
+                jsonio.dump_atomic(state, self.path)
+                return result
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _take(self, now: float) -> float:
+        def change(state):
+            tokens, wait = self._refill(state["tokens"], state["updated"], state.get("blocked_until", 0.0), now)
+            return {"tokens": tokens, "updated": max(now, state["updated"]),
+                    "blocked_until": state.get("blocked_until", 0.0)}, wait
+        return self._update(now, change)
+
+    def refund(self) -> None:
+        def change(state):
+            state["tokens"] = min(self.burst, state["tokens"] + 1)
+            return state, None
+        self._update(time.time(), change)
+
+    def backoff(self, seconds: float = BACKOFF_SECONDS) -> None:
+        now = time.time()
+
+        def change(state):
+            state["tokens"] = 0.0
+            state["blocked_until"] = max(state.get("blocked_until", 0.0), now + seconds)
+            return state, None
+        self._update(now, change)
+
+
+# KEYS[1] = bucket hash; ARGV = rate, burst, now. Returns the wait in milliseconds (0 = taken).
+_REDIS_TAKE = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'blocked_until')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+local blocked = tonumber(state[3]) or 0
+if now < blocked then
+  return math.ceil((blocked - now) * 1000)
+end
+tokens = math.min(burst, tokens + math.max(0, now - math.max(updated, blocked)) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(math.max(now, updated)))
+redis.call('EXPIRE', KEYS[1], 3600)
+return wait
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket in a Redis hash; one Lua script makes refill-and-take atomic across instances."""
+
+    def __init__(self, client, key: str = "recdotgov:rate_limit", rate: float = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST):
+        super().__init__(rate, burst)
+        self.client = client
+        self.key = key
+        self._script = client.register_script(_REDIS_TAKE)
+
+    def _take(self, now: float) -> float:
+        return int(self._script(keys=[self.key], args=[self.rate, self.burst, now])) / 1000
+
+    def refund(self) -> None:
+        # Not capped here; the next take caps the bucket at burst again
+        self.client.hincrbyfloat(self.key, "tokens", 1)
+
+    def backoff(self, seconds: float = BACKOFF_SECONDS) -> None:
+        self.client.hset(self.key, mapping={"tokens": 0, "blocked_until": time.time() + seconds})
+
+
+_limiter: Optional[TokenBucket] = None
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Process-wide limiter: Redis-backed when the cache backend is Redis, else the local file."""
+    global _limiter
+    if _limiter is None:
+        backend = get_backend()
+        if isinstance(backend, RedisBackend):
+            _limiter = RedisTokenBucket(backend.client)
+        else:
+            _limiter = FileTokenBucket()
+    return _limiter
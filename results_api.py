@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+results_api.py - Cursor-paginated, sortable, filterable views of stored search results
+
+Searches store their full results once under a result handle (tool_responses.store_results);
+the stream and the agent only carry the top few. The web UI pages through the rest:
+
+    GET /results/<handle>?limit=25&sort=distance&max_distance=30&date=2025-08-06&site_type=tent
+      → {"total": 143, "items": [...25 campgrounds...], "next_cursor": "MjU", "facets": {...}}
+    GET /results/<handle>?cursor=MjU&...same filters...
+      → the next 25
+
+Each item carries at most SITES_PER_ITEM of its matching sites (plus the count of the rest),
+so a page stays small however many campgrounds and site-dates the search found. Stored results
+never change under a handle, so offset cursors are stable.
+
+Sorts: distance (nearest first, default), sites (most matching sites first), name.
+Filters: min_distance/max_distance (miles), date (YYYY-MM-DD), site_type (case-insensitive
+substring of the campsite type, e.g. "tent", "rv", "group").
+
+Usage:
+    page = query_results(handle, sort="sites", max_distance=30)
+    more = query_results(handle, cursor=page["next_cursor"], sort="sites", max_distance=30)
+"""
+
+import base64
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from tool_responses import load_results, results_expire_in
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+SITES_PER_ITEM = 20
+LOADED_HANDLES = 16         # normalized result sets kept in memory
+SORTS = {
+    "distance": lambda c: (c["distance"], -c["site_count"]),
+    "sites": lambda c: (-c["site_count"], c["distance"]),
+    "name": lambda c: (c["name"].lower(), c["distance"]),
+}
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if offset < 0:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return offset
+
+
+def _normalize_site(site: Any, default_date: Optional[str]) -> Dict[str, Any]:
+    """A stored site (a dict from search_pipeline, or just a site name) as {site, loop, campsite_type, dates}."""
+    if not isinstance(site, dict):
+        return {"site": str(site), "loop": None, "campsite_type": None,
+                "dates": [default_date] if default_date else []}
+    dates = site.get("dates") or ([site["date"]] if site.get("date") else [default_date] if default_date else [])
+    return {
+        "site": site.get("site") or site.get("site_name") or site.get("campsite_id"),
+        "loop": site.get("loop"),
+        "campsite_type": site.get("campsite_type") or site.get("type"),
+        "dates": [str(d)[:10] for d in dates],
+    }
+
+
+Loaded = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+# handle → (time.time() its stored copy expires, loaded results); most recently used last
+_loaded: "OrderedDict[str, Tuple[float, Loaded]]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _load(handle: str) -> Optional[Loaded]:
+    """
+    (result metadata, normalized campgrounds) for a handle, or None if it is unknown or expired.
+
+    Handles are immutable, so a loaded handle is kept in memory until its stored copy expires;
+    unknown handles are not remembered (they may be stored later).
+    """
+    now = time.time()
+    with _loaded_lock:
+        entry = _loaded.get(handle)
+        if entry is not None and entry[0] > now:
+            _loaded.move_to_end(handle)
+            return entry[1]
+        _loaded.pop(handle, None)
+
+    expires_in = results_expire_in(handle)
+    results = load_results(handle)
+    if results is None:
+        return None
+    loaded = _normalize(results)
+    if expires_in > 0:
+        with _loaded_lock:
+            _loaded[handle] = (now + expires_in, loaded)
+            while len(_loaded) > LOADED_HANDLES:
+                _loaded.popitem(last=False)
+    return loaded
+
+
+def _normalize(results: Dict[str, Any]) -> Loaded:
+    """Stored results as (metadata, campgrounds with their sites normalized)."""
+    default_date = results.get("date")
+    campgrounds = []
+    for c in results.get("campgrounds") or []:
+        raw_sites = c.get("sites") or c.get("available_sites") or []
+        campgrounds.append({
+            "facility_id": c.get("facility_id"),
+            "name": c.get("name") or "",
+            "distance": float(c.get("distance") or 0),
+            "site_count": int(c.get("site_count", len(raw_sites))),
+            "sites": [_normalize_site(s, default_date) for s in raw_sites],
+        })
+    meta = {k: results[k] for k in ("date", "location", "max_distance", "total_found") if k in results}
+    return meta, campgrounds
+
+
+def _site_types(sites: List[Dict[str, Any]]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for s in sites:
+        if s["campsite_type"]:
+            counts[s["campsite_type"]] = counts.get(s["campsite_type"], 0) + 1
+    return counts
+
+
+def _filter(campground: Dict[str, Any], default_date: Optional[str], date: Optional[str],
+            site_type: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The campground restricted to its matching sites, or None if none match."""
+    if date is None and site_type is None:
+        return campground
+    if not campground["sites"]:
+        # Only a site count is known: the date can still be checked against the search date
+        return campground if site_type is None and date == default_date else None
+    sites = [s for s in campground["sites"]
+             if (date is None or date in s["dates"])
+             and (site_type is None or site_type in (s["campsite_type"] or "").lower())]
+    if not sites:
+        return None
+    return dict(campground, sites=sites, site_count=len(sites))
+
+
+def query_results(handle: str, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                  sort: str = "distance", min_distance: Optional[float] = None,
+                  max_distance: Optional[float] = None, date: Optional[str] = None,
+                  site_type: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    One page of a stored result set; None if the handle is unknown or expired.
+
+    Raises ValueError for an unknown sort or a malformed cursor.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"Unknown sort {sort!r}; use one of {', '.join(SORTS)}")
+    offset = decode_cursor(cursor)
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    site_type = site_type.strip().lower() if site_type and site_type.strip() else None
+    loaded = _load(handle)
+    if loaded is None:
+        return None
+    meta, campgrounds = loaded
+
+    matching = []
+    for c in campgrounds:
+        if min_distance is not None and c["distance"] < min_distance:
+            continue
+        if max_distance is not None and c["distance"] > max_distance:
+            continue
+        c = _filter(c, meta.get("date"), date, site_type)
+        if c is not None:
+            matching.append(c)
+    matching.sort(key=SORTS[sort])
+
+    items = []
+    for c in matching[offset:offset + limit]:
+        items.append({
+            "facility_id": c["facility_id"],
+            "name": c["name"],
+            "distance": round(c["distance"], 1),
+            "site_count": c["site_count"],
+            "site_types": _site_types(c["sites"]),
+            "sites": [{k: s[k] for k in ("site", "loop", "campsite_type")} for s in c["sites"][:SITES_PER_ITEM]],
+            "more_sites": max(0, len(c["sites"]) - SITES_PER_ITEM),
+        })
+    end = offset + len(items)
+    return dict(
+        meta,
+        handle=handle,
+        total=len(matching),
+        items=items,
+        next_cursor=encode_cursor(end) if end < len(matching) else None,
+        sort=sort,
+        facets={"site_types": _site_types([s for c in campgrounds for s in c["sites"]])},
+    )
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+search_pipeline.py - Deterministic search for structured (location, date, distance) queries
+
+Runs the fixed workflow the agent otherwise drives over several LLM turns, directly:
+
+    geocode (cached) → facility set (workspace.py) → result cache check (query_cache.py)
+      → fetch only the missing facilities (shared cache, rate budget, cancellable)
+      → per-facility availability on the date (availability_model.py) → store in the result cache
+
+search() is a generator of progress events in the /query stream format ({"type": "status", ...},
+{"type": "campground_results", ...}), so callers can stream them as they happen:
+
+    /query-detailed      streams the events (web_frontend.py, via stream_search())
+    search_campgrounds   the same pipeline as one agent tool call, returning the final results
+
+batch_search() runs many (location, distance, dates) queries at once: the union of their
+facility-months is fetched and loaded once and every query is evaluated against it (/query-batch).
+
+Usage:
+    python search_pipeline.py "South Lake Tahoe" 2025-08-06 --distance 30
+    python search_pipeline.py "Yosemite" "July 3rd, 2025"
+    python search_pipeline.py --batch trips.json     # [{"location": ..., "distance": ..., "dates": [...]}, ...]
+
+    for event in search("South Lake Tahoe", "2025-08-06", 30):
+        print(event)
+    results = run_batch([{"location": "Yosemite", "dates": ["2025-08-08", "2025-08-09"]},
+                         {"location": "Mammoth Lakes", "distance": 30, "date": "2025-08-08"}])
+"""
+
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import jsonio
+from avail_cache import is_cached, month_cache_dir
+from availability_index import AvailabilityIndex, load_index_for
+from availability_model import Campsite, load_directory
+from cancellation import CancelToken, current_token
+from facility_registry import load_campgrounds
+from fetch import ensure_campground_table, fetch_availability, new_session
+from geo import geocode_location
+from merge_manifest import MergeManifest
+from query_cache import QueryCache, facility_versions, normalize_params
+from tool_responses import COMPACT, compact_results
+from workspace import Workspace
+
+FETCH_WORKERS = 4        # overlaps request latency; the shared rate budget still sets the pace
+PROGRESS_EVERY = 10      # facilities between fetch progress events
+MAX_BATCH_QUERIES = 20
+DATE_FORMATS = ("%B %d %Y", "%b %d %Y", "%m/%d/%Y", "%B %d", "%b %d", "%m/%d")
+CANCELLED = {"type": "cancelled", "message": "Search cancelled; campgrounds fetched so far stay cached"}
+
+
+def parse_date(text: str, today: Optional[date] = None) -> date:
+    """
+    Parse "2025-08-06", "August 6th, 2025", "Aug 6 2025", "8/6/2025" or "Aug 6".
+
+    A date without a year is taken as the next occurrence on or after today.
+    """
+    text = text.strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    cleaned = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", text.replace(",", " "), flags=re.I)
+    cleaned = " ".join(cleaned.split())
+    today = today or date.today()
+    for fmt in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(cleaned, fmt).date()
+        except ValueError:
+            continue
+        if "%Y" not in fmt:
+            parsed = parsed.replace(year=today.year)
+            if parsed < today:
+                parsed = parsed.replace(year=today.year + 1)
+        return parsed
+    raise ValueError(f"Could not understand the date {text!r}; use YYYY-MM-DD")
+
+
+def merged_index(merged_file: Path, month: str) -> Tuple[Optional[AvailabilityIndex], Set[str]]:
+    """
+    The query index written with a merged file, and the facilities whose entries in it still
+    match the month's cached payloads (per the merge manifest); (None, empty) if there is none.
+    """
+    manifest = MergeManifest.load_for(merged_file)
+    if manifest is None:
+        return None, set()
+    try:
+        index = load_index_for(merged_file)
+    except (OSError, KeyError, ValueError, *jsonio.DecodeError):
+        index = None
+    if index is None:
+        return None, set()
+    return index, manifest.current_facilities(month_cache_dir(month))
+
+
+class SharedAvailability:
+    """
+    Month payloads loaded once and shared by every query evaluated against them.
+
+    Payloads are decoded lazily, at most once per facility-month, and each (facility, day)
+    lookup is computed once however many overlapping queries ask for it. Where a merged file's
+    query index (fetch.py / prewarm.py merges) is current for a facility, a day on which the
+    index counts no Available sites is answered without decoding the payload at all.
+    """
+
+    def __init__(self, facility_ids_by_month: Dict[str, Iterable[str]],
+                 merged_files: Iterable[Tuple[str, Path]] = ()):
+        self.campgrounds = {month: load_directory(month_cache_dir(month), sorted(set(ids)))
+                            for month, ids in facility_ids_by_month.items()}
+        self._sites: Dict[Tuple[str, date], List[Campsite]] = {}
+        # (month, facility_id) → an index whose entries for that facility are current
+        self._indexes: Dict[Tuple[str, str], AvailabilityIndex] = {}
+        for month, merged_file in set(merged_files):
+            index, current = merged_index(merged_file, month)
+            for facility_id in current & set(self.campgrounds.get(month, ())):
+                self._indexes[(month, facility_id)] = index
+
+    def sites_on(self, facility_id: str, day: date) -> List[Campsite]:
+        key = (facility_id, day)
+        if key not in self._sites:
+            month = day.strftime("%Y-%m")
+            index = self._indexes.get((month, facility_id))
+            campground = self.campgrounds.get(month, {}).get(facility_id)
+            if campground is None or (index is not None and index.count(facility_id, day) == 0):
+                self._sites[key] = []
+            else:
+                self._sites[key] = campground.available_sites_on(day)
+        return self._sites[key]
+
+
+def available_campgrounds(rows: List[Dict[str, Any]], days: List[date],
+                          data: SharedAvailability) -> List[Dict[str, Any]]:
+    """Campgrounds (workspace rows, nearest first) with at least one site Available on any of the days."""
+    results = []
+    for row in rows:
+        fid = str(row["FacilityID"])
+        by_site: Dict[str, Tuple[Campsite, List[str]]] = {}
+        per_day = {}
+        for day in days:
+            sites = data.sites_on(fid, day)
+            if sites:
+                per_day[day.isoformat()] = len(sites)
+            for s in sites:
+                by_site.setdefault(s.campsite_id, (s, []))[1].append(day.isoformat())
+        if by_site:
+            results.append({
+                "facility_id": fid,
+                "name": row["FacilityName"],
+                "state": row["AddressStateCode"],
+                "distance": round(float(row["distance_miles"]), 1),
+                "site_count": len(by_site),
+                "available_dates": per_day,
+                "sites": [{"site": s.site, "loop": s.loop, "campsite_type": s.campsite_type, "dates": dates}
+                          for s, dates in sorted(by_site.values(), key=lambda entry: entry[0].site or "")],
+            })
+    return results
+
+
+def search(location: str, date_text: str, distance: float = 50,
+           cancel: Optional[CancelToken] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Run the pipeline, yielding progress events; the last event is "campground_results" (or
+    "error", or "cancelled" if the token was cancelled while fetching).
+
+    cancel defaults to the current request's token (cancellation.current_token()), if any.
+    """
+    cancel = cancel or current_token() or CancelToken()
+    try:
+        day = parse_date(date_text)
+    except ValueError as e:
+        yield {"type": "error", "message": str(e)}
+        return
+    month = day.strftime("%Y-%m")
+
+    try:
+        lat, lon = geocode_location(location)
+    except (ValueError, OSError) as e:  # OSError: geocoder network failures
+        yield {"type": "error", "message": str(e)}
+        return
+    yield {"type": "parameters", "location": location, "date": day.isoformat(), "distance": distance}
+
+    ensure_campground_table()
+    ws = Workspace.for_region(lat, lon, distance)
+    ws.write_download_csv()
+    yield {"type": "status", "message": f"📍 {len(ws.facility_ids)} campgrounds within {distance:g} miles"}
+
+    cache = QueryCache.shared()
+    key = cache.make_key(lat, lon, distance, day.isoformat())
+    cache_dir = month_cache_dir(month)
+    versions = facility_versions(ws.facility_ids, cache_dir)
+    hit = cache.get(key, versions)
+    if hit is not None:
+        yield {"type": "cache_hit", "message": "⚡ Using cached results"}
+        yield dict(hit, type="campground_results", cached=True)  # batch_search stores the same entries
+        return
+
+    pending = ws.pending(month)
+    if pending:
+        yield {"type": "status", "message": f"⬇️ Fetching {len(pending)} of {len(ws.facility_ids)} campgrounds for {month}"}
+        yield from _fetch([(month, fid) for fid in pending], cancel)
+        if cancel.cancelled:
+            yield dict(CANCELLED)
+            return
+        versions = facility_versions(ws.facility_ids, cache_dir)
+    else:
+        yield {"type": "cache_hit", "message": f"⚡ All {len(ws.facility_ids)} campgrounds already cached for {month}"}
+
+    data = SharedAvailability({month: ws.facility_ids}, [(month, ws.merged_file(month))])
+    campgrounds = available_campgrounds(ws.rows, [day], data)
+    results = {
+        "type": "campground_results",
+        "campgrounds": campgrounds,
+        "date": day.isoformat(),
+        "location": location,
+        "max_distance": distance,
+        "total_found": len(campgrounds),
+    }
+    cache.put(key, versions, results, normalize_params(lat, lon, distance, day.isoformat()))
+    yield results
+
+
+def _fetch(pending: List[Tuple[str, str]], cancel: CancelToken) -> Iterator[Dict[str, Any]]:
+    """Fetch (month, facility_id) pairs over one pooled client, yielding progress; stops submitting when cancelled."""
+    for month in {month for month, _ in pending}:
+        month_cache_dir(month).mkdir(parents=True, exist_ok=True)
+    done = failed = 0
+    with new_session(pool_size=FETCH_WORKERS) as client, ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        futures = {
+            pool.submit(fetch_availability, fid, month, month_cache_dir(month), client, cancel=cancel): (month, fid)
+            for month, fid in pending
+        }
+        for future in as_completed(futures):
+            if cancel.cancelled:
+                for f in futures:
+                    f.cancel()
+                return
+            try:
+                ok = not future.cancelled() and future.result()
+            except Exception as e:
+                month, fid = futures[future]
+                print(f"[!] Fetching {month} availability for facility {fid} failed: {e}")
+                ok = False
+            if not ok:
+                failed += 1
+            done += 1
+            if done % PROGRESS_EVERY == 0 or done == len(futures):
+                yield {"type": "status", "message": f"⬇️ {done}/{len(futures)} fetched"}
+    if failed:
+        yield {"type": "warning", "message": f"⚠️ {failed} campgrounds could not be fetched and are skipped"}
+
+
+def _query_dates(query: Dict[str, Any]) -> List[str]:
+    dates = query.get("dates") or query.get("date") or []
+    return [dates] if isinstance(dates, str) else list(dates)
+
+
+def _versions(facility_ids: List[str], months: List[str]) -> Dict[str, str]:
+    """Payload versions a result depends on (same form as search() for a single month)."""
+    if len(months) == 1:
+        return facility_versions(facility_ids, month_cache_dir(months[0]))
+    versions = {}
+    for month in months:
+        for fid, version in facility_versions(facility_ids, month_cache_dir(month)).items():
+            versions[f"{month}/{fid}"] = version
+    return versions
+
+
+def batch_search(queries: List[Dict[str, Any]], cancel: Optional[CancelToken] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Evaluate several queries over one shared fetch, yielding progress events.
+
+    Each query is {"location": "Yosemite", "distance": 30, "dates": ["2025-08-06", "Aug 7"]}
+    ("date" also works for a single night). The facility-months all queries need are fetched
+    once, loaded once and evaluated for every query, so a batch of overlapping queries costs
+    about as much as the largest of them. The last event is "batch_results", with one result
+    per query in order (an error result for a query that could not be understood), unless the
+    batch is cancelled while fetching ("cancelled").
+    """
+    cancel = cancel or current_token() or CancelToken()
+    if not queries or len(queries) > MAX_BATCH_QUERIES:
+        yield {"type": "error", "message": f"A batch needs 1 to {MAX_BATCH_QUERIES} queries"}
+        return
+
+    ensure_campground_table()
+    table = load_campgrounds()
+    cache = QueryCache.shared()
+    plans: List[Dict[str, Any]] = []
+    for i, query in enumerate(queries):
+        try:
+            days = sorted({parse_date(text) for text in _query_dates(query)})
+            if not days:
+                raise ValueError("No dates given")
+            location = query["location"]
+            lat, lon = geocode_location(location)
+        except (KeyError, TypeError, ValueError, OSError) as e:  # OSError: geocoder network failures
+            plans.append({"result": {"query": i, "status": "error", "message": f"Query {i + 1}: {e}"}})
+            continue
+        distance = float(query.get("distance") or 50)
+        ws = Workspace.for_region(lat, lon, distance, table)
+        dates = [day.isoformat() for day in days]
+        plan = {"index": i, "location": location, "distance": distance, "days": days, "ws": ws,
+                "months": sorted({day.strftime("%Y-%m") for day in days}),
+                "key": cache.make_key(lat, lon, distance, dates),
+                "params": normalize_params(lat, lon, distance, dates)}
+        hit = cache.get(plan["key"], _versions(ws.facility_ids, plan["months"]))
+        if hit is not None:
+            hit.pop("type", None)  # entries stored by search() carry their event type
+            hit.setdefault("dates", dates)
+            plan["result"] = dict(hit, query=i, status="success", cached=True)
+        plans.append(plan)
+
+    # Union of facility-months still to evaluate, versus what separate searches would each need
+    needed: Dict[str, set] = {}
+    requested = 0
+    for plan in plans:
+        if "result" not in plan:
+            for month in plan["months"]:
+                needed.setdefault(month, set()).update(plan["ws"].facility_ids)
+                requested += len(plan["ws"].facility_ids)
+    unique = sum(len(ids) for ids in needed.values())
+    pending = [(month, fid) for month in sorted(needed) for fid in sorted(needed[month])
+               if not is_cached(fid, month_cache_dir(month))]
+    cached = sum(1 for plan in plans if plan.get("result", {}).get("cached"))
+    yield {"type": "status", "message": f"📦 {len(plans)} queries ({cached} cached) need {unique} facility-months "
+                                        f"({requested} if run separately); {len(pending)} to fetch"}
+    if pending:
+        yield from _fetch(pending, cancel)
+        if cancel.cancelled:
+            yield dict(CANCELLED)
+            return
+
+    data = SharedAvailability(needed, [(month, plan["ws"].merged_file(month))
+                                       for plan in plans if "result" not in plan for month in plan["months"]])
+    for plan in plans:
+        if "result" in plan:
+            continue
+        campgrounds = available_campgrounds(plan["ws"].rows, plan["days"], data)
+        result = {
+            "campgrounds": campgrounds,
+            "dates": [day.isoformat() for day in plan["days"]],
+            "date": plan["days"][0].isoformat(),
+            "location": plan["location"],
+            "max_distance": plan["distance"],
+            "total_found": len(campgrounds),
+        }
+        cache.put(plan["key"], _versions(plan["ws"].facility_ids, plan["months"]), result, plan["params"])
+        plan["result"] = dict(result, query=plan["index"], status="success")
+
+    yield {
+        "type": "batch_results",
+        "results": [plan["result"] for plan in plans],
+        "facility_months": unique,
+        "facility_months_requested": requested,
+        "fetched": len(pending),
+    }
+
+
+def run_batch(queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """batch_search() as a plain call: the per-query results, in order."""
+    last: Dict[str, Any] = {"type": "error", "message": "Batch produced no results"}
+    for event in batch_search(queries):
+        last = event
+    if last["type"] in ("error", "cancelled"):
+        raise ValueError(last["message"])
+    return last["results"]
+
+
+def search_campgrounds(location: str, date: str, distance: int = 50) -> Dict[str, Any]:
+    """
+    Find campgrounds with available sites near a location on a specific date, in one call.
+
+    Args:
+        location: Place to search around (e.g. "South Lake Tahoe", "Yosemite")
+        date: The night to camp (e.g. "2025-08-06" or "August 6th, 2025")
+        distance: Search radius in miles (default 50)
+
+    Returns:
+        Dict with status, total_found and the nearest campgrounds (name, distance, site_count,
+        facility_id); result_handle refers to the full list
+    """
+    last: Dict[str, Any] = {"type": "error", "message": "Search produced no results"}
+    for event in search(location, date, distance):
+        last = event
+    if last["type"] in ("error", "cancelled"):
+        return {"status": "error", "message": last["message"]}
+    last.pop("type", None)
+    return dict(compact_results(last) if COMPACT else last, status="success")
+
+
+def stream_search(location: str, date_text: str, distance: float = 50) -> AsyncIterator[Dict[str, Any]]:
+    """search() as an async iterator for streaming responses (see stream_events)."""
+    return stream_events(lambda cancel: search(location, date_text, distance, cancel))
+
+
+def stream_batch(queries: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """batch_search() as an async iterator for streaming responses (see stream_events)."""
+    return stream_events(lambda cancel: batch_search(queries, cancel))
+
+
+async def stream_events(events: Callable[[CancelToken], Iterator[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run an event generator on a worker thread, as an async iterator for streaming responses.
+
+    Closing the iterator early (e.g. the client disconnected) cancels the search: no new
+    facilities are fetched, and those already fetched stay in the shared cache.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = CancelToken()
+
+    def produce() -> None:
+        try:
+            for event in events(cancel):
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "message": f"Search failed: {e}"})
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    loop.run_in_executor(None, produce)
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            yield event
+    finally:
+        cancel.cancel()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search campground availability without the agent")
+    parser.add_argument("location", nargs="?", help="Location to search around")
+    parser.add_argument("date", nargs="?", help="Night to camp (YYYY-MM-DD or e.g. 'August 6th, 2025')")
+    parser.add_argument("--distance", type=float, default=50, help="Search radius in miles (default: 50)")
+    parser.add_argument("--batch", metavar="FILE", help="JSON list of queries to evaluate together")
+    args = parser.parse_args()
+
+    if args.batch:
+        for event in batch_search(jsonio.load(args.batch)):
+            if event["type"] != "batch_results":
+                print(event.get("message", event))
+                continue
+            print(f"\n[✓] {event['facility_months']} facility-months evaluated "
+                  f"({event['facility_months_requested']} if run separately), {event['fetched']} fetched")
+            for result in event["results"]:
+                if result["status"] != "success":
+                    print(f"[!] {result['message']}")
+                    continue
+                print(f"    {result['location']} within {result['max_distance']:g} mi on {', '.join(result['dates'])}: "
+                      f"{result['total_found']} campgrounds{' (cached)' if result.get('cached') else ''}")
+        return
+    if not (args.location and args.date):
+        parser.error("location and date are required unless using --batch")
+
+    for event in search(args.location, args.date, args.distance):
+        if event["type"] == "campground_results":
+            print(f"\n[✓] {event['total_found']} campgrounds with sites on {event['date']}"
+                  f"{' (cached)' if event.get('cached') else ''}")
+            for c in event["campgrounds"]:
+                print(f"    {c['name']} ({c['distance']} mi): {c['site_count']} sites  [ID {c['facility_id']}]")
+        elif event["type"] == "parameters":
+            print(f"[→] {event['location']} on {event['date']} within {event['distance']:g} miles")
+        else:
+            print(event.get("message", event))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+stay_search.py - Consecutive-night stay search over fetched availability
+
+Finds every (campground, site, check-in date) with N consecutive Available nights, honouring
+the minConsecutiveStay/maxConsecutiveStay limits in a campsite's campsite_rules on the check-in
+dates inside each rule's start_date/end_date window.
+
+All sites are packed into one big integer bitmask (one bit per site-day, with a zero gap bit
+between sites), so "N consecutive nights" is N-1 shift-and-AND operations across the whole
+region at once instead of a per-site, per-day scan. With a current query index next to the
+merged file (fetch.py writes one), only campgrounds the index shows with a long enough
+Available run in the check-in range are decoded and searched.
+
+Usage:
+    python stay_search.py 2025-08 --nights 2 --weekdays fri      # Fri+Sat nights, any August weekend
+    python stay_search.py 2025-08 --nights 3                     # Any 3 consecutive nights
+    python stay_search.py 2025-08 --nights 2 --from 2025-08-01 --to 2025-08-15
+    python stay_search.py 2025-08 --nights 2 --workers 0         # Shard temp/2025-08/ across every core
+
+    from stay_search import StaySearch
+    matches = StaySearch(load_merged("all_avail_2025-08.json")).find(2, check_in_weekdays={4})
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from availability_index import AvailabilityIndex, load_index_for
+from availability_model import Campground, Campsite, Status
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+
+# statuses bytes → b"1" for Available days, b"0" otherwise
+_AVAILABLE_BITS = bytes(ord("1") if s == Status.AVAILABLE else ord("0") for s in range(256))
+
+
+class StayMatch(NamedTuple):
+    facility_id: str
+    campsite_id: str
+    site: Optional[str]
+    loop: Optional[str]
+    check_in: date
+    nights: int
+
+
+def _rule_value(value: Any) -> Optional[int]:
+    """Extract an integer from a rule value that may be a number or {"value": n}."""
+    if isinstance(value, dict):
+        value = value.get("value")
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# start_date/end_date of a rule that applies on every date
+_OPEN_ENDED = "0001-01-01"
+
+# campsite_rules names that limit the length of one stay (units "consecutive nights")
+CONSECUTIVE_STAY_RULES = {"minConsecutiveStay": "min", "maxConsecutiveStay": "max"}
+
+
+def _rule_window(value: Any) -> Tuple[Optional[date], Optional[date]]:
+    """(first, last) check-in date a rule applies to; None for an open end."""
+    if not isinstance(value, dict):
+        return None, None
+    bounds = []
+    for snake, camel in (("start_date", "startDate"), ("end_date", "endDate")):
+        raw = value.get(snake) or value.get(camel)
+        bound = None
+        if isinstance(raw, str) and not raw.startswith(_OPEN_ENDED):
+            try:
+                bound = date.fromisoformat(raw[:10])
+            except ValueError:
+                pass
+        bounds.append(bound)
+    return bounds[0], bounds[1]
+
+
+def has_rule_windows(rules: Any) -> bool:
+    """True if any rule in a campsite_rules payload is limited to a date window."""
+    return isinstance(rules, dict) and any(_rule_window(v) != (None, None) for v in rules.values())
+
+
+def stay_limits(rules: Any, day: Optional[date] = None) -> Tuple[int, Optional[int]]:
+    """
+    Return (min_nights, max_nights) from a campsite_rules payload for a check-in on `day`.
+
+    Only the consecutive-night rules count (CONSECUTIVE_STAY_RULES), and only when their units,
+    if given, are "consecutive nights". maxStay is a cap on nights per period ("Each Year",
+    "Rolling 30 Days") across all of a camper's bookings, not a limit on one stay, so it is
+    ignored. Each rule carries a start_date/end_date window ("0001-01-01" for an open end; the
+    fixtures also hold expired windows such as all of 2021); a rule only counts when `day`
+    falls inside it. With day=None every rule counts, whatever its window.
+    """
+    min_nights, max_nights = 1, None
+    if not isinstance(rules, dict):
+        return min_nights, max_nights
+    for key, value in rules.items():
+        bound = CONSECUTIVE_STAY_RULES.get(key)
+        if bound is None:
+            continue
+        if isinstance(value, dict) and "consecutive" not in (value.get("units") or "consecutive").lower():
+            continue
+        n = _rule_value(value)
+        if n is None:
+            continue
+        if day is not None:
+            first, last = _rule_window(value)
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+        if bound == "min":
+            min_nights = max(min_nights, n)
+        else:
+            max_nights = n if max_nights is None else min(max_nights, n)
+    return min_nights, max_nights
+
+
+def _forbids(limits: Tuple[int, Optional[int]], nights: int) -> bool:
+    min_nights, max_nights = limits
+    return nights < min_nights or (max_nights is not None and nights > max_nights)
+
+
+class StaySearch:
+    """Bitmask index over every site of a set of campgrounds."""
+
+    def __init__(self, campgrounds: Dict[str, Campground]):
+        self.sites: List[Tuple[str, Campsite]] = []
+        # Per site: one (min, max) for every day, or a list of them by day when rules have windows
+        limits: List[Any] = []
+
+        starts = [c.start for c in campgrounds.values() if c.start is not None]
+        self.start: Optional[date] = min(starts) if starts else None
+        self.num_days = 0
+        for campground in campgrounds.values():
+            if campground.start is not None:
+                lead = (campground.start - self.start).days
+                self.num_days = max(self.num_days, lead + campground.num_days)
+        # One zero gap bit after each site keeps runs from crossing into the next site
+        self.stride = self.num_days + 1
+
+        rows = []
+        for facility_id, campground in campgrounds.items():
+            if campground.start is None:
+                continue
+            lead = (campground.start - self.start).days
+            for site in campground.campsites.values():
+                row = "0" * lead + site.statuses.translate(_AVAILABLE_BITS).decode("ascii")
+                rows.append(row.ljust(self.stride, "0"))
+                self.sites.append((facility_id, site))
+                if has_rule_windows(site.rules):
+                    limits.append([stay_limits(site.rules, self.start + timedelta(days=d))
+                                   for d in range(self.num_days)])
+                else:
+                    limits.append(stay_limits(site.rules))
+
+        # Bit (i * stride + d) is set when site i is Available on day d
+        self.mask = int("".join(rows)[::-1] or "0", 2)
+        self._limits = limits
+
+    def _day_filter(self, check_in_weekdays: Optional[Set[int]], first: Optional[date],
+                    last: Optional[date]) -> Optional[int]:
+        """Bitmask of allowed check-in days, tiled across every site (None = no filter)."""
+        if check_in_weekdays is None and first is None and last is None:
+            return None
+        row = []
+        for d in range(self.stride):
+            day = self.start + timedelta(days=d)
+            ok = d < self.num_days
+            ok = ok and (check_in_weekdays is None or day.weekday() in check_in_weekdays)
+            ok = ok and (first is None or day >= first) and (last is None or day <= last)
+            row.append("1" if ok else "0")
+        return int(("".join(row) * len(self.sites))[::-1] or "0", 2)
+
+    def find(self, nights: int, check_in_weekdays: Optional[Iterable[int]] = None,
+             first: Optional[date] = None, last: Optional[date] = None) -> List[StayMatch]:
+        """
+        Find every site/check-in with `nights` consecutive Available nights.
+
+        Args:
+            nights: Number of consecutive nights
+            check_in_weekdays: Allowed check-in weekdays (Monday=0 … Sunday=6), default any
+            first, last: Allowed check-in date range (inclusive), default any
+        """
+        if self.start is None or nights < 1:
+            return []
+
+        # Bit d survives only if days d .. d+nights-1 are all Available
+        runs = self.mask
+        for k in range(1, nights):
+            runs &= self.mask >> k
+
+        # Sites (or, for windowed rules, check-in days) whose stay rules forbid this length
+        row_mask = (1 << self.stride) - 1
+        for i, limits in enumerate(self._limits):
+            if isinstance(limits, list):
+                allowed = int("".join("0" if _forbids(day_limits, nights) else "1"
+                                      for day_limits in limits)[::-1] or "0", 2)
+                runs &= ~(row_mask << (i * self.stride)) | (allowed << (i * self.stride))
+            elif _forbids(limits, nights):
+                runs &= ~(row_mask << (i * self.stride))
+
+        day_filter = self._day_filter(set(check_in_weekdays) if check_in_weekdays is not None else None,
+                                      first, last)
+        if day_filter is not None:
+            runs &= day_filter
+
+        matches = []
+        bits = bin(runs)[:1:-1]  # bit 0 first
+        pos = bits.find("1")
+        while pos != -1:
+            site_no, offset = divmod(pos, self.stride)
+            facility_id, site = self.sites[site_no]
+            matches.append(StayMatch(facility_id, site.campsite_id, site.site, site.loop,
+                                     self.start + timedelta(days=offset), nights))
+            pos = bits.find("1", pos + 1)
+        return matches
+
+
+def with_runs_of(campgrounds: Dict[str, Campground], index: AvailabilityIndex, nights: int,
+                 first: Optional[date] = None, last: Optional[date] = None) -> Dict[str, Campground]:
+    """
+    The campgrounds the index shows with `nights` consecutive Available nights starting in
+    [first, last]; the rest cannot match, so StaySearch need not decode them.
+    """
+    facility_ids = {
+        site[0] for site, start, length in index.runs_of_at_least(nights)
+        if (last is None or start <= last) and (first is None or start + timedelta(days=length - nights) >= first)
+    }
+    return {fid: c for fid, c in campgrounds.items() if fid in facility_ids}
+
+
+def group_by_campground(matches: Iterable[StayMatch]) -> Dict[str, List[StayMatch]]:
+    """Group matches by facility ID, keeping check-in order within each campground."""
+    grouped: Dict[str, List[StayMatch]] = {}
+    for match in sorted(matches, key=lambda m: (m.facility_id, m.check_in, m.campsite_id)):
+        grouped.setdefault(match.facility_id, []).append(match)
+    return grouped
+
+
+def main():
+    import argparse
+    import time
+
+    from availability_model import load_merged
+
+    parser = argparse.ArgumentParser(description="Find consecutive-night stays in merged availability data")
+    parser.add_argument("month", help="Month of the merged file (YYYY-MM)")
+    parser.add_argument("--nights", type=int, default=2, help="Consecutive nights (default: 2)")
+    parser.add_argument("--weekdays", type=str, default=None,
+                        help="Allowed check-in weekdays, comma separated (e.g. 'fri' or 'thu,fri')")
+    parser.add_argument("--from", dest="first", type=date.fromisoformat, default=None, help="Earliest check-in")
+    parser.add_argument("--to", dest="last", type=date.fromisoformat, default=None, help="Latest check-in")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Search temp/<MONTH>/avail_*.json in this many processes (0 = one per core)")
+    args = parser.parse_args()
+
+    weekdays = None
+    if args.weekdays:
+        weekdays = {WEEKDAYS[w.strip().lower()[:3]] for w in args.weekdays.split(",")}
+
+    t0 = time.perf_counter()
+    if args.workers is not None:
+        from pathlib import Path
+
+        from parallel_analysis import parallel_stay_search
+
+        paths = [p for p in Path("temp", args.month).glob("avail_*.json") if p.stat().st_size > 0]
+        matches, num_sites = parallel_stay_search(paths, args.nights, weekdays, args.first, args.last, args.workers)
+    else:
+        merged_file = f"all_avail_{args.month}.json"
+        campgrounds = load_merged(merged_file)
+        t0 = time.perf_counter()
+        index = load_index_for(merged_file)
+        if index is not None:
+            campgrounds = with_runs_of(campgrounds, index, args.nights, args.first, args.last)
+        search = StaySearch(campgrounds)
+        matches = search.find(args.nights, weekdays, args.first, args.last)
+        num_sites = len(search.sites)
+    elapsed = time.perf_counter() - t0
+
+    for facility_id, group in group_by_campground(matches).items():
+        print(f"{facility_id}: {len(group)} stay(s)")
+        for m in group[:10]:
+            print(f"    site {m.site} (loop {m.loop}) check-in {m.check_in} for {m.nights} night(s)")
+        if len(group) > 10:
+            print(f"    … {len(group) - 10} more")
+    print(f"\n[✓] {len(matches)} stays across {num_sites} sites in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the availability query index
+"""
+
+from datetime import date
+
+from availability_index import AvailabilityIndex, index_path_for
+from availability_model import Campground
+from test_availability_model import make_payload
+
+A, R = "Available", "Reserved"
+
+
+def build_index():
+    return AvailabilityIndex.build({
+        "1": Campground("1", make_payload({"10": [A, A, A, R, A], "11": [R, A, R, R, A]})),
+        "2": Campground("2", make_payload({"20": [A, R, A, A, R]})),
+    })
+
+
+def test_counts_per_facility_and_date():
+    index = build_index()
+
+    assert index.count("1", date(2025, 8, 2)) == 2
+    assert index.count("2", date(2025, 8, 2)) == 0
+    assert index.count("3", date(2025, 8, 1)) == 0
+
+
+def test_consecutive_nights():
+    index = build_index()
+
+    assert index.runs_of_at_least(3) == [(("1", "10"), date(2025, 8, 1), 3)]
+    assert sorted(index.runs_of_at_least(2)) == [(("1", "10"), date(2025, 8, 1), 3),
+                                                 (("2", "20"), date(2025, 8, 3), 2)]
+    assert index.runs_of_at_least(6) == []
+
+
+def test_round_trip(tmp_path):
+    index = build_index()
+    path = tmp_path / "all_avail_2025-08.index.json"
+    index.save(path)
+
+    loaded = AvailabilityIndex.load(path)
+
+    assert loaded.to_json() == index.to_json()
+    assert loaded.runs_of_at_least(2) == index.runs_of_at_least(2)
+
+
+def test_helpers():
+    assert index_path_for("all_avail_2025-08.json").name == "all_avail_2025-08.index.json"
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact availability model
+"""
+
+import json
+from datetime import date
+
+from availability_model import Campground, Status, load_directory, load_merged
+
+
+def make_payload(statuses_by_site):
+    """Build a month-endpoint style payload from {campsite_id: [status, ...]} starting 2025-08-01."""
+    campsites = {}
+    for campsite_id, statuses in statuses_by_site.items():
+        campsites[campsite_id] = {
+            "campsite_id": campsite_id,
+            "site": f"S{campsite_id}",
+            "loop": "A",
+            "campsite_type": "STANDARD NONELECTRIC",
+            "availabilities": {
+                f"2025-08-{day:02d}T00:00:00Z": status for day, status in enumerate(statuses, 1)
+            },
+        }
+    return {"campsites": campsites, "count": len(campsites)}
+
+
+def test_statuses_are_compacted_by_day_offset():
+    campground = Campground("1", make_payload({"10": ["Available", "Reserved", "Closed", "Something New"]}))
+    site = campground.campsites["10"]
+
+    assert campground.start == date(2025, 8, 1)
+    assert site.statuses == bytes([Status.AVAILABLE, Status.RESERVED, Status.CLOSED, Status.UNKNOWN])
+    assert site.status_at(-1) == Status.UNKNOWN
+    assert site.status_at(10) == Status.UNKNOWN
+    assert [s.campsite_id for s in campground.available_sites_on(date(2025, 8, 1))] == ["10"]
+
+
+def test_metadata_strings_are_interned():
+    campground = Campground("1", make_payload({"10": ["Available"], "11": ["Reserved"]}))
+    a, b = campground.campsites["10"], campground.campsites["11"]
+    assert a.campsite_type is b.campsite_type
+
+
+def test_directory_load_is_lazy(tmp_path):
+    (tmp_path / "avail_1.json").write_text(json.dumps(make_payload({"10": ["Available"]})))
+    (tmp_path / "avail_2.json").write_text("")
+
+    campgrounds = load_directory(tmp_path)
+
+    assert list(campgrounds) == ["1"]
+    assert not campgrounds["1"].is_decoded
+    assert len(campgrounds["1"].campsites) == 1
+    assert campgrounds["1"].is_decoded
+
+
+def test_load_merged(tmp_path):
+    merged = {"1": make_payload({"10": ["Reserved", "Available"]}), "2": {}}
+    path = tmp_path / "all_avail_2025-08.json"
+    path.write_text(json.dumps(merged))
+
+    campgrounds = load_merged(path)
+
+    assert campgrounds["1"].campsites["10"].available_offsets() == [1]
+    assert campgrounds["2"].campsites == {}
+    assert campgrounds["2"].start is None
+
+
+def test_load_merged_decodes_on_demand_with_a_manifest(tmp_path):
+    from fetch import merge_availability_files
+
+    for fid, statuses in (("1", ["Reserved", "Available"]), ("2", ["Available"])):
+        (tmp_path / f"avail_{fid}.json").write_text(json.dumps(make_payload({f"{fid}0": statuses})))
+    path = tmp_path / "all_avail_2025-08.json"
+    merge_availability_files(tmp_path, "2025-08", output_file=path)
+
+    campgrounds = load_merged(path)
+    assert not any(c.is_decoded for c in campgrounds.values())
+    assert campgrounds["1"].campsites["10"].available_offsets() == [1]
+    assert not campgrounds["2"].is_decoded
+    assert campgrounds["2"].campsites["20"].available_offsets() == [0]
+
+
+def test_malformed_payload_parts_are_skipped():
+    payload = {"campsites": {"bad": "not a site", "10": {"availabilities": {
+        "not a date": "Available", "2025-08-01T00:00:00Z": "Available"}}}}
+    campground = Campground("1", payload)
+    assert list(campground.campsites) == ["10"]
+    assert campground.campsites["10"].available_offsets() == [0]
+
+    no_dates = Campground("2", ["not", "an", "object"])
+    assert no_dates.campsites == {}
+    assert no_dates.date_at(0) is None
+
+
+def test_compressed_files_load_transparently(tmp_path):
+    import jsonio
+
+    raw = json.dumps(make_payload({"10": ["Available"]})).encode()
+    jsonio.write_compressed_atomic(tmp_path / "avail_1.json", raw, codec="gzip")
+    (tmp_path / "avail_2.json").write_bytes(raw)
+
+    campgrounds = load_directory(tmp_path)
+    assert sorted(campgrounds) == ["1", "2"]
+    assert campgrounds["1"].campsites["10"].statuses == campgrounds["2"].campsites["10"].statuses
+    assert jsonio.read_bytes(tmp_path / "avail_1.json") == raw
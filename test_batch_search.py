@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Batch search over shared data, run offline against the July 2025 fixture payloads."""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+import search_pipeline
+import workspace
+from query_cache import QueryCache
+from search_pipeline import batch_search, search
+
+FIXTURES = sorted(Path(__file__).parent.glob("temp/avail_*.json"))[:12]
+
+
+@pytest.fixture
+def region(tmp_path, monkeypatch):
+    """12 campgrounds along a line east of (38.0, -120.0), one every ~6.9 miles, all cached."""
+    month_dir = tmp_path / "2025-07"
+    month_dir.mkdir()
+    table = []
+    for i, path in enumerate(FIXTURES):
+        shutil.copy(path, month_dir / path.name)
+        table.append({"FacilityID": path.stem[6:], "FacilityName": f"Camp {i}", "AddressStateCode": "CA",
+                      "FacilityLatitude": "38.0", "FacilityLongitude": str(-120.0 + 0.125 * i)})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search_pipeline, "ensure_campground_table", lambda: None)
+    monkeypatch.setattr(search_pipeline, "load_campgrounds", lambda: table)
+    monkeypatch.setattr(workspace, "load_campgrounds", lambda: table)
+    monkeypatch.setattr(search_pipeline, "geocode_location", lambda location: (38.0, -120.0))
+    monkeypatch.setattr(search_pipeline, "month_cache_dir", lambda month: tmp_path / month)
+    monkeypatch.setattr(QueryCache, "shared", classmethod(lambda cls: QueryCache(tmp_path / "query_cache")))
+    monkeypatch.setattr(search_pipeline, "_fetch", lambda pending, cancel: pytest.fail(f"fetched {pending}"))
+    return tmp_path
+
+
+def test_batch_evaluates_overlapping_queries_once(region):
+    queries = [
+        {"location": "A", "distance": 80, "dates": ["2025-07-03", "July 4th, 2025"]},
+        {"location": "B", "distance": 30, "date": "2025-07-03"},
+        {"location": "C", "date": "not a date"},
+    ]
+    events = list(batch_search(queries))
+    final = events[-1]
+    assert final["type"] == "batch_results"
+    wide, narrow, bad = final["results"]
+
+    assert final["facility_months"] == 12          # the narrow query's facilities are a subset
+    assert final["facility_months_requested"] == 12 + 5
+    assert final["fetched"] == 0
+    assert bad["status"] == "error"
+    assert wide["dates"] == ["2025-07-03", "2025-07-04"]
+    assert {c["facility_id"] for c in narrow["campgrounds"]} <= {c["facility_id"] for c in wide["campgrounds"]}
+
+    # Same numbers as the single search, which now also answers from the batch's cache entry
+    single = list(search("B", "2025-07-03", 30))[-1]
+    assert single["type"] == "campground_results" and single["cached"]
+    assert single["total_found"] == narrow["total_found"]
+    assert [c["site_count"] for c in single["campgrounds"]] == [c["site_count"] for c in narrow["campgrounds"]]
+
+
+def test_shared_availability_skips_payloads_the_index_rules_out(region):
+    from datetime import date
+
+    from fetch import merge_availability_files
+    from search_pipeline import SharedAvailability, available_campgrounds
+
+    ws = workspace.Workspace.for_region(38.0, -120.0, 80)
+    merged = ws.merged_file("2025-07")
+    merged.parent.mkdir(parents=True, exist_ok=True)
+    merge_availability_files(region / "2025-07", "2025-07", ws.facility_ids, merged)
+    # A payload refreshed since the merge is not trusted to the index
+    stale = ws.facility_ids[0]
+    (region / "2025-07" / f"avail_{stale}.json").touch()
+
+    day = date(2025, 7, 5)
+    plain = available_campgrounds(ws.rows, [day], SharedAvailability({"2025-07": ws.facility_ids}))
+    data = SharedAvailability({"2025-07": ws.facility_ids}, [("2025-07", merged)])
+    assert available_campgrounds(ws.rows, [day], data) == plain
+
+    decoded = {fid for fid, c in data.campgrounds["2025-07"].items() if c.is_decoded}
+    assert decoded == {c["facility_id"] for c in plain} | {stale}
+    assert len(decoded) < len(ws.facility_ids)
+
+
+def test_geocoder_network_failure_fails_only_that_query(region, monkeypatch):
+    def geocode(location):
+        if location == "Offline":
+            raise ConnectionError("Network is unreachable")
+        return 38.0, -120.0
+
+    monkeypatch.setattr(search_pipeline, "geocode_location", geocode)
+    final = list(batch_search([{"location": "Offline", "date": "2025-07-03"},
+                               {"location": "A", "date": "2025-07-03"}]))[-1]
+
+    offline, ok = final["results"]
+    assert offline["status"] == "error" and "Network is unreachable" in offline["message"]
+    assert ok["status"] == "success"
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Tests for cache_backend.py using a local directory (and fakeredis when installed)."""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+import cache_backend
+from cache_backend import LocalBackend, RedisBackend, backend_from_url
+from query_cache import QueryCache, facility_versions
+
+
+def test_single_flight_produces_once_across_threads(tmp_path):
+    backend = LocalBackend(tmp_path)
+    calls = []
+
+    def produce():
+        calls.append(1)
+        time.sleep(0.3)
+        return b'{"campsites": {}}'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(backend.single_flight("2025-08/avail_1.json", produce)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert [data for data, _ in results] == [b'{"campsites": {}}'] * 4
+    assert sum(produced for _, produced in results) == 1
+    assert (tmp_path / "2025-08" / "avail_1.json").read_bytes() == b'{"campsites": {}}'
+    assert not (tmp_path / "2025-08" / "avail_1.json.lock").exists()
+
+
+def test_failed_produce_stores_nothing_and_releases_lock(tmp_path):
+    backend = LocalBackend(tmp_path)
+    assert backend.single_flight("k.json", lambda: None) == (None, False)
+    assert backend.get("k.json") is None
+    assert backend.try_lock("k.json") is not None
+
+
+def test_ttl_and_url_parsing(tmp_path):
+    backend = LocalBackend(tmp_path)
+    backend.put("a.json", b"1", ttl=-1)
+    assert backend.get("a.json") is None
+    assert isinstance(backend_from_url(f"file://{tmp_path}"), LocalBackend)
+    assert backend_from_url(None).root.name == "temp"
+
+
+def test_redis_url_without_the_package_fails_clearly(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)  # import redis → ImportError
+    with pytest.raises(RuntimeError, match="pip install"):
+        backend_from_url("redis://localhost:6379/0")
+
+
+def test_query_cache_through_backend(tmp_path):
+    cache = QueryCache(backend=LocalBackend(tmp_path))
+    key = cache.make_key(37.77, -122.42, 30, "2025-08-06")
+    cache.put(key, {"1": "v1"}, {"ok": True})
+    assert (tmp_path / "query_cache" / f"{key}.json").exists()
+    assert cache.get(key, {"1": "v1"}) == {"ok": True}
+    assert cache.get(key, {"1": "v2"}) is None
+
+
+def test_redis_backend_single_flight():
+    fakeredis = pytest.importorskip("fakeredis")
+    backend = RedisBackend(fakeredis.FakeRedis())
+    assert backend.single_flight("2025-08/avail_1.json", lambda: b"{}") == (b"{}", True)
+    assert backend.single_flight("2025-08/avail_1.json", lambda: b"other") == (b"{}", False)
+    token = backend.try_lock("k")
+    backend.unlock("k", "someone else's token")
+    assert backend.try_lock("k") is None
+    assert backend.extend("k", token) and not backend.extend("k", "someone else's token")
+
+
+def test_single_flight_refreshes_values_older_than_max_age(tmp_path):
+    backend = LocalBackend(tmp_path)
+    backend.put("k.json", b"old")
+    assert backend.single_flight("k.json", lambda: b"new", max_age=60) == (b"old", False)
+    time.sleep(0.05)
+    assert backend.single_flight("k.json", lambda: b"new", max_age=0.01) == (b"new", True)
+
+
+def test_query_cache_is_shared_by_instances_holding_the_same_data(tmp_path):
+    shared = LocalBackend(tmp_path / "shared")
+    a, b = tmp_path / "a", tmp_path / "b"
+    for root in (a, b):
+        root.mkdir()
+        (root / "avail_1.json").write_bytes(b'{"campsites": {}}')
+    os.utime(b / "avail_1.json", (1, 1))  # written at another time by the other instance
+
+    cache = QueryCache(backend=shared)
+    key = cache.make_key(37.77, -122.42, 30, "2025-08-06")
+    cache.put(key, facility_versions(["1"], a), {"ok": True})
+    assert cache.get(key, facility_versions(["1"], b)) == {"ok": True}
+
+    (b / "avail_1.json").write_bytes(b'{"campsites": {"2": {}}}')
+    assert cache.get(key, facility_versions(["1"], b)) is None
+    assert cache.get(key, facility_versions(["1"], a)) == {"ok": True}  # the mismatch did not delete it
+
+
+def test_only_one_waiter_takes_over_a_stale_lock(tmp_path):
+    backend = LocalBackend(tmp_path)
+    backend.try_lock("k.json")
+    os.utime(tmp_path / "k.json.lock", (1, 1))  # its producer died long ago
+    start = threading.Barrier(8)
+    tokens = []
+
+    def take():
+        start.wait()
+        tokens.append(backend.try_lock("k.json"))
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len([t for t in tokens if t is not None]) == 1
+
+
+def test_producer_renews_its_lock_and_only_releases_its_own(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_backend, "LOCK_RENEW_SECONDS", 0.05)
+    backend = LocalBackend(tmp_path)
+    lock = tmp_path / "k.json.lock"
+
+    def slow_produce():
+        os.utime(lock, (1, 1))  # would look stale without renewal
+        time.sleep(0.3)
+        assert backend.try_lock("k.json", ttl=60) is None
+        return b"{}"
+
+    assert backend.single_flight("k.json", slow_produce) == (b"{}", True)
+    assert not lock.exists()
+
+    token = backend.try_lock("k.json")
+    backend.unlock("k.json", "someone else's token")
+    assert not backend.extend("k.json", "someone else's token")
+    assert backend.try_lock("k.json") is None
+    backend.unlock("k.json", token)
+    assert backend.try_lock("k.json") is not None
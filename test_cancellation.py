@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Tests for cancellation.py: cancelled or timed-out children get SIGTERM and a grace period."""
+
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from cache_backend import LocalBackend
+from cancellation import CancelToken, Cancelled, cancel_scope, run_cancellable
+
+# Child that finishes its "in-flight write" when asked to stop, like fetch.py does
+CHILD = """
+import signal, sys, time
+from cache_backend import LocalBackend
+from cancellation import CancelToken, stop_on_signals
+stop = CancelToken()
+stop_on_signals(stop)
+print("started", flush=True)
+while not stop.wait(0.05):
+    pass
+open(sys.argv[1], "w").write("clean")
+"""
+
+# Child stuck in a producer (e.g. a slow upstream request) past the grace period
+STUCK_PRODUCER = """
+import sys, time
+from cache_backend import LocalBackend, release_held_locks
+from cache_backend import LocalBackend
+from cancellation import CancelToken, stop_on_signals
+stop_on_signals(CancelToken(), on_stop=release_held_locks)
+LocalBackend(sys.argv[1]).single_flight("2025-08/avail_1.json", lambda: print("producing", flush=True) or time.sleep(60))
+"""
+
+
+def test_cancel_terminates_child_gracefully(tmp_path):
+    marker = tmp_path / "marker"
+    token = CancelToken()
+    threading.Timer(0.5, token.cancel).start()
+    started = time.monotonic()
+    with cancel_scope(token), pytest.raises(Cancelled):
+        run_cancellable([sys.executable, "-c", CHILD, str(marker)], grace=5)
+    assert time.monotonic() - started < 3
+    assert marker.read_text() == "clean"
+
+
+def test_timeout_kills_child_that_ignores_sigterm():
+    ignore = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)"
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_cancellable([sys.executable, "-c", ignore], timeout=0.4, grace=0.3)
+    assert time.monotonic() - started < 5
+
+
+def test_completed_run_matches_subprocess_run():
+    result = run_cancellable([sys.executable, "-c", "print('hi')"], timeout=10)
+    assert (result.returncode, result.stdout) == (0, "hi\n")
+
+
+def test_killed_producer_leaves_no_cache_lock(tmp_path):
+    token = CancelToken()
+    threading.Timer(1.0, token.cancel).start()
+    with cancel_scope(token), pytest.raises(Cancelled):
+        run_cancellable([sys.executable, "-c", STUCK_PRODUCER, str(tmp_path)], grace=0.5)
+    assert not (tmp_path / "2025-08" / "avail_1.json.lock").exists()
+    assert LocalBackend(tmp_path).try_lock("2025-08/avail_1.json") is not None
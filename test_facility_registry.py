@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the shared facility registry and geocode cache under concurrent writers."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import facility_registry
+import jsonio
+from facility_registry import REGISTRY_MAX_AGE_SECONDS, FacilityRegistry, region_facilities, region_key
+from geo import load_geocode_cache, save_geocode_cache
+
+
+def test_concurrent_registrations_are_all_kept(tmp_path):
+    path = tmp_path / "facility_sets.json"
+    # Every writer starts from the same (empty) view, as separate search processes would
+    registries = [FacilityRegistry(path) for _ in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: registries[i].register(37.0 + i, -120.0, 30, [str(i)]), range(8)))
+
+    saved = FacilityRegistry(path)
+    assert len(saved.regions) == 8
+    assert saved.get(37.0 + 3, -120.0, 30) == ["3"]
+    assert region_key(37.0, -120.0, 30) in registries[7].regions  # refreshed by its own write
+
+
+def test_geocode_saves_merge(tmp_path):
+    path = str(tmp_path / "geocode_cache.json")
+    stale = load_geocode_cache(path)
+    save_geocode_cache({"yosemite": [37.86, -119.54]}, path)
+    save_geocode_cache(dict(stale, **{"tahoe": [38.94, -119.98]}), path)
+    assert set(load_geocode_cache(path)) == {"yosemite", "tahoe"}
+
+
+def test_registered_set_is_reused_until_the_table_is_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    table = [{"FacilityID": str(i), "FacilityName": f"Camp {i}", "AddressStateCode": "CA",
+              "FacilityLatitude": "38.0", "FacilityLongitude": str(-120.0 + 0.125 * i)} for i in range(4)]
+    assert [r["FacilityID"] for r in region_facilities(table, 38.0, -120.0, 15)] == ["0", "1", "2"]
+
+    # Registered set wins over the table: only its facilities are measured
+    moved = [dict(c, FacilityLongitude="-120.0") for c in table]
+    assert [r["FacilityID"] for r in region_facilities(moved, 38.0, -120.0, 15)] == ["0", "1", "2"]
+
+    # A campground table built after the registration invalidates it
+    (tmp_path / "temp" / "campgrounds.csv").write_text("FacilityID\n")
+    os.utime(tmp_path / "temp" / "campgrounds.csv", (time.time() + 5, time.time() + 5))
+    assert len(region_facilities(moved, 38.0, -120.0, 15)) == 4
+
+
+def test_old_and_excess_regions_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(facility_registry, "REGISTRY_MAX_REGIONS", 3)
+    path = tmp_path / "facility_sets.json"
+    jsonio.dump_atomic({"old": {"facility_ids": ["9"], "updated": time.time() - REGISTRY_MAX_AGE_SECONDS - 1}}, path)
+    registry = FacilityRegistry(path)
+    for i in range(5):
+        registry.register(37.0 + i, -120.0, 30, [str(i)])
+
+    assert set(FacilityRegistry(path).regions) == {region_key(37.0 + i, -120.0, 30) for i in (2, 3, 4)}
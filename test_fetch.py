@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Tests for fetch.py's download path, offline with a fake HTTP client."""
+
+import subprocess
+import sys
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+import cache_backend
+import fetch
+import rate_limiter
+from cache_backend import LocalBackend
+from fetch import fetch_availability
+
+
+# Imported inside the functions that need them, so `import fetch` stays fast (see benchmark.py)
+DEFERRED_MODULES = ["requests", "pandas", "jsonio", "availability_index", "availability_model", "cache_backend",
+                    "http_client", "merge_manifest", "metrics", "profiling", "rate_limiter", "subprocess"]
+
+
+class _Response:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class _Client:
+    errors = (OSError,)
+
+    def __init__(self, content):
+        self.content = content
+
+    def get(self, url, timeout=None):
+        return _Response(200, self.content)
+
+
+class _Limiter:
+    def acquire(self, timeout=None, cancel=None):
+        return True
+
+
+def test_non_json_200_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_backend, "_backend", LocalBackend(tmp_path))
+    monkeypatch.setattr(rate_limiter, "_limiter", _Limiter())
+    month_dir = tmp_path / "2025-08"
+    month_dir.mkdir()
+
+    page = b"<html><body>Down for maintenance</body></html>"
+    assert not fetch_availability("232450", "2025-08", month_dir, _Client(page))
+    assert cache_backend.get_backend().get("2025-08/avail_232450.json") is None
+    assert not (month_dir / "avail_232450.json").exists()
+
+    assert fetch_availability("232450", "2025-08", month_dir, _Client(b'{"campsites": {}}'))
+    assert (month_dir / "avail_232450.json").read_bytes() == b'{"campsites": {}}'
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_warm_cache_run_counts_every_facility_as_a_hit(tmp_path, monkeypatch, parallel):
+    from metrics import CACHE_LOOKUPS, FACILITY_FETCHES
+
+    ids = ["1", "2", "3"]
+    (tmp_path / "2025-08").mkdir()
+    for fid in ids:
+        (tmp_path / "2025-08" / f"avail_{fid}.json").write_bytes(b'{"campsites": {}}')
+    (tmp_path / "download.csv").write_text("FacilityID\n" + "\n".join(ids) + "\n")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fetch, "month_cache_dir", lambda month: tmp_path / month)
+    monkeypatch.setattr(fetch, "new_session", lambda **kwargs: pytest.fail("opened a session"))
+    monkeypatch.setattr(fetch, "merge_availability_files", lambda *args, **kwargs: None)
+    hits = CACHE_LOOKUPS.value(cache="availability", result="hit")
+    cached = FACILITY_FETCHES.value(outcome="cached")
+
+    args = Namespace(build_csv=False, month="2025-08", parallel=parallel, workspace=False, distance=150,
+                     location=None, http2=False, workers=1, full_merge=False)
+    fetch.run(args, parser=None)
+
+    assert CACHE_LOOKUPS.value(cache="availability", result="hit") == hits + 3
+    assert FACILITY_FETCHES.value(outcome="cached") == cached + 3
+
+
+def test_import_defers_heavy_modules():
+    code = f"import sys, fetch; print([m for m in {DEFERRED_MODULES!r} if m in sys.modules])"
+    out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests for http_client.py against a local keep-alive HTTP server."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import FetchClient
+
+pytest.importorskip("requests")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    user_agents = set()
+
+    def do_GET(self):
+        self.user_agents.add(self.headers.get("User-Agent"))
+        body = b'{"campsites": {}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_requests_reuse_pooled_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/month"
+    try:
+        with FetchClient(pool_size=4, headers={"User-Agent": "test-agent"}) as client:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                responses = list(pool.map(lambda _: client.get(url), range(40)))
+            stats = client.stats()
+    finally:
+        server.shutdown()
+
+    assert all(r.status_code == 200 for r in responses)
+    assert stats["requests"] == 40
+    assert 1 <= stats["connections"] <= 4
+    assert _Handler.user_agents == {"test-agent"}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental merges driven by the merge manifest
+"""
+
+import json
+import os
+
+import pytest
+
+import jsonio
+from availability_index import AvailabilityIndex, index_path_for
+from fetch import merge_availability_files
+import merge_manifest
+from merge_manifest import MergeManifest, manifest_path_for, write_merged
+from test_availability_model import make_payload
+from test_parallel_analysis import site_view
+
+A, R = "Available", "Reserved"
+
+
+def write(tmp_path, facility_id, pattern, mtime_ns=None):
+    path = tmp_path / f"avail_{facility_id}.json"
+    path.write_text(json.dumps(make_payload({f"{facility_id}0": pattern, f"{facility_id}1": pattern[::-1]})))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def merged_view(merged_file):
+    return jsonio.load(merged_file), site_view(AvailabilityIndex.load(index_path_for(merged_file)))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_incremental_merge_matches_full_merge(tmp_path, workers, capsys):
+    src = tmp_path / "2025-08"
+    src.mkdir()
+    for i in range(6):
+        write(src, str(i), [A, A, R, A, R, A] if i % 2 else [R, A, A, A, R, R])
+    merged = tmp_path / "all_avail_2025-08.json"
+    merge_availability_files(src, "2025-08", output_file=merged, workers=workers)
+    assert set(MergeManifest.load_for(merged).facilities) == {str(i) for i in range(6)}
+
+    # Nothing changed: nothing is rewritten
+    stamp = merged.stat().st_mtime_ns
+    merge_availability_files(src, "2025-08", output_file=merged, workers=workers)
+    assert "is up to date" in capsys.readouterr().out
+    assert merged.stat().st_mtime_ns == stamp
+
+    # One changed, one removed, one added, one invalid
+    write(src, "1", [R, R, R, A, A, A], mtime_ns=stamp + 10**9)
+    (src / "avail_2.json").unlink()
+    write(src, "7", [A, A, A, A, A, A])
+    (src / "avail_bad.json").write_text("{not json")
+    (src / "avail_list.json").write_text("[1, 2]")
+    merge_availability_files(src, "2025-08", output_file=merged, workers=workers)
+    assert "4 unchanged, 4 new or changed, 1 removed" in capsys.readouterr().out
+
+    full = tmp_path / "full.json"
+    merge_availability_files(src, "2025-08", output_file=full, workers=workers, full=True)
+    assert merged_view(merged) == merged_view(full)
+    assert "7" in jsonio.load(merged) and "2" not in jsonio.load(merged) and "list" not in jsonio.load(merged)
+
+    # The unchanged invalid file does not force another merge
+    merge_availability_files(src, "2025-08", output_file=merged, workers=workers)
+    assert "is up to date" in capsys.readouterr().out
+
+
+def test_manifest_ignored_when_merged_file_was_replaced(tmp_path):
+    src = tmp_path / "2025-08"
+    src.mkdir()
+    write(src, "1", [A, R, A])
+    merged = tmp_path / "all_avail_2025-08.json"
+    merge_availability_files(src, "2025-08", output_file=merged)
+
+    merged.write_text("{}")
+    assert MergeManifest.load_for(merged) is None
+    merge_availability_files(src, "2025-08", output_file=merged)
+    assert set(jsonio.load(merged)) == {"1"}
+    assert manifest_path_for(merged).name == "all_avail_2025-08.manifest.json"
+
+
+def test_merged_file_is_plain_json_when_payloads_are_compressed(tmp_path, monkeypatch):
+    monkeypatch.setattr(jsonio, "COMPRESSION", "gzip")
+    src = tmp_path / "2025-08"
+    src.mkdir()
+    raw = write(src, "1", [A, R, A]).read_bytes()
+    jsonio.write_compressed_atomic(src / "avail_1.json", raw)
+    merged = tmp_path / "all_avail_2025-08.json"
+    merge_availability_files(src, "2025-08", output_file=merged)
+    assert json.loads(merged.read_bytes()) == {"1": json.loads(raw)}  # what jq sees
+
+
+@pytest.mark.parametrize("kernel_copy", [True, False])
+def test_write_merged_copies_unchanged_ranges_from_the_previous_file(tmp_path, monkeypatch, kernel_copy):
+    if not kernel_copy:
+        monkeypatch.delattr(merge_manifest.os, "copy_file_range", raising=False)
+    old = {str(i): {"n": i, "pad": "x" * (3 * i)} for i in range(5)}
+    segments = [(fid, jsonio.dumps(fid) + b":" + jsonio.dumps(value)) for fid, value in old.items()]
+    path = tmp_path / "all_avail_2025-08.json"
+    layout = write_merged(path, segments)
+    assert jsonio.load(path) == old
+
+    # 1-2 adjacent, 3 changed, 0 and 4 from elsewhere in the file, plus a new facility
+    spans = [(fid, layout[fid]) for fid in ("1", "2", "0", "4")]
+    new = [("3", b'"3":{"n":33}'), ("5", b'"5":{"n":5}')]
+    layout = write_merged(path, spans + new, previous=path)
+
+    merged = path.read_bytes()
+    assert json.loads(merged) == dict(old, **{"3": {"n": 33}, "5": {"n": 5}})
+    assert list(json.loads(merged)) == ["1", "2", "0", "4", "3", "5"]
+    for fid, (offset, length) in layout.items():
+        assert json.loads(b"{" + merged[offset:offset + length] + b"}") == {fid: json.loads(merged)[fid]}
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_merged_reads_ranges_from_a_compressed_older_merge(tmp_path):
+    path = tmp_path / "all_avail_2025-08.json"
+    layout = write_merged(path, [("1", b'"1":{"n":1}'), ("2", b'"2":{"n":2}')])
+    path.write_bytes(jsonio.compress(path.read_bytes(), "gzip"))
+
+    write_merged(path, [("2", layout["2"]), ("3", b'"3":{"n":3}')], previous=path)
+
+    assert path.read_bytes() == b'{"2":{"n":2},"3":{"n":3}}'
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Tests for the in-process Prometheus metrics and the summaries children report to them."""
+
+import sys
+
+from cancellation import run_cancellable
+from metrics import (Counter, Histogram, TOOL_CALLS, TOOL_SECONDS, UPSTREAM_REQUESTS, UPSTREAM_SECONDS,
+                     instrument_tool, render, write_summary)
+
+# Child that records upstream metrics the way fetch.py does
+CHILD = """
+from metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS, write_summary
+UPSTREAM_REQUESTS.inc(status="429")
+UPSTREAM_SECONDS.observe(0.3)
+print("fetched", flush=True)
+write_summary()
+"""
+
+
+def test_counter_and_histogram_exposition():
+    requests = Counter("test_requests_total", "Test requests", ["status"])
+    latency = Histogram("test_seconds", "Test latency", buckets=(0.1, 1))
+    requests.inc(status="200")
+    requests.inc(2, status="429")
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = render()
+    assert 'recdotgov_test_requests_total{status="429"} 2' in text
+    assert 'recdotgov_test_seconds_bucket{le="0.1"} 1' in text
+    assert 'recdotgov_test_seconds_bucket{le="1"} 2' in text
+    assert 'recdotgov_test_seconds_bucket{le="+Inf"} 2' in text
+    assert "recdotgov_test_seconds_count 2" in text
+
+
+def test_instrument_tool_labels_command_and_status():
+    @instrument_tool
+    def fake_tool(command: str, location: str = None):
+        return {"status": "error" if location is None else "success"}
+
+    fake_tool("analyze_results", location="Yosemite")
+    fake_tool(command="analyze_results")
+    assert TOOL_CALLS.value(tool="fake_tool", command="analyze_results", status="success") == 1
+    assert TOOL_CALLS.value(tool="fake_tool", command="analyze_results", status="error") == 1
+    assert TOOL_SECONDS.count(tool="fake_tool", command="analyze_results") == 2
+
+
+def test_child_metrics_reach_the_parent(capsys):
+    before = UPSTREAM_REQUESTS.value(status="429"), UPSTREAM_SECONDS.count()
+    result = run_cancellable([sys.executable, "-c", CHILD], timeout=10)
+    assert result.stdout == "fetched\n"
+    assert (UPSTREAM_REQUESTS.value(status="429"), UPSTREAM_SECONDS.count()) == (before[0] + 1, before[1] + 1)
+
+    write_summary()  # not a child of run_cancellable(): nothing is printed
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for process-pool sharding of availability parsing and queries
+"""
+
+import json
+
+from availability_index import AvailabilityIndex
+from availability_model import load_directory
+from parallel_analysis import MIN_FILES_PER_WORKER, compact_and_index, parallel_stay_search, shard_paths
+from stay_search import StaySearch
+from test_availability_model import make_payload
+
+A, R = "Available", "Reserved"
+
+
+def write_facilities(tmp_path, count):
+    for i in range(count):
+        pattern = [A, A, R, A, A, A] if i % 2 else [R, A, A, A, R, A]
+        payload = make_payload({f"{i}0": pattern, f"{i}1": pattern[::-1]})
+        (tmp_path / f"avail_{i}.json").write_text(json.dumps(payload))
+    (tmp_path / "avail_bad.json").write_text("{not json")
+    return sorted(tmp_path.glob("avail_*.json"))
+
+
+def site_view(index):
+    """Index contents independent of site numbering."""
+    return (
+        index.counts,
+        sorted((index.sites[n], start, nights) for n, start, nights in index.runs),
+    )
+
+
+def test_sharded_index_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)  # shard even on single-core machines
+    paths = write_facilities(tmp_path, MIN_FILES_PER_WORKER * 3)
+    valid, invalid, index = compact_and_index(paths, workers=3)
+
+    serial = AvailabilityIndex.build(load_directory(tmp_path, sorted(valid)))
+    assert invalid == ["avail_bad.json"]
+    assert valid["0"] == (tmp_path / "avail_0.json").read_bytes().strip()
+    assert site_view(index) == site_view(serial)
+    assert [n for _, _, n in index.runs] == sorted((n for _, _, n in index.runs), reverse=True)
+
+
+def test_parallel_stay_search_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    paths = write_facilities(tmp_path, MIN_FILES_PER_WORKER * 2)
+    matches, num_sites = parallel_stay_search(paths, nights=2, workers=2)
+
+    search = StaySearch(load_directory(tmp_path, [str(i) for i in range(MIN_FILES_PER_WORKER * 2)]))
+    assert num_sites == len(search.sites)
+    assert sorted(matches) == sorted(search.find(2))
+
+
+def test_shards_are_balanced_by_size(tmp_path):
+    paths = []
+    for i, size in enumerate([90, 50, 40, 10, 10]):
+        path = tmp_path / f"avail_{i}.json"
+        path.write_bytes(b" " * size)
+        paths.append(path)
+    sizes = sorted(sum(p.stat().st_size for p in shard) for shard in shard_paths(paths, 2))
+    assert sizes == [100, 100]
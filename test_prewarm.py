@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Tests for the pre-warm scheduler, run offline against the July 2025 fixture payloads."""
+
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+import cache_backend
+import fetch
+import prewarm
+import workspace
+from cache_backend import LocalBackend, availability_key
+from cancellation import CancelToken
+from prewarm import is_off_peak, plan, run_pass, upcoming_months
+
+FIXTURES = sorted(Path(__file__).parent.glob("temp/avail_*.json"))[:4]
+MONTHS = ["2025-07", "2025-08"]
+# Camps 0-3 one every ~6.8 miles east of (38.0, -120.0); West holds 0-2 and East 1-3
+REGIONS = {"West": (38.0, -120.0), "East": (38.0, -119.75)}
+
+
+class _Limiter:
+    rate = 1e6
+
+
+class _Client:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    table = [{"FacilityID": path.stem[6:], "FacilityName": f"Camp {i}", "AddressStateCode": "CA",
+              "FacilityLatitude": "38.0", "FacilityLongitude": str(-120.0 + 0.125 * i)}
+             for i, path in enumerate(FIXTURES)]
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(workspace, "load_campgrounds", lambda: table)
+    monkeypatch.setattr(workspace, "geocode_location", REGIONS.__getitem__)
+    monkeypatch.setattr(prewarm, "upcoming_months", lambda count: MONTHS[:count])
+    monkeypatch.setattr(prewarm, "month_cache_dir", lambda month: tmp_path / month)
+    monkeypatch.setattr(prewarm, "ensure_campground_table", lambda: None)
+    monkeypatch.setattr(prewarm, "get_rate_limiter", _Limiter)
+    monkeypatch.setattr(cache_backend, "_backend", LocalBackend(tmp_path / "shared"))
+    return dict(prewarm.DEFAULT_CONFIG, regions=[{"location": "West", "distance": 15},
+                                                 {"location": "East", "distance": 10}])
+
+
+def _cache(tmp_path, month, fid, age=0.0):
+    path = tmp_path / month / f"avail_{fid}.json"
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(FIXTURES[0].read_bytes())
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+
+
+def test_upcoming_months_wrap_the_year():
+    assert upcoming_months(3, date(2025, 11, 20)) == ["2025-11", "2025-12", "2026-01"]
+
+
+def test_off_peak_hours():
+    assert is_off_peak([0, 23], datetime(2025, 8, 1, 23, 30))
+    assert not is_off_peak([0, 23], datetime(2025, 8, 1, 12, 0))
+
+
+def test_plan_lists_each_stale_facility_once_nearest_month_first(config, tmp_path):
+    ids = [path.stem[6:] for path in FIXTURES]
+    _cache(tmp_path, "2025-07", ids[0])  # fresh
+    _cache(tmp_path, "2025-07", ids[1], age=config["ttl_minutes"] * 60 + 60)  # expired
+
+    stale, outputs = plan(config)
+
+    assert len(stale) == len(set(stale)) == 7
+    assert set(stale[:3]) == {("2025-07", fid) for fid in ids[1:]}
+    assert set(stale[3:]) == {("2025-08", fid) for fid in ids}
+    assert [(set(ws.facility_ids), month) for ws, month in outputs] == [
+        (set(ids[:3]), "2025-07"), (set(ids[:3]), "2025-08"), (set(ids[1:]), "2025-07"), (set(ids[1:]), "2025-08")]
+
+
+def test_run_pass_refreshes_through_the_shared_backend_and_remerges(config, tmp_path, monkeypatch):
+    ids = [path.stem[6:] for path in FIXTURES]
+    payloads = {fid: path.read_bytes() for fid, path in zip(ids, FIXTURES)}
+    config["months_ahead"] = 1
+    _cache(tmp_path, "2025-07", ids[0])
+    # Another instance already fetched this one
+    cache_backend.get_backend().put(availability_key("2025-07", ids[1]), payloads[ids[1]])
+    downloads = []
+
+    def download(fid, month, session, cancel):
+        downloads.append(fid)
+        return None if fid == ids[3] else payloads[fid]
+
+    client = _Client()
+    monkeypatch.setattr(prewarm, "new_session", lambda: client)
+    monkeypatch.setattr(fetch, "_download_availability", download)
+
+    assert run_pass(config, any_time=True) == {"stale": 3, "refreshed": 2, "failed": 1}
+    assert downloads == ids[2:]
+    assert client.closed
+    assert (tmp_path / "2025-07" / f"avail_{ids[1]}.json").read_bytes() == payloads[ids[1]]
+    for ws, month in plan(config)[1]:
+        assert ws.download_csv.exists()
+        assert ws.merged_file(month).exists()
+
+
+def test_run_pass_stops_outside_off_peak_hours(config, monkeypatch):
+    config["off_peak_hours"] = []
+    monkeypatch.setattr(prewarm, "new_session", lambda: pytest.fail("opened a session"))
+    monkeypatch.setattr(prewarm, "merge_availability_files", lambda *args: pytest.fail("merged"))
+
+    assert run_pass(config) == {"stale": 8, "refreshed": 0, "failed": 0}
+
+
+class _Stop(CancelToken):
+    """STOP stand-in that records pacing waits and cancels after `after` of them."""
+
+    def __init__(self, after=None):
+        super().__init__()
+        self.waits, self.after = [], after
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        if self.after is not None and len(self.waits) >= self.after:
+            self.cancel()
+        return self.cancelled
+
+
+def test_run_pass_paces_only_real_requests_and_stops_on_signal(config, tmp_path, monkeypatch):
+    ids = [path.stem[6:] for path in FIXTURES]
+    payloads = {fid: path.read_bytes() for fid, path in zip(ids, FIXTURES)}
+    config["months_ahead"] = 1
+    for fid in ids[:2]:  # refreshed by another instance since the pass was planned
+        cache_backend.get_backend().put(availability_key("2025-07", fid), payloads[fid])
+    monkeypatch.setattr(_Limiter, "rate", 1.0)
+    monkeypatch.setattr(prewarm, "new_session", _Client)
+    monkeypatch.setattr(fetch, "_download_availability", lambda fid, month, session, cancel: payloads[fid])
+    monkeypatch.setattr(prewarm, "merge_availability_files", lambda *args: pytest.fail("merged after a stop"))
+    stop = _Stop(after=1)
+    monkeypatch.setattr(prewarm, "STOP", stop)
+
+    assert run_pass(config, any_time=True) == {"stale": 4, "refreshed": 3, "failed": 0}
+    assert len(stop.waits) == 1 and stop.waits[0] > 1.0  # once, after the one real request
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Tests for stage tracing and the profile report."""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import TRACER, profile_session, trace_stage
+
+
+def test_trace_stage_is_a_no_op_when_disabled():
+    with trace_stage("merge") as info:
+        info["files"] = 3
+    assert not TRACER.enabled
+
+
+def test_profile_session_reports_nested_stages(tmp_path, capsys):
+    report = tmp_path / "report.json"
+    with profile_session(report, cpu=True, memory=True):
+        with trace_stage("merge", month="2025-07"):
+            with trace_stage("merge_write") as info:
+                data = bytearray(2_000_000)
+                info["bytes"] = len(data)
+                del data
+        for fid in ("1", "2"):
+            with trace_stage("http_fetch", facility_id=fid):
+                pass
+
+    result = json.loads(report.read_text())
+    stages = {s["stage"]: s for s in result["stages"]}
+    assert list(stages) == ["merge", "merge/merge_write", "http_fetch"]
+    assert stages["http_fetch"]["count"] == 2
+    assert stages["merge/merge_write"]["mem_peak_bytes"] >= 2_000_000
+    assert stages["merge"]["mem_peak_bytes"] >= stages["merge/merge_write"]["mem_peak_bytes"]
+    assert {r.get("facility_id") for r in result["records"]} >= {"1", "2"}
+    assert (tmp_path / "report.prof").exists() and result["cprofile"]["top"]
+    assert not TRACER.enabled
+
+
+def _busy_worker(n):
+    return sum(i * i for i in range(n))
+
+
+def test_cpu_profile_includes_worker_threads(tmp_path, capsys):
+    report = tmp_path / "report.json"
+    with profile_session(report, cpu=True):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(_busy_worker, [10_000, 10_000]))
+
+    result = json.loads(report.read_text())
+    assert result["cprofile"]["threads"] >= 2  # the caller plus at least one pool thread
+    assert any("_busy_worker" in row["function"] for row in result["cprofile"]["top"])
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""Tests for rate_limiter.py's file-backed token bucket."""
+
+import subprocess
+import sys
+import time
+
+from rate_limiter import FileTokenBucket
+
+
+def test_burst_then_refill(tmp_path):
+    bucket = FileTokenBucket(tmp_path / "bucket.json", rate=20, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    time.sleep(0.06)
+    assert bucket.try_acquire()
+
+
+def test_backoff_blocks_every_holder(tmp_path):
+    path = tmp_path / "bucket.json"
+    FileTokenBucket(path, rate=100, burst=5).backoff(0.2)
+    other = FileTokenBucket(path, rate=100, burst=5)
+    assert not other.try_acquire()
+    assert other.acquire(timeout=1.0)
+
+
+def test_budget_is_shared_across_processes(tmp_path):
+    path = tmp_path / "bucket.json"
+    code = (
+        "import sys; from rate_limiter import FileTokenBucket; "
+        f"b = FileTokenBucket({str(path)!r}, rate=0.01, burst=4); "
+        "print(sum(b.try_acquire() for _ in range(4)))"
+    )
+    procs = [subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True) for _ in range(3)]
+    taken = sum(int(p.communicate()[0]) for p in procs)
+    assert taken == 4
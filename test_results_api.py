@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Tests for paginated views of stored results."""
+
+import time
+
+import pytest
+
+import results_api
+import tool_responses
+from cache_backend import LocalBackend
+from results_api import query_results
+from tool_responses import store_results
+
+
+@pytest.fixture
+def handle(tmp_path, monkeypatch):
+    monkeypatch.setattr(tool_responses, "get_backend", lambda: LocalBackend(tmp_path))
+    results_api._loaded.clear()
+    campgrounds = [
+        {"facility_id": str(i), "name": f"Camp {i:02d}", "distance": float(i), "site_count": 2,
+         "sites": [{"site": "A1", "loop": "A", "campsite_type": "STANDARD NONELECTRIC"},
+                   {"site": "T1", "loop": "T", "campsite_type": "TENT ONLY NONELECTRIC" if i % 2 else "RV ELECTRIC"}]}
+        for i in range(1, 61)
+    ]
+    return store_results({"date": "2025-08-06", "total_found": 60, "campgrounds": campgrounds})
+
+
+def test_cursor_pages_cover_every_campground_once(handle):
+    seen, cursor = [], None
+    while True:
+        page = query_results(handle, cursor=cursor, limit=25)
+        seen += [item["facility_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [str(i) for i in range(1, 61)]
+    assert page["total"] == 60
+
+
+def test_filters_and_sort(handle):
+    page = query_results(handle, sort="name", max_distance=10, site_type="tent", limit=100)
+    assert [item["name"] for item in page["items"]] == ["Camp 01", "Camp 03", "Camp 05", "Camp 07", "Camp 09"]
+    assert page["items"][0]["site_count"] == 1
+    assert page["items"][0]["sites"] == [{"site": "T1", "loop": "T", "campsite_type": "TENT ONLY NONELECTRIC"}]
+    assert query_results(handle, date="2025-08-07")["total"] == 0
+    assert page["facets"]["site_types"]["STANDARD NONELECTRIC"] == 60
+
+
+def test_bad_requests(handle):
+    with pytest.raises(ValueError):
+        query_results(handle, sort="price")
+    with pytest.raises(ValueError):
+        query_results(handle, cursor="not a cursor!")
+    assert query_results("0" * 16) is None
+
+
+def test_memory_copy_follows_the_stored_handle(handle, tmp_path, monkeypatch):
+    stored = store_results({"date": "2025-08-06", "campgrounds": []})
+    LocalBackend(tmp_path).delete(f"results/{stored}.json")
+    assert query_results(stored) is None
+    assert store_results({"date": "2025-08-06", "campgrounds": []}) == stored
+    assert query_results(stored)["total"] == 0  # the miss was not remembered
+
+    assert query_results(handle)["total"] == 60
+    later = time.time() + tool_responses.RESULT_TTL_SECONDS + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert query_results(handle) is None
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Tests for the structured-query pipeline, run offline against the July 2025 fixture payloads."""
+
+import asyncio
+import shutil
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import search_pipeline
+import workspace
+from query_cache import QueryCache
+from search_pipeline import parse_date, search, stream_events
+
+FIXTURES = sorted(Path(__file__).parent.glob("temp/avail_*.json"))[:8]
+UNCACHED = [path.stem[6:] for path in FIXTURES[5:]]
+
+
+class _Client:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def region(tmp_path, monkeypatch):
+    """8 campgrounds east of (38.0, -120.0), the last 3 not fetched yet."""
+    month_dir = tmp_path / "2025-07"
+    month_dir.mkdir()
+    table = []
+    for i, path in enumerate(FIXTURES):
+        if path.stem[6:] not in UNCACHED:
+            shutil.copy(path, month_dir / path.name)
+        table.append({"FacilityID": path.stem[6:], "FacilityName": f"Camp {i}", "AddressStateCode": "CA",
+                      "FacilityLatitude": "38.0", "FacilityLongitude": str(-120.0 + 0.125 * i)})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search_pipeline, "ensure_campground_table", lambda: None)
+    monkeypatch.setattr(workspace, "load_campgrounds", lambda: table)
+    monkeypatch.setattr(search_pipeline, "geocode_location", lambda location: (38.0, -120.0))
+    monkeypatch.setattr(search_pipeline, "month_cache_dir", lambda month: tmp_path / month)
+    monkeypatch.setattr(workspace, "month_cache_dir", lambda month: tmp_path / month)
+    monkeypatch.setattr(QueryCache, "shared", classmethod(lambda cls: QueryCache(tmp_path / "query_cache")))
+    monkeypatch.setattr(search_pipeline, "new_session", lambda pool_size: _Client())
+    return tmp_path
+
+
+def _stub_fetch(monkeypatch, fetched, on_fetch=lambda fid, cancel: None):
+    """fetch_availability that copies the fixture payload into the month's cache directory."""
+    def fetch(fid, month, temp_dir, client, cancel):
+        fetched.append(fid)
+        on_fetch(fid, cancel)
+        shutil.copy(Path(__file__).parent / "temp" / f"avail_{fid}.json", temp_dir)
+        return True
+    monkeypatch.setattr(search_pipeline, "fetch_availability", fetch)
+
+
+def test_parse_date_formats():
+    for text in ("2025-07-03", "July 3rd, 2025", "Jul 3 2025", "7/3/2025"):
+        assert parse_date(text) == date(2025, 7, 3)
+
+
+def test_parse_date_without_year_is_next_occurrence():
+    assert parse_date("Aug 6", today=date(2025, 7, 1)) == date(2025, 8, 6)
+    assert parse_date("Jan 2nd", today=date(2025, 7, 1)) == date(2026, 1, 2)
+
+
+def test_parse_date_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_date("next weekend")
+
+
+def test_search_fetches_missing_facilities_and_caches_the_result(region, monkeypatch):
+    fetched = []
+
+    def upstream_error(fid, cancel):
+        if fid == UNCACHED[0]:
+            raise ConnectionError("connection reset")
+
+    _stub_fetch(monkeypatch, fetched, upstream_error)
+    events = list(search("Camps", "2025-07-05", 80))
+
+    assert [e["type"] for e in events] == ["parameters", "status", "status", "status", "warning", "campground_results"]
+    assert sorted(fetched) == sorted(UNCACHED)
+    assert "1 campgrounds could not be fetched" in events[-2]["message"]
+    results = events[-1]
+    assert not results.get("cached")
+    assert UNCACHED[0] not in {c["facility_id"] for c in results["campgrounds"]}
+
+    # Nothing changed since: the stored result is served without fetching
+    fetched.clear()
+    assert list(search("Camps", "2025-07-05", 80))[-1] == dict(results, cached=True)
+    assert fetched == []
+
+def test_search_reports_cancellation_during_fetch(region, monkeypatch):
+    _stub_fetch(monkeypatch, [], lambda fid, cancel: cancel.cancel())
+    events = list(search("Camps", "2025-07-05", 80))
+    assert events[-1]["type"] == "cancelled"
+    assert "campground_results" not in [e["type"] for e in events]
+    assert not list(region.glob("query_cache/*"))
+
+
+def test_closing_the_stream_cancels_the_producer():
+    seen = []
+
+    def events(cancel):
+        yield {"type": "status", "message": "first"}
+        seen.append(cancel.wait(5))
+        yield {"type": "status", "message": "second"}
+
+    async def first_event():
+        stream = stream_events(events)
+        event = await stream.__anext__()
+        await stream.aclose()
+        return event
+
+    assert asyncio.run(first_event())["message"] == "first"
+    assert seen == [True]
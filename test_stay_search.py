@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the consecutive-night stay search
+"""
+
+from datetime import date
+
+from availability_index import AvailabilityIndex
+from availability_model import Campground
+from stay_search import StaySearch, stay_limits, with_runs_of
+from test_availability_model import make_payload
+
+A, R = "Available", "Reserved"
+
+
+def brute_force(campgrounds, nights):
+    """Reference implementation: scan every site and day."""
+    found = set()
+    for fid, campground in campgrounds.items():
+        for site in campground.campsites.values():
+            for offset in range(len(site.statuses) - nights + 1):
+                if all(site.status_at(offset + k) == 1 for k in range(nights)):
+                    found.add((fid, site.campsite_id, campground.date_at(offset)))
+    return found
+
+
+def test_matches_brute_force():
+    campgrounds = {
+        "1": Campground("1", make_payload({"10": [A, A, A, R, A, A], "11": [A, R, A, A, A, A]})),
+        "2": Campground("2", make_payload({"20": [A, A, R, A, A, A]})),
+    }
+    search = StaySearch(campgrounds)
+    for nights in range(1, 7):
+        got = {(m.facility_id, m.campsite_id, m.check_in) for m in search.find(nights)}
+        assert got == brute_force(campgrounds, nights)
+
+
+def test_runs_do_not_cross_sites():
+    # Site 10 ends Available and site 11 starts Available - no 2-night stay spans them
+    search = StaySearch({"1": Campground("1", make_payload({"10": [R, A], "11": [A, R]}))})
+    assert search.find(2) == []
+
+
+def test_weekday_and_range_filters():
+    # 2025-08-01 is a Friday
+    search = StaySearch({"1": Campground("1", make_payload({"10": [A] * 10}))})
+
+    fridays = search.find(2, check_in_weekdays={4})
+    assert [m.check_in for m in fridays] == [date(2025, 8, 1), date(2025, 8, 8)]
+
+    ranged = search.find(3, first=date(2025, 8, 6), last=date(2025, 8, 20))
+    assert [m.check_in for m in ranged] == [date(2025, 8, 6), date(2025, 8, 7), date(2025, 8, 8)]
+
+
+def test_stay_limits_from_campsite_rules():
+    payload = make_payload({"10": [A] * 5})
+    payload["campsites"]["10"]["campsite_rules"] = {
+        "minConsecutiveStay": {"value": 2},
+        "maxConsecutiveStay": 3,
+    }
+    search = StaySearch({"1": Campground("1", payload)})
+
+    assert stay_limits(payload["campsites"]["10"]["campsite_rules"]) == (2, 3)
+    assert search.find(1) == []
+    assert len(search.find(2)) == 4
+    assert search.find(4) == []
+
+
+def test_stay_limits_apply_only_inside_their_window():
+    payload = make_payload({"10": [A] * 6})
+    payload["campsites"]["10"]["campsite_rules"] = {
+        # Only 1-night stays may check in on Aug 1-3; an expired rule never applies
+        "maxConsecutiveStay": {"value": 1, "units": "consecutive nights",
+                               "start_date": "2025-08-01T00:00:00Z", "end_date": "2025-08-03T00:00:00Z"},
+        "minConsecutiveStay": {"value": 5, "start_date": "2021-01-01T00:00:00Z", "end_date": "2021-12-31T00:00:00Z"},
+        "overrideFacilityStayRules": {"value": 1, "start_date": "0001-01-01T00:00:00Z", "end_date": "0001-01-01T00:00:00Z"},
+    }
+    rules = payload["campsites"]["10"]["campsite_rules"]
+    search = StaySearch({"1": Campground("1", payload)})
+
+    assert stay_limits(rules, date(2025, 8, 2)) == (1, 1)
+    assert stay_limits(rules, date(2025, 8, 4)) == (1, None)
+    assert len(search.find(1)) == 6
+    assert [m.check_in for m in search.find(2)] == [date(2025, 8, 4), date(2025, 8, 5)]
+
+
+def test_per_period_max_stay_does_not_limit_one_stay():
+    payload = make_payload({"10": [A] * 5})
+    payload["campsites"]["10"]["campsite_rules"] = {
+        "maxStay": {"value": 1, "units": "nights", "secondary_value": "Each Year",
+                    "start_date": "0001-01-01T00:00:00Z", "end_date": "0001-01-01T00:00:00Z"},
+        "minConsecutiveStay": {"value": 2, "units": "consecutive nights", "secondary_value": "strict"},
+    }
+    search = StaySearch({"1": Campground("1", payload)})
+
+    assert stay_limits(payload["campsites"]["10"]["campsite_rules"], date(2025, 8, 1)) == (2, None)
+    assert len(search.find(3)) == 3
+
+
+def test_index_narrows_the_search_to_campgrounds_with_long_enough_runs():
+    campgrounds = {
+        "1": Campground("1", make_payload({"10": [A, A, A, R, A, A], "11": [A, R, A, R, A, A]})),
+        "2": Campground("2", make_payload({"20": [A, A, R, A, R, A]})),
+        "3": Campground("3", make_payload({"30": [R, R, R, R, A, A, A]})),
+    }
+    index = AvailabilityIndex.build(campgrounds)
+
+    assert set(with_runs_of(campgrounds, index, 3)) == {"1", "3"}
+    assert set(with_runs_of(campgrounds, index, 2, first=date(2025, 8, 4))) == {"1", "3"}
+    assert set(with_runs_of(campgrounds, index, 3, last=date(2025, 8, 4))) == {"1"}
+    for nights in (1, 2, 3):
+        narrowed = with_runs_of(campgrounds, index, nights, first=date(2025, 8, 2))
+        assert StaySearch(narrowed).find(nights, first=date(2025, 8, 2)) == \
+            StaySearch(campgrounds).find(nights, first=date(2025, 8, 2))
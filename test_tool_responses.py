@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Tests for compact agent tool responses."""
+
+import tool_responses
+from cache_backend import LocalBackend
+from tool_responses import compact_output, compact_results, load_results
+
+
+def test_compact_output_counts_progress_lines():
+    stdout = "\n".join([
+        "Found 3 Facility IDs",
+        "[   1/   3] ID 1 ... done",
+        "[   2/   3] ID 2 ... skipped (already exists)",
+        "[   3/   3] ID 3 ... failed (HTTP 500)",
+        "Merged availability written to all_avail_2025-08.json",
+    ])
+    response = compact_output(stdout, "")
+    assert response["facilities"] == {"fetched": 1, "cached": 1, "failed": 1}
+    assert "ID 1" not in response["output"]
+    assert "Merged availability" in response["output"]
+    assert "error" not in response
+
+
+def test_compact_results_top_k_and_handle(tmp_path, monkeypatch):
+    monkeypatch.setattr(tool_responses, "get_backend", lambda: LocalBackend(tmp_path))
+    results = {
+        "total_found": 4,
+        "date": "2025-08-06",
+        "campgrounds": [
+            {"name": "Far", "distance": 40.0, "site_count": 9, "facility_id": "4"},
+            {"name": "Near", "distance": 2.5, "available_sites": ["A1", "A2"], "facility_id": "1"},
+            {"name": "Mid", "distance": 10.0, "site_count": 1, "facility_id": "2"},
+            {"name": "Mid bigger", "distance": 10.0, "site_count": 5, "facility_id": "3"},
+        ],
+    }
+    compact = compact_results(results, top_k=2)
+    assert [c["name"] for c in compact["campgrounds"]] == ["Near", "Mid bigger"]
+    assert compact["campgrounds"][0] == {"facility_id": "1", "name": "Near", "distance": 2.5, "site_count": 2}
+    assert (compact["total_found"], compact["total_sites"], compact["shown"]) == (4, 17, 2)
+    assert load_results(compact["result_handle"]) == results
+    assert load_results("../../etc/passwd") is None
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Per-search workspaces over the shared payload cache, run offline against the July 2025 fixtures."""
+
+import csv
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import avail_cache
+import jsonio
+import workspace
+from avail_cache import FLAT_CACHE_MARKER, migrate_flat_cache
+from fetch import merge_availability_files
+from workspace import Workspace
+
+FIXTURES = sorted(Path(__file__).parent.glob("temp/avail_*.json"))[:4]
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    """Camps 0-3 one every ~6.8 miles east of (38.0, -120.0), all cached for 2025-07."""
+    (tmp_path / "temp" / "2025-07").mkdir(parents=True)
+    rows = []
+    for i, path in enumerate(FIXTURES):
+        shutil.copy(path, tmp_path / "temp" / "2025-07" / path.name)
+        rows.append({"FacilityID": path.stem[6:], "FacilityName": f"Camp {i}", "AddressStateCode": "CA",
+                     "FacilityLatitude": "38.0", "FacilityLongitude": str(-120.0 + 0.125 * i)})
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(workspace, "load_campgrounds", lambda: rows)
+    return rows
+
+
+def test_overlapping_workspaces_run_concurrently_without_sharing_outputs(table, tmp_path):
+    ids = [row["FacilityID"] for row in table]
+    cache_dir = tmp_path / "temp" / "2025-07"
+    before = {path.name: path.read_bytes() for path in cache_dir.iterdir()}
+    # West holds camps 0-2 and East 1-3: both read the two shared payloads at the same time
+    west = Workspace.for_region(38.0, -120.0, 15)
+    east = Workspace.for_region(38.0, -119.75, 10)
+    assert west.root != east.root
+
+    def run(ws):
+        for _ in range(5):
+            ws.write_download_csv()
+            merge_availability_files(cache_dir, "2025-07", ws.facility_ids, ws.merged_file("2025-07"), full=True)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        list(pool.map(run, [west, east]))
+
+    for ws, expected in ((west, ids[:3]), (east, ids[1:])):
+        with open(ws.download_csv, encoding="utf-8", newline="") as f:
+            assert sorted(row["FacilityID"] for row in csv.DictReader(f)) == sorted(expected)
+        assert sorted(jsonio.load(ws.merged_file("2025-07"))) == sorted(expected)
+        assert ws.pending("2025-07") == []
+    assert {path.name: path.read_bytes() for path in cache_dir.iterdir()} == before
+
+
+def test_flat_cache_files_are_linked_into_their_month_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(avail_cache, "_migrated", set())
+    (tmp_path / "2025-07").mkdir()
+    for path in FIXTURES[:3]:
+        shutil.copy(path, tmp_path / path.name)
+    (tmp_path / "avail_1.json").write_bytes(b"{}")  # failed fetch: no dates, left alone
+    # This month already has a newer payload for one facility
+    newer = tmp_path / "2025-07" / FIXTURES[0].name
+    newer.write_bytes(FIXTURES[3].read_bytes())
+
+    assert migrate_flat_cache(tmp_path) == 2
+    assert newer.read_bytes() == FIXTURES[3].read_bytes()
+    for path in FIXTURES[1:3]:
+        assert (tmp_path / "2025-07" / path.name).read_bytes() == path.read_bytes()
+        assert (tmp_path / path.name).exists()  # originals stay for older scripts
+    assert sorted(os.listdir(tmp_path / "2025-07")) == sorted(p.name for p in FIXTURES[:3])
+
+    # The marker makes it one-time, even for a new process
+    monkeypatch.setattr(avail_cache, "_migrated", set())
+    (tmp_path / "2025-07" / FIXTURES[1].name).unlink()
+    assert (tmp_path / FLAT_CACHE_MARKER).exists()
+    assert migrate_flat_cache(tmp_path) == 0
+    assert not (tmp_path / "2025-07" / FIXTURES[1].name).exists()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+tool_responses.py - Compact, size-bounded agent tool responses
+
+Everything a tool returns is fed back into the model context on every later step, so tools
+return only what the agent needs to decide:
+
+    compact_output()    fetch.py stdout → outcome counts plus the last few summary lines
+                        (instead of one progress line per facility)
+    compact_results()   analysis results → the top-K campgrounds (nearest first, then most sites),
+                        aggregate counts and a result handle
+
+The full results are stored in the shared cache backend under the handle; the frontend loads
+them from /results/<handle> when the user wants more than the top K.
+
+Configuration (environment):
+    TOOL_RESPONSES=full   return the raw tool output as before (debugging)
+    TOOL_TOP_K            campgrounds included in a compact response (default 10)
+
+Usage:
+    response = compact_results(full_results)       # {"total_found": 23, "campgrounds": [...10], "result_handle": "..."}
+    full = load_results(response["result_handle"])
+"""
+
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import jsonio
+from cache_backend import get_backend
+
+COMPACT = os.environ.get("TOOL_RESPONSES", "compact").lower() != "full"
+TOP_K = int(os.environ.get("TOOL_TOP_K", "10"))
+TAIL_LINES = 5              # non-progress stdout lines kept (the [✓] summary lines come last)
+ERROR_CHARS = 500           # stderr is usually a traceback; its end says what went wrong
+RESULT_TTL_SECONDS = 3600
+CAMPGROUND_FIELDS = ("facility_id", "name", "distance", "site_count")
+
+_PROGRESS_LINE = re.compile(r"^\[\s*\d+/\s*\d+\] (?:\S+ )?ID \S+ \.\.\. (.*)$")
+_HANDLE = re.compile(r"^[0-9a-f]{16}$")
+
+
+def _outcome(result: str) -> str:
+    if result.startswith("done"):
+        return "fetched"
+    if result.startswith("skipped"):
+        return "cached"
+    if result.startswith("cancelled"):
+        return "cancelled"
+    if result.startswith("rate limited"):
+        return "rate_limited"
+    return "failed"
+
+
+def compact_output(stdout: Optional[str], stderr: Optional[str] = None) -> Dict[str, Any]:
+    """Per-facility progress lines collapsed into counts, plus the tail of everything else."""
+    counts: Dict[str, int] = {}
+    other: List[str] = []
+    for line in (stdout or "").splitlines():
+        line = line.strip()
+        match = _PROGRESS_LINE.match(line)
+        if match:
+            outcome = _outcome(match.group(1))
+            counts[outcome] = counts.get(outcome, 0) + 1
+        elif line:
+            other.append(line)
+    response: Dict[str, Any] = {"output": "\n".join(other[-TAIL_LINES:])}
+    if counts:
+        response["facilities"] = counts
+    if stderr and stderr.strip():
+        response["error"] = stderr.strip()[-ERROR_CHARS:]
+    return response
+
+
+def _site_count(campground: Dict[str, Any]) -> int:
+    if "site_count" in campground:
+        return int(campground["site_count"])
+    return len(campground.get("available_sites") or campground.get("sites") or [])
+
+
+def store_results(results: Dict[str, Any]) -> str:
+    """Store full results in the shared cache; the handle is derived from their content."""
+    data = jsonio.dumps(results)
+    handle = hashlib.sha1(data).hexdigest()[:16]
+    get_backend().put(_results_key(handle), data, ttl=RESULT_TTL_SECONDS)
+    return handle
+
+
+def load_results(handle: str) -> Optional[Dict[str, Any]]:
+    """Full results for a handle, or None if it is unknown or expired."""
+    if not _HANDLE.match(handle):
+        return None
+    data = get_backend().get(_results_key(handle))
+    return jsonio.loads(data) if data is not None else None
+
+
+def results_expire_in(handle: str) -> float:
+    """Seconds until a handle's stored results expire; 0 if unknown."""
+    age = get_backend().age(_results_key(handle))
+    return max(0.0, RESULT_TTL_SECONDS - age) if age is not None else 0.0
+
+
+def _results_key(handle: str) -> str:
+    return f"results/{handle}.json"
+
+
+def compact_results(results: Dict[str, Any], top_k: int = TOP_K) -> Dict[str, Any]:
+    """
+    Top-K view of analysis results, with totals over all of them and a handle to the rest.
+
+    Accepts the analysis JSON shape ({"total_found", "campgrounds": [{"name", "distance",
+    "site_count" or "available_sites", "facility_id"}], "date", "location", ...}).
+    """
+    campgrounds = sorted(results.get("campgrounds") or [],
+                         key=lambda c: (float(c.get("distance") or 0), -_site_count(c)))
+    top = [dict({k: c[k] for k in CAMPGROUND_FIELDS if k in c}, site_count=_site_count(c))
+           for c in campgrounds[:top_k]]
+    compact = {
+        "total_found": results.get("total_found", len(campgrounds)),
+        "total_sites": sum(_site_count(c) for c in campgrounds),
+        "shown": len(top),
+        "campgrounds": top,
+        "result_handle": store_results(results),
+    }
+    for key in ("date", "location", "max_distance"):
+        if key in results:
+            compact[key] = results[key]
+    if campgrounds:
+        compact["nearest_miles"] = top[0].get("distance")
+    return compact
@@ -3,8 +3,8 @@
 Simple web frontend for the Campground Availability Agent with real-time streaming
 """
 
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import FastAPI, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import anyio
@@ -14,6 +14,14 @@ from pathlib import Path
 import queue
 import threading
 import os
+import time
+
+from search_pipeline import MAX_BATCH_QUERIES, stream_batch, stream_search
+from results_api import DEFAULT_LIMIT, query_results
+from tool_responses import compact_results
+from cache_backend import get_backend
+from metrics import (AGENT_TASKS_IN_FLIGHT, CONTENT_TYPE, QUERIES, QUERY_SECONDS, UPDATE_QUEUE_DEPTH,
+                     render as render_metrics)
 
 # Import Claude Code agent if available
 try:
@@ -32,6 +40,9 @@ except ImportError as e:
     print(f"⚠️ ADK not available: {e}")
     ADK_AVAILABLE = False
 
+# Fail at start-up rather than on the first fetch if CACHE_URL names a backend this image lacks
+get_backend()
+
 app = FastAPI(title="Campground Availability Agent", description="Find campgrounds with natural language queries")
 
 # Setup templates directory
@@ -45,19 +56,28 @@ async def home(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/query")
-async def process_query(query: str = Form(...), agent: str = Form("claude-code"), lite_mode: bool = Form(False)):
+async def process_query(request: Request, query: str = Form(...), agent: str = Form("claude-code"), lite_mode: bool = Form(False)):
     """Process a natural language campground query with real-time streaming"""
     
     async def generate_response():
         """Stream the agent's response with real-time updates"""
+        agent_task = None
+        started = time.perf_counter()
+        outcome = "disconnected"  # unless the stream runs to the end
         
         # Create a queue for updates
         update_queue = asyncio.Queue()
         
         async def update_callback(update_data):
             """Callback to receive updates from the agent"""
+            UPDATE_QUEUE_DEPTH.inc()
             await update_queue.put(update_data)
         
+        async def next_update(timeout=None):
+            update = await asyncio.wait_for(update_queue.get(), timeout=timeout)
+            UPDATE_QUEUE_DEPTH.dec()
+            return update
+        
         # Show the user's query
         yield f"data: {json.dumps({'type': 'status', 'message': f'🔍 Processing query: {query!r}'})}" + "\n\n"
         
@@ -86,6 +106,7 @@ async def process_query(query: str = Form(...), agent: str = Form("claude-code")
                         cache_ttl_minutes=30  # Cache TTL in minutes - configurable
                     )
                 else:
+                    outcome = "error"
                     yield f"data: {json.dumps({'type': 'error', 'message': '❌ Neither ADK nor Claude Code SDK available'})}" + "\n\n"
                     return
             
@@ -93,12 +114,18 @@ async def process_query(query: str = Form(...), agent: str = Form("claude-code")
             agent_task = asyncio.create_task(
                 campground_agent.process_natural_language_query(query)
             )
+            AGENT_TASKS_IN_FLIGHT.inc()
+            agent_task.add_done_callback(lambda task: AGENT_TASKS_IN_FLIGHT.dec())
             
             # Stream updates as they come in
             while not agent_task.done():
+                if await request.is_disconnected():
+                    # Nobody is listening any more: stop the agent (and its fetches)
+                    agent_task.cancel()
+                    return
                 try:
                     # Wait for update with timeout
-                    update = await asyncio.wait_for(update_queue.get(), timeout=0.1)
+                    update = await next_update(timeout=0.1)
                     yield f"data: {json.dumps(update)}\n\n"
                 except asyncio.TimeoutError:
                     # Send keepalive
@@ -107,18 +134,28 @@ async def process_query(query: str = Form(...), agent: str = Form("claude-code")
             
             # Get any remaining updates
             while not update_queue.empty():
-                update = await update_queue.get()
+                update = await next_update()
                 yield f"data: {json.dumps(update)}\n\n"
             
             # Check if agent completed successfully
             try:
                 await agent_task
+                outcome = "success"
                 yield f"data: {json.dumps({'type': 'success', 'message': 'Search completed successfully!'})}\n\n"
             except Exception as e:
+                outcome = "error"
                 yield f"data: {json.dumps({'type': 'error', 'message': f'Agent error: {str(e)}'})}\n\n"
             
         except Exception as e:
+            outcome = "error"
             yield f"data: {json.dumps({'type': 'error', 'message': f'Error: {str(e)}'})}\n\n"
+        finally:
+            # Also reached when the server closes the stream on disconnect (GeneratorExit/CancelledError)
+            if agent_task is not None and not agent_task.done():
+                agent_task.cancel()
+            UPDATE_QUEUE_DEPTH.dec(update_queue.qsize())  # updates nobody will stream now
+            QUERIES.inc(endpoint="query", outcome=outcome)
+            QUERY_SECONDS.observe(time.perf_counter() - started, endpoint="query")
         
         yield f"data: {json.dumps({'type': 'done'})}\n\n"
     
@@ -134,27 +171,44 @@ async def process_query(query: str = Form(...), agent: str = Form("claude-code")
 
 @app.post("/query-detailed")
 async def process_detailed_query(
+    request: Request,
     location: str = Form(...),
     date: str = Form(...),
     distance: int = Form(50),
     route: str = Form(None)
 ):
-    """Process a detailed campground query with specific parameters"""
+    """Process a detailed campground query with the deterministic pipeline (no LLM involved)"""
     
     async def generate_response():
-        """Stream the agent's response"""
+        """Stream the pipeline's progress events and results"""
+        started = time.perf_counter()
+        outcome = "disconnected"  # unless the stream runs to the end
         try:
             yield f"data: {json.dumps({'type': 'status', 'message': f'Searching campgrounds near {location} for {date}'})}\n\n"
-            
             if route and route.strip():
-                await agent.find_availability(location, date, distance, route.strip())
-            else:
-                await agent.find_availability(location, date, distance)
+                yield f"data: {json.dumps({'type': 'warning', 'message': 'Route filtering is not supported yet; searching around the location only'})}\n\n"
+            
+            # Closing this generator (client disconnect) closes stream_search, which cancels the fetches
+            async for event in stream_search(location, date, distance):
+                if await request.is_disconnected():
+                    return
+                if event["type"] == "error":
+                    outcome = "error"
+                elif event["type"] == "campground_results":
+                    # Stream the top few; the page loads the rest from /results/<handle> as needed
+                    event = dict(compact_results(event), type="campground_results", cached=event.get("cached", False))
+                yield f"data: {json.dumps(event)}\n\n"
             
+            if outcome != "error":
+                outcome = "success"
             yield f"data: {json.dumps({'type': 'result', 'message': 'Search completed!'})}\n\n"
             
         except Exception as e:
+            outcome = "error"
             yield f"data: {json.dumps({'type': 'error', 'message': f'Error: {str(e)}'})}\n\n"
+        finally:
+            QUERIES.inc(endpoint="query_detailed", outcome=outcome)
+            QUERY_SECONDS.observe(time.perf_counter() - started, endpoint="query_detailed")
         
         yield f"data: {json.dumps({'type': 'done'})}\n\n"
     
@@ -164,6 +218,81 @@ async def process_detailed_query(
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
     )
 
+@app.post("/query-batch")
+async def process_batch_query(request: Request):
+    """
+    Evaluate several structured queries over one shared fetch.
+
+    Body: {"queries": [{"location": "Yosemite", "distance": 30, "dates": ["2025-08-08", "2025-08-09"]}, ...]}
+    """
+    try:
+        body = await request.json()
+        queries = body["queries"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail='Expected a JSON body {"queries": [...]}')
+    if not isinstance(queries, list) or not 1 <= len(queries) <= MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Send 1 to {MAX_BATCH_QUERIES} queries")
+    
+    async def generate_response():
+        """Stream batch progress, then the top few campgrounds of every query (full lists via /results/<handle>)"""
+        started = time.perf_counter()
+        outcome = "disconnected"  # unless the stream runs to the end
+        try:
+            async for event in stream_batch(queries):
+                if await request.is_disconnected():
+                    return
+                if event["type"] == "error":
+                    outcome = "error"
+                elif event["type"] == "batch_results":
+                    event = dict(event, results=[
+                        dict(compact_results(r), query=r["query"], dates=r["dates"], status=r["status"],
+                             cached=r.get("cached", False)) if r["status"] == "success" else r
+                        for r in event["results"]
+                    ])
+                yield f"data: {json.dumps(event)}\n\n"
+            if outcome != "error":
+                outcome = "success"
+        except Exception as e:
+            outcome = "error"
+            yield f"data: {json.dumps({'type': 'error', 'message': f'Error: {str(e)}'})}\n\n"
+        finally:
+            QUERIES.inc(endpoint="query_batch", outcome=outcome)
+            QUERY_SECONDS.observe(time.perf_counter() - started, endpoint="query_batch")
+        
+        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+    
+    return StreamingResponse(
+        generate_response(),
+        media_type="text/plain",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+@app.get("/results/{handle}")
+async def get_results(
+    handle: str,
+    cursor: str = None,
+    limit: int = DEFAULT_LIMIT,
+    sort: str = "distance",
+    min_distance: float = None,
+    max_distance: float = None,
+    date: str = None,
+    site_type: str = None
+):
+    """One page of the results behind a result_handle (cursor pagination, sorting, filters)"""
+    try:
+        page = await asyncio.to_thread(query_results, handle, cursor, limit, sort,
+                                       min_distance, max_distance, date, site_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Results expired or unknown")
+    return page
+
 if __name__ == "__main__":
     import uvicorn
     import os
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+workspace.py - Per-search workspaces over shared, read-mostly caches
+
+Concurrent searches must not share one download.csv and one all_avail_<MONTH>.json in the
+working directory, so a Workspace separates the two kinds of state:
+
+    Shared caches (written atomically, safe for any number of readers and writers)
+        temp/<MONTH>/avail_<ID>.json     availability payloads, keyed by month and facility
+        temp/campgrounds.csv             RIDB campground superset
+        temp/geocode_cache.json          geocoded locations
+
+    Per-search state
+        facility_ids                     held in memory, computed from the campground table
+        temp/workspaces/<region>/        download.csv and all_avail_<MONTH>.json for this region
+
+Workspace directories are keyed by (center, radius), so searches for different regions never
+touch each other's files, and identical searches share the same (atomically written) outputs.
+Analysis scripts that read download.csv and all_avail_<MONTH>.json run with the workspace
+directory as their CWD.
+
+Usage:
+    ws = Workspace.for_location("South Lake Tahoe", 30)
+    ws.write_download_csv()
+    fetch.py 2025-08 --location "South Lake Tahoe" --distance 30 --workspace
+"""
+
+import csv
+import io
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from atomic_file import write_atomic
+from avail_cache import is_cached, month_cache_dir
+from facility_registry import load_campgrounds, region_facilities, region_key
+from geo import DEFAULT_LAT, DEFAULT_LON, geocode_location
+from profiling import trace_stage
+
+WORKSPACES_DIR = "temp/workspaces"
+DOWNLOAD_COLUMNS = ["FacilityID", "FacilityName", "AddressStateCode", "distance_miles"]
+
+
+def workspace_dir(lat: float, lon: float, radius: float, root: Union[str, Path] = WORKSPACES_DIR) -> Path:
+    """Directory for a (center, radius) search."""
+    return Path(root) / region_key(lat, lon, radius).replace(",", "_")
+
+
+class Workspace:
+    """One search's facility set plus its private output directory."""
+
+    def __init__(self, root: Path, rows: List[Dict[str, object]]):
+        self.root = Path(root)
+        self.rows = rows
+        self.facility_ids: List[str] = [str(row["FacilityID"]) for row in rows]
+
+    @classmethod
+    def for_region(cls, lat: float, lon: float, radius: float,
+                   campgrounds: Optional[List[Dict[str, str]]] = None) -> "Workspace":
+        """
+        Compute the facility set in memory from the shared campground table (reusing the set
+        registered for this region, if current) and register it.
+
+        Pass `campgrounds` (load_campgrounds()) to reuse one loaded table for several regions.
+        """
+        if campgrounds is None:
+            with trace_stage("csv_read", file="campgrounds.csv"):
+                campgrounds = load_campgrounds()
+        with trace_stage("distance_calc", candidates=len(campgrounds)):
+            rows = region_facilities(campgrounds, lat, lon, radius)
+        return cls(workspace_dir(lat, lon, radius), rows)
+
+    @classmethod
+    def for_location(cls, location: Optional[str], radius: float) -> "Workspace":
+        """Geocode (cached) and open the workspace; None means the default San Francisco center."""
+        lat, lon = geocode_location(location) if location else (DEFAULT_LAT, DEFAULT_LON)
+        return cls.for_region(lat, lon, radius)
+
+    @property
+    def download_csv(self) -> Path:
+        return self.root / "download.csv"
+
+    def merged_file(self, month: str) -> Path:
+        return self.root / f"all_avail_{month}.json"
+
+    def write_download_csv(self) -> Path:
+        """Atomically write this search's download.csv (same columns as fetch.py --build-csv)."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=DOWNLOAD_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(self.rows)
+        write_atomic(self.download_csv, buf.getvalue().encode("utf-8"))
+        return self.download_csv
+
+    def pending(self, month: str) -> List[str]:
+        """Facilities whose availability for the month is not in the shared cache yet."""
+        cache_dir = month_cache_dir(month)
+        return [fid for fid in self.facility_ids if not is_cached(fid, cache_dir)]
+